@@ -0,0 +1,103 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Checks the accuracy of the shared bandwidth limiter (--bandwidth-limit and
+# --bandwidth-schedule): concurrent downloads from a local stub server (in a
+# child process, uncapped) with a range of limits and stream counts, the
+# limit taken from a schedule window covering the current time, and the
+# overhead of the limiter in the chunk loop when it doesn't throttle.
+#
+# Exits with 1 when an achieved rate is off its limit by more than --tolerance.
+#
+# Usage: python3 benchmarks/bench_bandwidth_limit.py [--limits-mb 4 16 64] [--streams 1 4 8] [--seconds 4]
+
+import argparse
+import contextlib
+import os
+import shutil
+import sys
+import time
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+from common import StubServerProcess, load_downloader
+
+MB = 1024 * 1024
+
+
+def download_all(downloader, server_url, streams, size):
+    """ Downloads `streams` files of `size` bytes concurrently, returns the
+        aggregate bytes per second
+    """
+    def download(n):
+        result = downloader.download_recording(f"{server_url}/files/{size}/{n}", "bench", f"file-{n}.mp4",
+                                               "bandwidth", size)
+        if not result or result["bytes"] != size:
+            raise RuntimeError("download failed")
+        os.remove(result["path"])
+        os.remove(result["path"] + downloader.CHECKSUM_EXTENSION)
+
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), \
+            ThreadPoolExecutor(max_workers=streams) as executor:
+        list(executor.map(download, range(streams)))
+    return streams * size / (time.perf_counter() - started)
+
+
+def current_window(rate):
+    """ A --bandwidth-schedule covering the current minute with `rate`
+    """
+    local_time = time.localtime()
+    minute = local_time.tm_hour * 60 + local_time.tm_min
+    start, end = (minute - 1) % 1440, (minute + 2) % 1440
+    return f"{start // 60:02}:{start % 60:02}-{end // 60:02}:{end % 60:02}={rate}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bandwidth limiter benchmark")
+    parser.add_argument('--limits-mb', type=float, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--streams', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--seconds', type=float, default=4, help="Target duration of each run")
+    parser.add_argument('--tolerance', type=float, default=0.05, help="Max relative error (default: 0.05)")
+    args = parser.parse_args()
+
+    downloader = load_downloader()
+    downloader.configure_write_path(1 * MB, "readinto", False)
+    failed = False
+
+    print(f"{'limit MB/s':>10} {'streams':>8} {'MB/s':>8} {'error':>7}")
+    with StubServerProcess(bytes_per_second=0) as server:
+        runs = [(limit, streams, None) for limit in args.limits_mb for streams in args.streams]
+        # The limit of a schedule window, over a default limit 4 times lower
+        runs.append((args.limits_mb[-1], args.streams[-1], current_window(f"{args.limits_mb[-1]}M")))
+
+        for limit, streams, schedule in runs:
+            downloader.configure_bandwidth(
+                int(limit * MB / 4) if schedule else int(limit * MB),
+                downloader.parse_bandwidth_schedule(schedule) if schedule else None)
+            rate = download_all(downloader, server.url, streams, int(limit * MB * args.seconds / streams))
+            error = rate / (limit * MB) - 1
+            failed = failed or abs(error) > args.tolerance
+            print(f"{limit:>10g} {streams:>8} {rate / MB:>8.1f} {error:>+7.1%}"
+                  f"{'  (schedule ' + schedule + ')' if schedule else ''}")
+
+        # Overhead when not throttling: no limiter, an unlimited window, a limit out of reach
+        size = 256 * MB
+        for label, limit, schedule in [("no limit", None, None),
+                                       ("unlimited window", None, current_window(0)),
+                                       ("limit not reached", 1024 * 1024 * MB, None)]:
+            downloader.configure_bandwidth(limit, downloader.parse_bandwidth_schedule(schedule) if schedule else None)
+            rate = max(download_all(downloader, server.url, 1, size) for _ in range(3))
+            print(f"{label:>19} {rate / MB:>8.0f} MB/s")
+
+    limiter = downloader.BandwidthLimiter(1024 * 1024 * MB)
+    number = 200000
+    per_call = timeit.timeit(lambda: limiter.consume(MB), number=number) / number
+    print(f"consume() {per_call * 1e9:.0f} ns per chunk")
+
+    shutil.rmtree(downloader.DOWNLOAD_DIRECTORY, ignore_errors=True)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Measures download throughput of DownloadPool against a local stub server
+# whose connections are individually throttled, for a growing worker count.
+#
+# Usage: python3 benchmarks/bench_concurrent_downloads.py [--files 16] [--size-mb 4] [--rate-mb 8]
+
+import argparse
+import shutil
+import time
+
+from common import StubServer, load_downloader
+
+
+def run(downloader, server_url, files, size, workers):
+    pool = downloader.DownloadPool(workers, workers, on_meeting_complete=lambda *args: None)
+    recording = {"uuid": "bench", "topic": "Bench"}
+    meeting_files = [
+        (f"{server_url}/files/{size}/{n}", f"file-{n}.mp4", f"workers-{workers}",
+         "shared_screen", str(n), size)
+        for n in range(files)
+    ]
+
+    started = time.perf_counter()
+    pool.submit_meeting("bench@example.com", recording, meeting_files, 0, 1)
+    pool.join()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent download benchmark")
+    parser.add_argument('--files', type=int, default=16)
+    parser.add_argument('--size-mb', type=float, default=4)
+    parser.add_argument('--rate-mb', type=float, default=8,
+                        help="Per-connection bandwidth cap in MB/s (0 = unlimited)")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    downloader = load_downloader()
+    size = int(args.size_mb * 1024 * 1024)
+    total_mb = args.files * size / 1024 / 1024
+
+    print(f"{args.files} files x {args.size_mb} MB, per-connection cap {args.rate_mb} MB/s")
+    print(f"{'workers':>8} {'seconds':>9} {'MB/s':>9} {'speedup':>8}")
+
+    baseline = None
+    with StubServer(bytes_per_second=int(args.rate_mb * 1024 * 1024)) as server:
+        for workers in args.workers:
+            elapsed = run(downloader, server.url, args.files, size, workers)
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>9.2f} {total_mb / elapsed:>9.1f} {baseline / elapsed:>7.1f}x")
+
+    shutil.rmtree(downloader.DOWNLOAD_DIRECTORY, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
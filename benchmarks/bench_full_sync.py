@@ -0,0 +1,134 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Runs full syncs of zoom-recording-downloader.py against the Zoom simulator
+# (see zoom_simulator.py), from an empty download directory, for a set of
+# fault scenarios. The downloader runs as a child process with the given
+# arguments; each scenario is run --repeat times on the same seeded account
+# and the medians of the wall time, API calls, downloads, throughput and
+# peak RSS of the downloader are reported.
+#
+# Usage: python3 benchmarks/bench_full_sync.py [--users 20] [--repeat 3] [--scenarios clean flaky]
+#                                              [--json results.json] [-- <downloader arguments>]
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import REPO_DIRECTORY
+from zoom_simulator import ZoomSimulatorProcess, add_simulator_arguments, simulator_options
+
+SCENARIOS = {
+    "clean": {},
+    "latency": {"latency": 0.05},
+    "throttled": {"throttle_rate": 0.05},
+    "flaky": {"error_rate": 0.02, "drop_rate": 0.05},
+}
+DOWNLOADER_ARGUMENTS = ["--workers", "8", "--delete-rate", "50"]
+
+
+def run(options, downloader_arguments):
+    """ Runs one full sync, returns its measurements
+    """
+    download_directory = tempfile.mkdtemp(prefix='zrd-sync-dl-')
+    log_directory = tempfile.mkdtemp(prefix='zrd-sync-log-')
+    try:
+        with ZoomSimulatorProcess(**options) as simulator, \
+                open(os.path.join(log_directory, "output.log"), 'w') as output:
+            env = dict(os.environ, **simulator.environment,
+                       ZOOM_CLIENT_ID="bench", ZOOM_CLIENT_SECRET="bench", ZOOM_ACCOUNT_ID="bench",
+                       DOWNLOAD_DIRECTORY=download_directory, LOG_DIRECTORY=log_directory,
+                       TQDM_DISABLE="1")
+
+            started = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, os.path.join(REPO_DIRECTORY, "zoom-recording-downloader.py")] +
+                downloader_arguments, env=env, stdout=output, stderr=subprocess.STDOUT)
+            # wait4 returns the resource usage of this child alone
+            _, status, usage = os.wait4(process.pid, 0)
+            wall = time.perf_counter() - started
+            process.returncode = os.waitstatus_to_exitcode(status)
+
+            stats = simulator.stats()
+
+        if process.returncode != 0:
+            with open(os.path.join(log_directory, "output.log")) as output:
+                sys.stdout.write(output.read()[-4000:])
+            raise RuntimeError(f"the downloader exited with {process.returncode}")
+
+        with open(os.path.join(log_directory, "run-report.json")) as fd:
+            counters = json.load(fd)["counters"]
+        downloaded = sum(item["value"] for item in counters.get("downloaded_bytes", []))
+        files = sum(item["value"] for item in counters.get("files_downloaded", []))
+
+        return {
+            "wall_seconds": wall,
+            "cpu_seconds": usage.ru_utime + usage.ru_stime,
+            # kilobytes on Linux
+            "peak_rss_mb": usage.ru_maxrss / 1024,
+            "api_calls": stats["api_requests"],
+            "download_requests": stats["downloads"],
+            "files": files,
+            "expected_files": stats["files"],
+            "deleted_meetings": stats["deleted_meetings"],
+            "downloaded_mb": downloaded / 1024 / 1024,
+            "mb_per_second": downloaded / 1024 / 1024 / wall,
+            "requests": stats["requests"],
+        }
+    finally:
+        shutil.rmtree(download_directory, ignore_errors=True)
+        shutil.rmtree(log_directory, ignore_errors=True)
+
+
+def median(runs, key):
+    return statistics.median(result[key] for result in runs)
+
+
+def main():
+    arguments = sys.argv[1:]
+    downloader_arguments = DOWNLOADER_ARGUMENTS
+    if "--" in arguments:
+        split = arguments.index("--")
+        arguments, downloader_arguments = arguments[:split], arguments[split + 1:]
+
+    parser = argparse.ArgumentParser(description="Full sync benchmark against the Zoom simulator",
+                                     epilog="Arguments after -- are passed to the downloader "
+                                            f"(default: {' '.join(DOWNLOADER_ARGUMENTS)})")
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help="Also write all the results to this file")
+    add_simulator_arguments(parser)
+    parser.set_defaults(users=20, rate_mb=16)
+    args = parser.parse_args(arguments)
+
+    print(f"{args.users} users x {args.meetings} meetings x {args.files} files, "
+          f"MP4 ~{args.size_mb} MB, per-connection cap {args.rate_mb} MB/s, "
+          f"downloader: {' '.join(downloader_arguments)}")
+    print(f"{'scenario':>10} {'wall s':>8} {'CPU s':>7} {'API calls':>9} {'GETs':>6} "
+          f"{'files':>9} {'MB/s':>7} {'RSS MB':>7}")
+
+    results = {}
+    for scenario in args.scenarios:
+        options = dict(simulator_options(args), **SCENARIOS[scenario])
+        runs = [run(options, downloader_arguments) for _ in range(args.repeat)]
+        results[scenario] = runs
+
+        files = f"{min(result['files'] for result in runs)}/{runs[0]['expected_files']}"
+        print(f"{scenario:>10} {median(runs, 'wall_seconds'):>8.2f} {median(runs, 'cpu_seconds'):>7.2f} "
+              f"{median(runs, 'api_calls'):>9.0f} {median(runs, 'download_requests'):>6.0f} {files:>9} "
+              f"{median(runs, 'mb_per_second'):>7.1f} {median(runs, 'peak_rss_mb'):>7.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as fd:
+            json.dump({"options": vars(args), "downloader_arguments": downloader_arguments,
+                       "results": results}, fd, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Benchmarks the transcript search index on a synthetic archive of VTT
+# transcripts and chat files: a full reindex with 1 and --workers parsing
+# processes, an incremental reindex of the unchanged archive, and the
+# latency of search queries (with and without a --user filter), compared
+# with a grep of the whole archive.
+#
+# Usage: python3 benchmarks/bench_search.py [--meetings 2000] [--cues 400] [--workers 4]
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zoom_recording_downloader import search  # noqa: E402
+
+# A small vocabulary: every word is in ~40% of the segments, the worst case of the ranking
+WORDS = ("budget forecast roadmap hiring launch customer churn pricing migration latency incident review "
+         "design quarter revenue contract security audit onboarding release backlog vendor renewal").split()
+QUERIES = [("budget", None), ("customer churn", None), ("security audit incident", None), ("zebra", None),
+           ("budget", "user3@example.com")]
+MEETINGS_PER_FOLDER = 10
+
+
+def build_archive(directory, meetings, cues, seed=0):
+    rng = random.Random(seed)
+    for n in range(meetings):
+        folder = os.path.join(directory, f"user{n // 100}@example.com", f"Topic {n // MEETINGS_PER_FOLDER}")
+        os.makedirs(folder, exist_ok=True)
+        prefix = (f"2024.{1 + n // 200 % 12:02}.{1 + n % 28:02} - {1 + n % 12:02}.00 "
+                  f"{'AM' if n % 2 else 'PM'} UTC - Topic {n // MEETINGS_PER_FOLDER}")
+
+        lines = ["WEBVTT", ""]
+        for cue in range(cues):
+            seconds = cue * 5
+            lines += [str(cue + 1),
+                      f"{seconds // 3600:02}:{seconds // 60 % 60:02}:{seconds % 60:02}.000 --> "
+                      f"{seconds // 3600:02}:{seconds // 60 % 60:02}:{seconds % 60 + 4:02}.000",
+                      f"Speaker {cue % 4}: " + " ".join(rng.choice(WORDS) for _ in range(12)), ""]
+        with open(os.path.join(folder, prefix + " - Audio Transcript..txt"), 'w') as fd:
+            fd.write("\n".join(lines))
+
+        with open(os.path.join(folder, prefix + " - Chat File.txt"), 'w') as fd:
+            for message in range(cues // 20):
+                fd.write(f"10:{message // 60 % 60:02}:{message % 60:02} From Speaker {message % 4} to Everyone:\n"
+                         f"\t{' '.join(rng.choice(WORDS) for _ in range(8))}\n")
+
+
+def timed_reindex(path, directory, workers):
+    index = search.TranscriptIndex(path)
+    started = time.perf_counter()
+    counts = search.reindex(index, directory, {}, workers)
+    elapsed = time.perf_counter() - started
+    index.close()
+    return elapsed, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcript search index benchmark")
+    parser.add_argument('--meetings', type=int, default=2000)
+    parser.add_argument('--cues', type=int, default=400, help="Cues per transcript (default: 400)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--runs', type=int, default=20, help="Runs of each query (default: 20)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='zrd-search-')
+    try:
+        archive = os.path.join(directory, "archive")
+        build_archive(archive, args.meetings, args.cues)
+        size = sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(archive) for name in names)
+        print(f"{args.meetings * 2} files, {size / 1024 / 1024:.0f} MB of text")
+
+        for workers in sorted({1, args.workers}):
+            path = os.path.join(directory, f"search-{workers}.db")
+            elapsed, counts = timed_reindex(path, archive, workers)
+            print(f"{'reindex, ' + str(workers) + ' workers':<32} {elapsed:8.2f} s  "
+                  f"({counts['indexed']} files, {size / 1024 / 1024 / elapsed:.0f} MB/s)")
+
+        elapsed, counts = timed_reindex(path, archive, args.workers)
+        print(f"{'reindex, unchanged archive':<32} {elapsed:8.2f} s  ({counts['unchanged']} unchanged)")
+
+        index = search.TranscriptIndex(path)
+        for query, email in QUERIES:
+            timings = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                hits = index.search(search.plain_query(query), 20, email)
+                timings.append(time.perf_counter() - started)
+            label = f"search {query!r}" + (" --user" if email else "")
+            print(f"{label:<32} {statistics.median(timings) * 1000:8.2f} ms  ({len(hits)} hits)")
+        index.close()
+
+        if shutil.which("grep"):
+            started = time.perf_counter()
+            subprocess.run(["grep", "-rl", "budget", archive], stdout=subprocess.DEVNULL)
+            print(f"{'grep -rl budget':<32} {(time.perf_counter() - started) * 1000:8.2f} ms")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Measures the download time of one large recording split into a growing
+# number of byte-range segments, against a local stub server (in a child
+# process) whose connections are individually throttled.
+#
+# Usage: python3 benchmarks/bench_segmented_downloads.py [--size-mb 256] [--rate-mb 16]
+
+import argparse
+import os
+import shutil
+import time
+
+from common import StubServerProcess, load_downloader
+
+
+def run(downloader, server_url, size, segments):
+    # Threshold at 1 byte: the single-segment run goes through the plain path
+    downloader.configure_write_path(4 * 1024 * 1024, "readinto", True, segments=segments,
+                                    segment_threshold=1)
+
+    started = time.perf_counter()
+    result = downloader.download_recording(f"{server_url}/files/{size}/{segments}", "bench",
+                                           f"file-{segments}.mp4", "segments", size)
+    elapsed = time.perf_counter() - started
+    if not result or result["bytes"] != size:
+        raise RuntimeError("download failed")
+
+    os.remove(result["path"])
+    os.remove(result["path"] + downloader.CHECKSUM_EXTENSION)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Segmented download benchmark")
+    parser.add_argument('--size-mb', type=float, default=256)
+    parser.add_argument('--rate-mb', type=float, default=16,
+                        help="Per-connection bandwidth cap in MB/s (0 = unlimited)")
+    parser.add_argument('--segments', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    downloader = load_downloader()
+    size = int(args.size_mb * 1024 * 1024)
+
+    print(f"1 file x {args.size_mb} MB, per-connection cap {args.rate_mb} MB/s")
+    print(f"{'segments':>8} {'seconds':>9} {'MB/s':>9} {'speedup':>8}")
+
+    baseline = None
+    with StubServerProcess(bytes_per_second=int(args.rate_mb * 1024 * 1024)) as server:
+        for segments in args.segments:
+            elapsed = run(downloader, server.url, size, segments)
+            baseline = baseline or elapsed
+            print(f"{segments:>8} {elapsed:>9.2f} {args.size_mb / elapsed:>9.1f} {baseline / elapsed:>7.1f}x")
+
+    shutil.rmtree(downloader.DOWNLOAD_DIRECTORY, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Benchmarks standardize_filenames.py on a synthetic tree of old-style
+# recording names (<user>/<topic>/GMT...): planning with the previous
+# os.walk + text tree + regex approach, planning with the scandir walk
+# (dry run), renaming on a thread pool and undoing from the journal.
+#
+# Usage: python3 benchmarks/bench_standardize_filenames.py [--files 1000000] [--per-folder 50]
+
+import argparse
+import contextlib
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import standardize_filenames  # noqa: E402
+
+EXTENSIONS = ["mp4", "m4a", "chat", "vtt"]
+FOLDERS_PER_USER = 100
+
+
+def build_tree(directory, files, per_folder):
+    folder = None
+    for n in range(files):
+        if n % per_folder == 0:
+            folder_number = n // per_folder
+            folder = os.path.join(directory, f"user{folder_number // FOLDERS_PER_USER}@example.com",
+                                  f"Topic {folder_number}")
+            os.makedirs(folder)
+        # One meeting per minute, one file of each type per meeting
+        minute = n // len(EXTENSIONS)
+        name = (f"GMT2024{1 + minute // 40000 % 12:02}{1 + minute // 1440 % 28:02}-"
+                f"{minute // 60 % 24:02}{minute % 60:02}00_Recording.{EXTENSIONS[n % len(EXTENSIONS)]}")
+        open(os.path.join(folder, name), 'w').close()
+
+
+def legacy_plan(directory):
+    """ The planning of the previous version: a textual tree built with
+        os.walk, parsed back with regexes
+    """
+    tree_output = []
+    for root, _, files in os.walk(directory):
+        level = root.replace(directory, '').count(os.sep)
+        tree_output.append('{}{}/'.format(' ' * 4 * level, os.path.basename(root)))
+        sub_indent = ' ' * 4 * (level + 1)
+        for f in files:
+            tree_output.append('{}{}'.format(sub_indent, f))
+
+    folder_files_dict = {}
+    current_folder = None
+    folder_pattern = re.compile(r'^(.+)/$')
+    file_pattern = re.compile(r'^    (.+)$')
+    for line in tree_output:
+        folder_match = folder_pattern.match(line)
+        file_match = file_pattern.match(line)
+        if folder_match:
+            current_folder = folder_match.group(1).strip()
+            folder_files_dict[current_folder] = []
+        elif file_match and current_folder:
+            folder_files_dict[current_folder].append(file_match.group(1).strip())
+
+    return {
+        folder_name: [standardize_filenames.rename_file(file, folder_name) for file in files]
+        for folder_name, files in folder_files_dict.items()
+    }
+
+
+def timed(label, files, function, *args):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed:8.2f}s {files / elapsed:12,.0f} files/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark standardize_filenames.py")
+    parser.add_argument('--files', type=int, default=1000000, help="Number of files (default: 1000000)")
+    parser.add_argument('--per-folder', dest='per_folder', type=int, default=50,
+                        help="Files per topic folder (default: 50)")
+    parser.add_argument('--workers', type=int, default=8, help="Rename threads (default: 8)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='zrd-names-')
+    journal = os.path.join(tempfile.mkdtemp(prefix='zrd-journal-'), 'journal.jsonl')
+    try:
+        timed("build tree", args.files, build_tree, directory, args.files, args.per_folder)
+        timed("plan (os.walk + regex)", args.files, legacy_plan, directory)
+        timed("plan (scandir, dry run)", args.files, standardize_filenames.standardize,
+              directory, journal, True, args.workers)
+        counts = timed(f"rename ({args.workers} threads)", args.files, standardize_filenames.standardize,
+                       directory, journal, False, args.workers)
+        timed("undo", args.files, standardize_filenames.undo, journal, False)
+        print(f"==> {counts['renamed']} renamed, {counts['unchanged']} unchanged, "
+              f"{counts['conflicts']} conflicts, {counts['errors']} errors")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        shutil.rmtree(os.path.dirname(journal), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Measures the startup cost of the downloader: the cumulative import time of
+# its package (python -X importtime, best of --runs), the wall time of
+# `--help` and of a no-op run (`verify` of an empty archive), and checks that
+# none of the heavy dependencies is imported by them. Also compares the start
+# time parser of format_filename with dateutil, when it is installed.
+#
+# Exits with 1 when the import time exceeds --budget-ms or a heavy module is
+# imported, so that it can gate changes.
+#
+# Usage: python3 benchmarks/bench_startup.py [--runs 10] [--budget-ms 50]
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+from common import REPO_DIRECTORY
+
+HEAVY_MODULES = ["requests", "urllib3", "tqdm", "pathvalidate", "dateutil", "asyncio", "http.server"]
+SCRIPT = os.path.join(REPO_DIRECTORY, "zoom-recording-downloader.py")
+
+
+def import_time(module):
+    """ Cumulative import time of `module`, in milliseconds
+    """
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIRECTORY, capture_output=True, text=True, check=True
+    ).stderr
+
+    for line in output.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000
+
+    raise RuntimeError(f"{module} not found in the -X importtime output")
+
+
+def imported_modules(arguments, env):
+    """ The heavy modules imported by a run of the downloader with `arguments`
+    """
+    code = ("import runpy, sys\n"
+            f"sys.path.insert(0, {REPO_DIRECTORY!r})\n"
+            f"sys.argv = {[SCRIPT] + arguments!r}\n"
+            "try:\n"
+            f"    runpy.run_path({SCRIPT!r}, run_name='__main__')\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            f"print('heavy:', *[m for m in {HEAVY_MODULES!r} if m in sys.modules], file=sys.stderr)\n")
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True).stderr
+    for line in output.splitlines():
+        if line.startswith("heavy:"):
+            return line.split()[1:]
+
+    raise RuntimeError(f"the downloader failed: {output}")
+
+
+def wall_time(command, env, runs):
+    """ Best wall time of `command`, in milliseconds
+    """
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, env=env, stdout=subprocess.DEVNULL, check=True)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup benchmark")
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget-ms', dest='budget_ms', type=float, default=50,
+                        help="Max cumulative import time of zoom_recording_downloader.cli (default: 50)")
+    args = parser.parse_args()
+
+    env = dict(os.environ, DOWNLOAD_DIRECTORY=tempfile.mkdtemp(prefix='zrd-dl-'),
+               LOG_DIRECTORY=tempfile.mkdtemp(prefix='zrd-log-'),
+               ZOOM_CLIENT_ID="bench", ZOOM_CLIENT_SECRET="bench", ZOOM_ACCOUNT_ID="bench")
+    failed = False
+
+    print(f"{'python -c pass':<40} {wall_time([sys.executable, '-c', 'pass'], env, args.runs):8.1f} ms")
+
+    for module in ["zoom_recording_downloader", "zoom_recording_downloader.cli"]:
+        best = min(import_time(module) for _ in range(args.runs))
+        over = module.endswith(".cli") and best > args.budget_ms
+        failed = failed or over
+        print(f"{'import ' + module:<40} {best:8.1f} ms{'  OVER BUDGET' if over else ''}")
+
+    for label, arguments in [("--help", ["--help"]), ("no-op run (verify, empty archive)", ["verify"])]:
+        heavy = imported_modules(arguments, env)
+        failed = failed or bool(heavy)
+        print(f"{label:<40} {wall_time([sys.executable, SCRIPT] + arguments, env, args.runs):8.1f} ms"
+              f"{'  imports ' + ', '.join(heavy) if heavy else ''}")
+
+    sys.path.insert(0, REPO_DIRECTORY)
+    from zoom_recording_downloader.downloader import parse_start_time
+
+    number = 100000
+    fast = timeit.timeit(lambda: parse_start_time("2024-01-02T10:00:00Z"), number=number)
+    print(f"{'parse_start_time':<40} {fast / number * 1e6:8.2f} us")
+    try:
+        import dateutil.parser
+        slow = timeit.timeit(lambda: dateutil.parser.parse("2024-01-02T10:00:00Z"), number=number)
+        print(f"{'dateutil.parser.parse':<40} {slow / number * 1e6:8.2f} us")
+    except ImportError:
+        pass
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Compares the download write path strategies (read strategy, buffer size,
+# preallocation) against an unthrottled local stub server running in a child
+# process. Reports throughput and the CPU time spent per GB downloaded.
+#
+# Usage: python3 benchmarks/bench_write_path.py [--files 4] [--size-mb 256]
+
+import argparse
+import os
+import shutil
+import time
+
+from common import StubServerProcess, load_downloader
+
+STRATEGIES = [
+    # (read strategy, chunk size, preallocate)
+    ("iter_content", 32 * 1024, False),
+    ("iter_content", 1024 * 1024, False),
+    ("readinto", 256 * 1024, False),
+    ("readinto", 1024 * 1024, False),
+    ("readinto", 4 * 1024 * 1024, False),
+    ("readinto", 4 * 1024 * 1024, True),
+]
+
+
+def run(downloader, server_url, files, size, strategy, chunk_size, preallocate):
+    downloader.configure_write_path(chunk_size, strategy, preallocate)
+
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    for n in range(files):
+        result = downloader.download_recording(f"{server_url}/files/{size}/{n}", "bench",
+                                               f"file-{n}.mp4", "write-path", size)
+        if not result:
+            raise RuntimeError("download failed")
+        os.remove(result["path"])
+        os.remove(result["path"] + downloader.CHECKSUM_EXTENSION)
+
+    return time.perf_counter() - wall_started, time.process_time() - cpu_started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download write path benchmark")
+    parser.add_argument('--files', type=int, default=4)
+    parser.add_argument('--size-mb', type=float, default=256)
+    args = parser.parse_args()
+
+    downloader = load_downloader()
+    size = int(args.size_mb * 1024 * 1024)
+    total_gb = args.files * size / 1024 ** 3
+
+    print(f"{args.files} files x {args.size_mb} MB")
+    print(f"{'strategy':>13} {'chunk':>7} {'falloc':>6} {'MB/s':>8} {'CPU s/GB':>9}")
+
+    with StubServerProcess() as server:
+        for strategy, chunk_size, preallocate in STRATEGIES:
+            wall, cpu = run(downloader, server.url, args.files, size, strategy, chunk_size, preallocate)
+            print(f"{strategy:>13} {chunk_size // 1024:>6}K {'yes' if preallocate else 'no':>6} "
+                  f"{total_gb * 1024 / wall:>8.1f} {cpu / total_gb:>9.2f}")
+
+    shutil.rmtree(downloader.DOWNLOAD_DIRECTORY, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+# Helpers shared by the benchmarks: a local stub HTTP server that serves
+# synthetic recording files, and a loader for the downloader module.
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+REPO_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHUNK = 64 * 1024
+PATTERN = bytes(range(251)) * (CHUNK // 251 + 2)
+
+
+def load_downloader(download_directory=None, log_directory=None):
+    """ Import the downloader module with dummy credentials
+    """
+    os.environ.setdefault('ZOOM_CLIENT_ID', 'bench')
+    os.environ.setdefault('ZOOM_CLIENT_SECRET', 'bench')
+    os.environ.setdefault('ZOOM_ACCOUNT_ID', 'bench')
+    os.environ['DOWNLOAD_DIRECTORY'] = download_directory or tempfile.mkdtemp(prefix='zrd-dl-')
+    os.environ['LOG_DIRECTORY'] = log_directory or tempfile.mkdtemp(prefix='zrd-log-')
+    os.environ.setdefault('TQDM_DISABLE', '1')
+
+    if REPO_DIRECTORY not in sys.path:
+        sys.path.insert(0, REPO_DIRECTORY)
+    from zoom_recording_downloader import downloader
+
+    downloader.load_environment()
+    # The stub servers don't check the token: never fetch one from Zoom
+    downloader.set_access_token('bench', float('inf'))
+    return downloader
+
+
+class _FileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        # /files/<size>/<name>, any query string (e.g. access_token) is ignored
+        parts = urlparse(self.path).path.strip('/').split('/')
+        self.send_file(int(parts[1]) if len(parts) > 2 else self.server.default_size)
+
+    def drop_point(self, length):
+        """ Number of bytes of the body after which the connection is dropped
+        """
+        return self.server.drop_after or length + 1
+
+    def send_file(self, size):
+        """ Sends `size` bytes of payload, or the requested range of them,
+            and returns the number of bytes of the body sent
+        """
+        rate = self.server.bytes_per_second
+
+        start, end = 0, size - 1
+        requested_range = self.headers.get("Range", "")
+        if requested_range.startswith("bytes=") and self.server.ranges:
+            first, _, last = requested_range[len("bytes="):].partition("-")
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return 0
+
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+
+        length = end - start + 1
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes" if self.server.ranges else "none")
+        self.end_headers()
+
+        # Drop the connection after this many bytes of the body
+        drop_after = self.drop_point(length)
+
+        sent = 0
+        started = time.monotonic()
+        while sent < length:
+            n = min(CHUNK, length - sent, drop_after - sent)
+            if n <= 0:
+                self.close_connection = True
+                return sent
+
+            self.wfile.write(payload(start + sent, n))
+            sent += n
+            if rate:
+                # Throttle each connection independently, like a CDN edge would
+                ahead = sent / rate - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+        return sent
+
+
+def payload(offset, length):
+    """ Deterministic file content: byte i of every file is i % 251
+    """
+    start = offset % 251
+    return PATTERN[start:start + length]
+
+
+class StubServer:
+    """ Serves `/files/<size>/<name>` with a per-connection bandwidth cap,
+        optional Range support and connections dropped after `drop_after` bytes
+    """
+
+    def __init__(self, bytes_per_second=0, default_size=1024 * 1024, ranges=True, drop_after=0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _FileHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.bytes_per_second = bytes_per_second
+        self.httpd.default_size = default_size
+        self.httpd.ranges = ranges
+        self.httpd.drop_after = drop_after
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _serve(connection, kwargs):
+    with StubServer(**kwargs) as server:
+        connection.send(server.url)
+        connection.recv()  # block until asked to stop
+
+
+class StubServerProcess:
+    """ StubServer running in a child process, so that its CPU time is not
+        counted in the benchmark's own
+    """
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.url = None
+
+    def __enter__(self):
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_serve, args=(child_connection, self.kwargs),
+                                               daemon=True)
+        self.process.start()
+        self.url = self.connection.recv()
+        return self
+
+    def __exit__(self, *exc):
+        self.connection.send(None)
+        self.process.join(timeout=5)
@@ -0,0 +1,484 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# A local simulator of the Zoom endpoints used by zoom-recording-downloader.py:
+# the OAuth token, the users, the recordings of a user (date windows and
+# next_page_token), the download URLs, the meeting summaries and the deletion
+# of the recordings of a meeting.
+#
+# The account (users, meetings, files and their sizes) is generated from a
+# seed. Latency, a per-connection bandwidth cap, throttled (429) and failed
+# (503) responses and dropped downloads can be injected.
+#
+# Usage: python3 benchmarks/zoom_simulator.py [--port 8080] [--users 10] [--meetings 5]
+# then run the downloader with the printed ZOOM_API_ENDPOINT and ZOOM_OAUTH_URL.
+
+import argparse
+import base64
+import collections
+import hashlib
+import json
+import multiprocessing
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from common import _FileHandler
+
+# (file_type, file_extension, recording_type, share of the file size)
+FILE_TYPES = [
+    ("MP4", "MP4", "shared_screen_with_speaker_view", 1.0),
+    ("M4A", "M4A", "audio_only", 0.1),
+    ("TRANSCRIPT", "VTT", "audio_transcript", 0.001),
+    ("CHAT", "TXT", "chat_file", 0.001),
+    ("TIMELINE", "JSON", "timeline", 0.001),
+]
+MAX_PAGE_SIZE = 300
+
+
+class Account:
+    """ The users and meetings of a simulated Zoom account. Meetings start
+        between `days` ago and now (but not before January 1st, where the
+        downloader starts listing by default), and their file sizes vary by
+        ±50% around `file_size`.
+    """
+
+    def __init__(self, users=10, meetings_per_user=5, files_per_meeting=4, file_size=1024 * 1024,
+                 days=60, seed=0):
+        rng = random.Random(seed)
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        earliest = max(now - timedelta(days=days), now.replace(month=1, day=1, hour=0, minute=0, second=0))
+
+        self.users = []
+        self.meetings = {}  # uuid -> meeting
+        self.user_meetings = {}  # email and user id -> meetings, oldest first
+        self.files = {}  # file id -> size
+        self.deleted = set()
+        self._lock = threading.Lock()
+
+        for n in range(users):
+            user = {"id": f"user{n:06d}", "email": f"user{n}@example.com",
+                    "first_name": "User", "last_name": str(n), "type": 2}
+            self.users.append(user)
+
+            meetings = []
+            for m in range(meetings_per_user):
+                meeting_id = 80000000000 + n * meetings_per_user + m
+                digest = hashlib.sha256(f"{seed}:{meeting_id}".encode()).digest()[:16]
+                start_time = earliest + timedelta(seconds=rng.randrange(int((now - earliest).total_seconds()) or 1))
+                meeting = {
+                    "uuid": base64.b64encode(digest, altchars=b"+-").decode(),
+                    "id": meeting_id,
+                    "host_id": user["id"],
+                    "host_email": user["email"],
+                    "topic": f"Meeting {m} of user {n}",
+                    "start_time": start_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "duration": 60,
+                    "recording_files": [],
+                }
+                for file_type, extension, recording_type, share in FILE_TYPES[:files_per_meeting]:
+                    file_id = hashlib.sha1(f"{meeting['uuid']}:{file_type}".encode()).hexdigest()
+                    size = max(1024, int(file_size * share * rng.uniform(0.5, 1.5)))
+                    self.files[file_id] = size
+                    meeting["recording_files"].append({
+                        "id": file_id,
+                        "meeting_id": meeting["uuid"],
+                        "recording_start": meeting["start_time"],
+                        "file_type": file_type,
+                        "file_extension": extension,
+                        "file_size": size,
+                        "recording_type": recording_type,
+                        "status": "completed",
+                    })
+                meeting["total_size"] = sum(f["file_size"] for f in meeting["recording_files"])
+                meeting["recording_count"] = len(meeting["recording_files"])
+                meetings.append(meeting)
+                self.meetings[meeting["uuid"]] = meeting
+
+            meetings.sort(key=lambda meeting: meeting["start_time"])
+            self.user_meetings[user["email"]] = self.user_meetings[user["id"]] = meetings
+
+    @property
+    def total_bytes(self):
+        return sum(self.files.values())
+
+    def recordings(self, user, start, end):
+        """ The meetings of a user that started in [start, end] (dates) and
+            weren't deleted
+        """
+        with self._lock:
+            return [
+                meeting for meeting in self.user_meetings.get(user, [])
+                if start <= meeting["start_time"][:10] <= end and meeting["uuid"] not in self.deleted
+            ]
+
+    def delete(self, uuid):
+        with self._lock:
+            if uuid not in self.meetings or uuid in self.deleted:
+                return False
+            self.deleted.add(uuid)
+            return True
+
+
+class _ZoomHandler(_FileHandler):
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_DELETE(self):
+        self.handle_request("DELETE")
+
+    def handle_request(self, method):
+        url = urlparse(self.path)
+        # The downloader joins "https://api.zoom.us/v2/" and "/users"
+        parts = [part for part in url.path.split("/") if part]
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        simulator = self.server.simulator
+
+        route = simulator.route(method, parts)
+        if route is None:
+            return self.send_json(404, {"code": 404, "message": "Not found"}, "unknown")
+
+        endpoint, handler, parameter = route
+        if simulator.latency:
+            time.sleep(simulator.latency)
+
+        if endpoint != "token":
+            token = query.get("access_token") if endpoint == "download" else \
+                self.headers.get("Authorization", "").partition("Bearer ")[2]
+            if not simulator.valid_token(token):
+                return self.send_json(401, {"code": 124, "message": "Invalid access token."}, endpoint)
+
+        fault = simulator.fault(endpoint)
+        if fault == 429:
+            return self.send_json(429, {"code": 429, "message": "Too many requests."}, endpoint,
+                                  {"Retry-After": str(simulator.retry_after)})
+        if fault == 503:
+            return self.send_json(503, {"code": 503, "message": "Service unavailable."}, endpoint)
+
+        handler(self, parameter, query)
+
+    def send_json(self, status, body, endpoint, headers=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.simulator.count(endpoint, status)
+
+    def drop_point(self, length):
+        return self.server.simulator.drop_point(length) or super().drop_point(length)
+
+    # Endpoints
+
+    def token(self, _, query):
+        if not self.headers.get("Authorization", "").startswith("Basic "):
+            return self.send_json(400, {"reason": "Invalid client_id or client_secret",
+                                        "error": "invalid_client"}, "token")
+        access_token, expires_in = self.server.simulator.issue_token()
+        self.send_json(200, {"access_token": access_token, "token_type": "bearer",
+                             "expires_in": expires_in, "scope": "user:read:admin recording:read:admin"},
+                       "token")
+
+    def users(self, _, query):
+        account = self.server.simulator.account
+        page_size = min(int(query.get("page_size", 30)), MAX_PAGE_SIZE)
+        page_number = max(1, int(query.get("page_number", 1)))
+        users = account.users[(page_number - 1) * page_size:page_number * page_size]
+        self.send_json(200, {
+            "page_count": max(1, -(-len(account.users) // page_size)),
+            "page_number": page_number,
+            "page_size": page_size,
+            "total_records": len(account.users),
+            "users": users,
+        }, "users")
+
+    def recordings(self, user, query):
+        account = self.server.simulator.account
+        if user not in account.user_meetings:
+            return self.send_json(404, {"code": 1001, "message": "User does not exist."}, "recordings")
+
+        # Dates, or the str() of datetimes
+        start = query.get("from", "0000-00-00")[:10]
+        end = query.get("to", "9999-99-99")[:10]
+        page_size = min(int(query.get("page_size", 30)), MAX_PAGE_SIZE)
+        offset = int(query.get("next_page_token") or 0)
+
+        meetings = account.recordings(user, start, end)
+        page = meetings[offset:offset + page_size]
+        base_url = self.server.simulator.url
+        self.send_json(200, {
+            "from": start,
+            "to": end,
+            "page_size": page_size,
+            "total_records": len(meetings),
+            "next_page_token": str(offset + page_size) if offset + page_size < len(meetings) else "",
+            "meetings": [dict(meeting, recording_files=[
+                dict(file, download_url=f"{base_url}/rec/download/{file['id']}")
+                for file in meeting["recording_files"]
+            ]) for meeting in page],
+        }, "recordings")
+
+    def download(self, file_id, query):
+        size = self.server.simulator.account.files.get(file_id)
+        if size is None:
+            return self.send_json(404, {"code": 3301, "message": "File not found."}, "download")
+
+        sent = self.send_file(size)
+        self.server.simulator.count("download", 206 if self.headers.get("Range") else 200, sent)
+
+    def summary(self, uuid, query):
+        meeting = self.server.simulator.account.meetings.get(uuid)
+        # Only every other meeting has a summary
+        if meeting is None or meeting["id"] % 2:
+            return self.send_json(404, {"code": 3001, "message": "Meeting summary not found."}, "summary")
+
+        self.send_json(200, {
+            "meeting_uuid": meeting["uuid"],
+            "meeting_topic": meeting["topic"],
+            "summary_title": meeting["topic"],
+            "summary_overview": "A simulated meeting.",
+            "summary_details": [{"label": "Agenda", "summary": "Nothing in particular."}],
+            "next_steps": ["Download the recording."],
+        }, "summary")
+
+    def delete(self, uuid, query):
+        if not self.server.simulator.account.delete(uuid):
+            return self.send_json(404, {"code": 3301, "message": "No recording."}, "delete")
+
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        self.server.simulator.count("delete", 204)
+
+
+class ZoomSimulator:
+    """ Serves a simulated Account over HTTP. `latency` seconds are added to
+        every request; `throttle_rate` and `error_rate` are the shares of
+        requests answered with 429 (with a Retry-After of `retry_after`
+        seconds) and 503, and `drop_rate` the share of downloads whose
+        connection is dropped halfway. Faults are drawn from a seeded
+        generator.
+    """
+
+    def __init__(self, users=10, meetings_per_user=5, files_per_meeting=4, file_size=1024 * 1024, days=60,
+                 latency=0.0, bytes_per_second=0, throttle_rate=0.0, error_rate=0.0, drop_rate=0.0,
+                 retry_after=1, token_ttl=3600, seed=0, host="127.0.0.1", port=0):
+        self.account = Account(users, meetings_per_user, files_per_meeting, file_size, days, seed)
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.retry_after = retry_after
+        self.token_ttl = token_ttl
+
+        self._rng = random.Random(seed)
+        self._tokens = set()
+        self._requests = collections.Counter()
+        self._bytes_sent = 0
+        self._lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), _ZoomHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.simulator = self
+        # Read by _FileHandler.send_file
+        self.httpd.bytes_per_second = bytes_per_second
+        self.httpd.default_size = file_size
+        self.httpd.ranges = True
+        self.httpd.drop_after = 0
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def environment(self):
+        """ The environment variables pointing the downloader to the simulator
+        """
+        return {"ZOOM_API_ENDPOINT": f"{self.url}/v2/", "ZOOM_OAUTH_URL": f"{self.url}/oauth/token"}
+
+    def route(self, method, parts):
+        """ Returns the (endpoint, handler, path parameter) of a request, or None
+        """
+        if method == "POST" and parts == ["oauth", "token"]:
+            return "token", _ZoomHandler.token, None
+        if method == "GET" and len(parts) == 3 and parts[:2] == ["rec", "download"]:
+            return "download", _ZoomHandler.download, parts[2]
+        if parts[:1] != ["v2"]:
+            return None
+
+        parts = parts[1:]
+        if method == "GET" and parts == ["users"]:
+            return "users", _ZoomHandler.users, None
+        if len(parts) != 3:
+            return None
+        if method == "GET" and parts[0] == "users" and parts[2] == "recordings":
+            return "recordings", _ZoomHandler.recordings, parts[1]
+        if method == "GET" and parts[0] == "meetings" and parts[2] == "meeting_summary":
+            return "summary", _ZoomHandler.summary, parts[1]
+        if method == "DELETE" and parts[0] == "meetings" and parts[2] == "recordings":
+            return "delete", _ZoomHandler.delete, parts[1]
+
+        return None
+
+    def issue_token(self):
+        with self._lock:
+            access_token = f"sim-{len(self._tokens) + 1}"
+            self._tokens.add(access_token)
+        return access_token, self.token_ttl
+
+    def valid_token(self, access_token):
+        with self._lock:
+            return access_token in self._tokens
+
+    def fault(self, endpoint):
+        """ The injected status of a request (429 or 503), or None
+        """
+        if endpoint == "token":
+            return None
+
+        with self._lock:
+            draw = self._rng.random()
+        if draw < self.throttle_rate:
+            # Downloads aren't rate limited
+            return 429 if endpoint != "download" else None
+        if draw < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+    def drop_point(self, length):
+        """ Where to drop a download, or 0 to send it whole
+        """
+        if not self.drop_rate:
+            return 0
+
+        with self._lock:
+            if self._rng.random() >= self.drop_rate:
+                return 0
+            return max(1, self._rng.randrange(length))
+
+    def count(self, endpoint, status, bytes_sent=0):
+        with self._lock:
+            self._requests[f"{endpoint} {status}"] += 1
+            self._bytes_sent += bytes_sent
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": dict(sorted(self._requests.items())),
+                "api_requests": sum(n for key, n in self._requests.items() if not key.startswith("download")),
+                "downloads": sum(n for key, n in self._requests.items() if key.startswith("download")),
+                "bytes_sent": self._bytes_sent,
+                "deleted_meetings": len(self.account.deleted),
+                "meetings": len(self.account.meetings),
+                "files": len(self.account.files),
+                "total_bytes": self.account.total_bytes,
+            }
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _serve(connection, kwargs):
+    with ZoomSimulator(**kwargs) as simulator:
+        connection.send(simulator.environment)
+        while connection.recv() == "stats":
+            connection.send(simulator.stats())
+
+
+class ZoomSimulatorProcess:
+    """ ZoomSimulator running in a child process, so that it doesn't compete
+        with the downloader for the GIL
+    """
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.environment = None
+
+    def stats(self):
+        self.connection.send("stats")
+        return self.connection.recv()
+
+    def __enter__(self):
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_serve, args=(child_connection, self.kwargs),
+                                               daemon=True)
+        self.process.start()
+        self.environment = self.connection.recv()
+        return self
+
+    def __exit__(self, *exc):
+        self.connection.send(None)
+        self.process.join(timeout=5)
+
+
+def add_simulator_arguments(parser):
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--meetings', type=int, default=5, help="Meetings per user")
+    parser.add_argument('--files', type=int, default=4, choices=range(1, len(FILE_TYPES) + 1),
+                        help="Files per meeting")
+    parser.add_argument('--size-mb', type=float, default=1, help="Average size of the MP4 files")
+    parser.add_argument('--days', type=int, default=60, help="Meetings are spread over the last DAYS days")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument('--rate-mb', type=float, default=0,
+                        help="Per-connection bandwidth cap in MB/s (0 = unlimited)")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Share of API requests answered 429")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered 503")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="Share of downloads dropped halfway")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After of the 429 responses")
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def simulator_options(args):
+    """ ZoomSimulator keyword arguments from add_simulator_arguments' options
+    """
+    return {
+        "users": args.users,
+        "meetings_per_user": args.meetings,
+        "files_per_meeting": args.files,
+        "file_size": int(args.size_mb * 1024 * 1024),
+        "days": args.days,
+        "latency": args.latency,
+        "bytes_per_second": int(args.rate_mb * 1024 * 1024),
+        "throttle_rate": args.throttle_rate,
+        "error_rate": args.error_rate,
+        "drop_rate": args.drop_rate,
+        "retry_after": args.retry_after,
+        "seed": args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Zoom API simulator")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8080)
+    add_simulator_arguments(parser)
+    args = parser.parse_args()
+
+    with ZoomSimulator(host=args.host, port=args.port, **simulator_options(args)) as simulator:
+        for name, value in simulator.environment.items():
+            print(f"export {name}={value}")
+        try:
+            simulator.thread.join()
+        except KeyboardInterrupt:
+            print(json.dumps(simulator.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,81 +1,57 @@
 #! /usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+# Renames the recordings downloaded by older versions (e.g.
+# "GMT20240102-100000_Recording.mp4") to the format of zoom-recording-downloader.py
+# ("2024.01.02 - 10.00 AM UTC - <folder> - Shared Screen With Speaker View.mp4").
+#
+# The directory is walked once with os.scandir, folder by folder; the renames
+# of each folder are planned in memory, checked for conflicts and applied in
+# parallel batches. Every rename is recorded in an undo journal (JSON lines)
+# before it is applied, so that an interrupted run can be undone too; the
+# journal is replayed backwards with --undo.
+
+import argparse
+import collections
+import json
 import os
 import re
-import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
+# Regular expression pattern to extract details from the file name
+GMT_PATTERN = re.compile(r'^GMT(\d{4})(\d{2})(\d{2})-(\d{2})(\d{2})(\d{2})_')
 
-def get_tree_structure(directory):
-    # Get the tree structure of the directory
-    tree_output = []
-    for root, _, files in os.walk(directory):
-        level = root.replace(directory, '').count(os.sep)
-        indent = ' ' * 4 * (level)
-        tree_output.append('{}{}/'.format(indent, os.path.basename(root)))
-        sub_indent = ' ' * 4 * (level + 1)
-        for f in files:
-            tree_output.append('{}{}'.format(sub_indent, f))
-    return tree_output
-
-# Argument parser for command line arguments
-parser = argparse.ArgumentParser(description="Rename files based on a specific format.")
-parser.add_argument("--dir", type=str, default=".", help="Directory to process files from. Default is current directory.")
-parser.add_argument('--dry-run', action='store_true', help='If specified, the renaming will not be performed but the intended changes will be displayed.')
-args = parser.parse_args()
-
-# Get tree structure of the given directory
-tree_content = get_tree_structure(args.dir)
-
-# Dictionary to hold folder names and their associated files
-folder_files_dict = {}
-current_folder = None
-
-# Regular expression patterns to identify folders and files
-folder_pattern = re.compile(r'^(.+)/$')
-file_pattern = re.compile(r'^    (.+)$')
-
-for line in tree_content:
-    folder_match = folder_pattern.match(line)
-    file_match = file_pattern.match(line)
-    
-    if folder_match:
-        current_folder = folder_match.group(1).strip()
-        folder_files_dict[current_folder] = []
-    elif file_match and current_folder:
-        folder_files_dict[current_folder].append(file_match.group(1).strip())
+RENAME_BATCH = 256
 
 
 def rename_file(file_name, folder_name):
     """
     Rename the file with GMT timestamp format to the desired format.
-    
+
     Args:
     - file_name (str): Original file name
     - folder_name (str): Name of the folder containing the file
-    
+
     Returns:
     - str: New file name if renaming is needed, else original file name
     """
 
-    # Ensure that the filenames contain the correct folder name (i.e., "SOGNI AVANZATI" for files in the "SOGNI AVANZATI" folder) 
+    # Ensure that the filenames contain the correct folder name (i.e., "SOGNI AVANZATI" for files in the "SOGNI AVANZATI" folder)
     # and that chat files have the .txt extension.
     if folder_name == "SOGNI AVANZATI" and "SOGNI AVANZATI" not in file_name:
         file_name = file_name.replace("SOGNI -", "SOGNI AVANZATI -")
     if ".chat" in file_name:
         file_name = file_name.replace(".chat", ".txt")
-    
-    # Regular expression pattern to extract details from the file name
-    gmt_pattern = re.compile(r'^GMT(\d{4})(\d{2})(\d{2})-(\d{2})(\d{2})(\d{2})_')
-    
-    match = gmt_pattern.match(file_name)
-    
+
+    match = GMT_PATTERN.match(file_name)
+
     # Extracting date and time details from the file name
     if match:
         year, month, day, hour, minute, second = match.groups()
     else:
         return file_name
-    
+
     # Determining the type of the file based on its extension and other details
     if ".m4a" in file_name:
         file_type = "Audio Only"
@@ -90,7 +66,7 @@ def rename_file(file_name, folder_name):
     else:
         # If the file type is not recognized, retain the original file name
         return file_name
-    
+
     # AM/PM format
     hour_int = int(hour)
     if hour_int >= 12:
@@ -98,33 +74,213 @@ def rename_file(file_name, folder_name):
         am_pm = "PM"
     else:
         am_pm = "AM"
-    
+
     # New file name in the desired format
     new_file_name = f"{year}.{month}.{day} - {hour_int:02}.{minute} {am_pm} UTC - {folder_name} - {file_type}.{file_name.split('.')[-1]}"
     return new_file_name
 
 
-# Dictionary to hold folder names and their renamed files
-renamed_files_dict = {}
+def scan_folders(directory):
+    """ Walks `directory` with os.scandir, without following symlinks, and
+        yields (folder_path, file_names) for every folder, the directory
+        itself included
+    """
+    pending = [directory]
+    while pending:
+        folder_path = pending.pop()
+        file_names = []
+        try:
+            with os.scandir(folder_path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        file_names.append(entry.name)
+        except OSError as e:
+            print(f'Skipping {folder_path}: {e}')
+            continue
+
+        yield folder_path, file_names
 
-for folder_name, files in folder_files_dict.items():
-    renamed_files = [rename_file(file, folder_name) for file in files]
-    renamed_files_dict[folder_name] = renamed_files
 
-# Displaying the renamed files for the first few folders for verification
-{key: renamed_files_dict[key] for key in list(renamed_files_dict)[:5]}
+def plan_folder(folder_path, file_names):
+    """ Returns the (renames, conflicts) of a folder, as lists of
+        (file_name, new_file_name). A rename conflicts when its target already
+        exists or is also the target of another file of the folder.
+    """
+    folder_name = os.path.basename(folder_path)
+    existing = set(file_names)
+    targets = {}
+    for file_name in file_names:
+        new_file_name = rename_file(file_name, folder_name)
+        if new_file_name != file_name:
+            targets.setdefault(new_file_name, []).append(file_name)
 
-# Perform the actual renaming of the files and print the original and renamed file names
-for folder, files in renamed_files_dict.items():
-    print(f'Folder: {folder}')
-    for original_file, renamed_file in zip(folder_files_dict[folder], files):
-        original_file_path = os.path.join(args.dir, folder, original_file)
-        renamed_file_path = os.path.join(args.dir, folder, renamed_file)
-        if not args.dry_run:
-            os.rename(original_file_path, renamed_file_path)
-        if original_file != renamed_file:
-            print(f'    Original:  {original_file}')
-            print(f'    Renamed:   {renamed_file}')
+    renames = []
+    conflicts = []
+    for new_file_name, sources in targets.items():
+        if len(sources) > 1 or new_file_name in existing:
+            conflicts.extend((source, new_file_name) for source in sources)
         else:
-            print(f'    Unchanged: {original_file}')
+            renames.append((sources[0], new_file_name))
+
+    return renames, conflicts
+
+
+def rename_batch(batch):
+    """ Renames the (folder_path, file_name, new_file_name) of a batch,
+        returning the (source_path, target_path) that succeeded and the errors
+        of the others
+    """
+    done = []
+    errors = []
+    for folder_path, file_name, new_file_name in batch:
+        source_path = folder_path + os.sep + file_name
+        target_path = folder_path + os.sep + new_file_name
+        try:
+            if os.path.exists(target_path):
+                # Created since the folder was scanned
+                raise FileExistsError(f"{target_path} already exists")
+            os.rename(source_path, target_path)
+            done.append((source_path, target_path))
+        except OSError as e:
+            errors.append((source_path, e))
+
+    return done, errors
+
+
+def journal_batch(journal, batch):
+    """ Records the renames of a batch in the undo journal, on disk, before
+        they are applied. Undo skips the renames that didn't happen.
+    """
+    lines = []
+    for folder_path, file_name, new_file_name in batch:
+        lines.append(json.dumps({"source": folder_path + os.sep + file_name,
+                                 "target": folder_path + os.sep + new_file_name}) + "\n")
+    journal.write(''.join(lines))
+    journal.flush()
+    os.fsync(journal.fileno())
+
+
+def batches(renames, size):
+    batch = []
+    for rename in renames:
+        batch.append(rename)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def standardize(directory, journal_filename, dry_run, workers):
+    """ Plans the renames of `directory` folder by folder and, unless
+        `dry_run`, applies them on `workers` threads, recording each rename in
+        the journal beforehand. Returns the counts of renamed, unchanged, conflicting and
+        failed files.
+    """
+    counts = {"renamed": 0, "unchanged": 0, "conflicts": 0, "errors": 0}
+
+    def planned_renames():
+        # Absolute paths, so that the journal can be replayed from anywhere
+        for folder_path, file_names in scan_folders(os.path.abspath(directory)):
+            renames, conflicts = plan_folder(folder_path, file_names)
+            counts["unchanged"] += len(file_names) - len(renames) - len(conflicts)
+            counts["conflicts"] += len(conflicts)
+            if not renames and not conflicts:
+                continue
+
+            # One write per folder
+            lines = [f'Folder: {folder_path}']
+            for file_name, new_file_name in renames:
+                lines.append(f'    Original:  {file_name}')
+                lines.append(f'    Renamed:   {new_file_name}')
+            for file_name, new_file_name in conflicts:
+                lines.append(f'    Conflict:  {file_name} -> {new_file_name}')
+            print('\n'.join(lines))
+
+            for file_name, new_file_name in renames:
+                yield folder_path, file_name, new_file_name
+
+    if dry_run:
+        for _ in planned_renames():
+            counts["renamed"] += 1
+        return counts
+
+    def record(done, errors):
+        counts["renamed"] += len(done)
+        counts["errors"] += len(errors)
+        for source_path, error in errors:
+            print(f'    Error:     {source_path}: {error}')
+
+    workers = max(1, workers)
+    with open(journal_filename, 'a', encoding='utf-8') as journal, \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+        # The batches are journaled, then renamed in parallel while the walk
+        # goes on, with at most 2 batches per worker in flight
+        in_flight = collections.deque()
+        for batch in batches(planned_renames(), RENAME_BATCH):
+            journal_batch(journal, batch)
+            in_flight.append(executor.submit(rename_batch, batch))
+            if len(in_flight) >= 2 * workers:
+                record(*in_flight.popleft().result())
+
+        while in_flight:
+            record(*in_flight.popleft().result())
+
+    if not counts["renamed"] and not os.path.getsize(journal_filename):
+        os.remove(journal_filename)
+
+    return counts
+
+
+def undo(journal_filename, dry_run):
+    """ Reverts the renames recorded in a journal, the last one first
+    """
+    with open(journal_filename, 'r', encoding='utf-8') as journal:
+        entries = [json.loads(line) for line in journal if line.strip()]
+
+    reverted = 0
+    for entry in reversed(entries):
+        if os.path.exists(entry["source"]) or not os.path.exists(entry["target"]):
+            print(f'    Skipped:   {entry["target"]}')
+            continue
+
+        print(f'    Restored:  {entry["source"]}')
+        if not dry_run:
+            os.rename(entry["target"], entry["source"])
+        reverted += 1
+
+    return reverted
+
+
+def main():
+    # Argument parser for command line arguments
+    parser = argparse.ArgumentParser(description="Rename files based on a specific format.")
+    parser.add_argument("--dir", type=str, default=".", help="Directory to process files from. Default is current directory.")
+    parser.add_argument('--dry-run', action='store_true', help='If specified, the renaming will not be performed but the intended changes will be displayed.')
+    parser.add_argument('--workers', type=int, default=8, help='Number of threads renaming files. Default is 8.')
+    parser.add_argument('--journal', type=str, default=None,
+                        help='Undo journal to record the renames to. Default is '
+                             'standardize-filenames-<timestamp>.jsonl in the current directory.')
+    parser.add_argument('--undo', type=str, metavar='JOURNAL', default=None,
+                        help='Revert the renames recorded in this undo journal.')
+    args = parser.parse_args()
+
+    if args.undo:
+        reverted = undo(args.undo, args.dry_run)
+        print(f'{reverted} files restored')
+        return
+
+    journal_filename = args.journal or datetime.now().strftime('standardize-filenames-%Y%m%d-%H%M%S.jsonl')
+    counts = standardize(args.dir, journal_filename, args.dry_run, args.workers)
+
     print('')
+    print(f'{counts["renamed"]} renamed, {counts["unchanged"]} unchanged, '
+          f'{counts["conflicts"]} conflicts, {counts["errors"]} errors')
+    if counts["renamed"] and not args.dry_run:
+        print(f'Undo with: {os.path.basename(__file__)} --undo {journal_filename}')
+
+
+if __name__ == "__main__":
+    main()
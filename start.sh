@@ -1,5 +1,13 @@
 #!/bin/sh
 cd /app
+
+if [ "$RUN_MODE" = "daemon" ]; then
+    # One long-running process instead of a daily cron job: it receives the
+    # SIGTERM of `docker stop` and finishes the downloads in progress
+    exec python3 -u /app/zoom-recording-downloader.py --daemon --no-delete ${WEBHOOK_PORT:+--webhook-port $WEBHOOK_PORT} \
+        ${BANDWIDTH_LIMIT:+--bandwidth-limit $BANDWIDTH_LIMIT} ${BANDWIDTH_SCHEDULE:+--bandwidth-schedule $BANDWIDTH_SCHEDULE}
+fi
+
 ./crontab_setup.sh
 crond -l 8
-tail -f /var/log/zoom-recording-downloader/app.log /var/log/zoom-recording-downloader/error.log 
\ No newline at end of file
+tail -f /var/log/zoom-recording-downloader/app.log /var/log/zoom-recording-downloader/error.log 
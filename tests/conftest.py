@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+import pytest
+
+REPO_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIRECTORY)
+# The stub servers and the Zoom API simulator of the benchmarks
+sys.path.insert(0, os.path.join(REPO_DIRECTORY, "benchmarks"))
+
+from zoom_recording_downloader import downloader as downloader_module  # noqa: E402
+
+
+@pytest.fixture
+def downloader(tmp_path, monkeypatch):
+    """ The downloader module, configured with temporary download and log
+        directories; its module state is restored after the test
+    """
+    monkeypatch.setenv("TQDM_DISABLE", "1")
+    for name in ["DOWNLOAD_DIRECTORY", "LOG_DIRECTORY", "CLIENT_ID", "CLIENT_SECRET", "ACCOUNT_ID",
+                 "WEBHOOK_SECRET_TOKEN", "API_ENDPOINT", "OAUTH_URL", "SYNC_CURSORS_FILE",
+                 "COMPLETED_MEETING_IDS_LOG", "STATE_DB", "ACCESS_TOKEN_CACHE", "SEARCH_DB", "STATE",
+                 "ACCESS_TOKEN", "ACCESS_TOKEN_EXPIRES_AT", "ACCESS_TOKEN_FAILURES",
+                 "ACCESS_TOKEN_RETRY_AT", "API_EXECUTOR", "HTTP_SESSION", "SHARD",
+                 "RECORDING_FROM_DATE", "RECORDING_END_DATE", "FULL_RESCAN", "DELETIONS", "INDEXER",
+                 "BANDWIDTH", "API_CONCURRENCY"]:
+        monkeypatch.setattr(downloader_module, name, getattr(downloader_module, name))
+    for name in ["SYNC_CURSORS", "SYNC_PENDING", "SYNC_WINDOWS", "LEASED_MEETINGS", "RATE_LIMITERS"]:
+        monkeypatch.setattr(downloader_module, name, type(getattr(downloader_module, name))())
+
+    downloader_module.load_environment({
+        "DOWNLOAD_DIRECTORY": str(tmp_path / "downloads"),
+        "LOG_DIRECTORY": str(tmp_path / "logs"),
+        "ZOOM_CLIENT_ID": "test",
+        "ZOOM_CLIENT_SECRET": "test",
+        "ZOOM_ACCOUNT_ID": "test",
+    })
+    # The fake API answers at once: no pacing
+    downloader_module.configure_rate_limits({category: 100000 for category in downloader_module.RATE_LIMITS}, 16)
+    downloader_module.SHUTDOWN.clear()
+    downloader_module.METRICS.reset()
+    yield downloader_module
+
+    downloader_module.SHUTDOWN.clear()
+    if downloader_module.STATE is not None:
+        downloader_module.STATE.close()
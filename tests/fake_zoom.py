@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+# An in-process fake of the Zoom endpoints used by the downloader, installed
+# in place of downloader.http_request: /users (page_number and
+# next_page_token), /users/{id}/recordings (from/to and next_page_token), the
+# meeting summaries (always 404) and the OAuth token endpoint.
+
+import collections
+import json
+import os
+import threading
+from datetime import date, timedelta
+from urllib.parse import urlparse
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.headers = headers or {}
+        self._data = data if data is not None else {}
+        self.text = json.dumps(self._data)
+
+    def json(self):
+        return self._data
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeZoom:
+    """ `users` is a list of user dicts, `meetings` maps user ids to their
+        meetings (with "uuid" and "start_time"). Lists are paged by
+        `page_size`; with `repeat_last`, each recordings page starts with the
+        last meeting of the previous one, as Zoom does when recordings are
+        added while a listing is paged.
+    """
+
+    def __init__(self, users, meetings, page_size=2, repeat_last=False):
+        self.users = users
+        self.meetings = meetings
+        self.page_size = page_size
+        self.repeat_last = repeat_last
+        self.token_status = 200
+        self.users_status = 200
+        self.requests = collections.Counter()
+        self._lock = threading.Lock()
+
+    def install(self, downloader, monkeypatch):
+        monkeypatch.setattr(downloader, "http_request", self.http_request)
+        return self
+
+    def http_request(self, method, url, params=None, **kwargs):
+        parts = [part for part in urlparse(url).path.split("/") if part]
+        if parts[-2:] == ["oauth", "token"]:
+            return self.count("token", self.token())
+        if parts[-1] == "v2" or parts[-1:] == ["users"]:
+            return self.count("users", self.user_page(params))
+        if parts[-1] == "recordings" and method == "GET":
+            return self.count("recordings", self.recordings_page(parts[-2], params))
+        if parts[-1] == "meeting_summary":
+            return self.count("summary", FakeResponse(404, {"code": 3322}))
+
+        return self.count("other", FakeResponse(404, {"message": f"{method} {url}"}))
+
+    def count(self, endpoint, response):
+        with self._lock:
+            self.requests[endpoint] += 1
+        return response
+
+    def token(self):
+        if self.token_status != 200:
+            return FakeResponse(self.token_status, {"reason": "unavailable"})
+        return FakeResponse(200, {"access_token": "fake", "expires_in": 3600})
+
+    def user_page(self, params):
+        if self.users_status != 200:
+            return FakeResponse(self.users_status, {"message": "unavailable"})
+
+        params = params or {}
+        if "next_page_token" in params:
+            start = int(params["next_page_token"])
+        else:
+            start = (int(params.get("page_number", 1)) - 1) * self.page_size
+        page = self.users[start:start + self.page_size]
+        end = start + self.page_size
+        return FakeResponse(200, {
+            "page_count": -(-len(self.users) // self.page_size),
+            "page_size": self.page_size,
+            "total_records": len(self.users),
+            "next_page_token": str(end) if end < len(self.users) else "",
+            "users": page,
+        })
+
+    def recordings_page(self, user_id, params):
+        start_date, end_date = str(params["from"])[:10], str(params["to"])[:10]
+        meetings = [meeting for meeting in self.meetings.get(user_id, [])
+                    if start_date <= meeting["start_time"][:10] <= end_date]
+
+        offset = int(params.get("next_page_token") or 0)
+        end = offset + self.page_size
+        page = meetings[offset:end]
+        if self.repeat_last and offset:
+            page = [meetings[offset - 1]] + page
+        return FakeResponse(200, {
+            "from": start_date,
+            "to": end_date,
+            "page_size": self.page_size,
+            "total_records": len(meetings),
+            "next_page_token": str(end) if end < len(meetings) else "",
+            "meetings": page,
+        })
+
+
+def make_account(users=3, meetings_per_user=5, start=None):
+    """ Users and meetings, one meeting a day per user from the `start` date
+        (by default a few days ago, within the current year), each with an
+        MP4 file
+    """
+    today = date.today()
+    start = start or max(today - timedelta(days=meetings_per_user), date(today.year, 1, 1))
+    user_list = [{"id": f"user{n}", "email": f"user{n}@example.com", "first_name": "User", "last_name": str(n)}
+                 for n in range(users)]
+    meetings = {}
+    for n, user in enumerate(user_list):
+        meetings[user["id"]] = [{
+            "uuid": f"meeting-{n}-{m}",
+            "id": n * 1000 + m,
+            "topic": f"Meeting {m}",
+            "start_time": f"{start + timedelta(days=m):%Y-%m-%d}T10:00:00Z",
+            "recording_files": [{
+                "id": f"file-{n}-{m}",
+                "file_type": "MP4",
+                "file_extension": "MP4",
+                "file_size": 1024,
+                "recording_type": "shared_screen_with_speaker_view",
+                "download_url": f"https://zoom.us/rec/download/file-{n}-{m}",
+            }],
+        } for m in range(meetings_per_user)]
+
+    return user_list, meetings
+
+
+def fake_downloads(downloader, monkeypatch, failing=(), interrupting=()):
+    """ Replaces the downloads with empty files, failing those of the `failing`
+        file ids, and setting SHUTDOWN during those of the `interrupting` ones
+    """
+    def download_recording(download_url, email, filename, subfolder, file_size=0, file_id=None):
+        if file_id in interrupting:
+            downloader.SHUTDOWN.set()
+            return None
+        if file_id in failing:
+            return None
+        path = downloader.target_path(email, subfolder, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'wb').close()
+        return {"path": path, "bytes": file_size, "sha256": "0" * 64}
+
+    monkeypatch.setattr(downloader, "download_recording", download_recording)
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+from fake_zoom import FakeZoom, make_account
+
+
+def test_failed_token_fetches_are_not_repeated_by_every_call(downloader, monkeypatch):
+    users, meetings = make_account(users=4)
+    zoom = FakeZoom(users, meetings).install(downloader, monkeypatch)
+    zoom.token_status = 503
+
+    downloader.load_access_token()
+    for _ in range(20):
+        downloader.api_request("medium", "GET", downloader.API_ENDPOINT + "/users")
+
+    assert zoom.requests["token"] == 1
+    assert downloader.ACCESS_TOKEN is None
+
+    # Once the backoff has passed, the token is fetched again
+    zoom.token_status = 200
+    monkeypatch.setattr(downloader, "ACCESS_TOKEN_RETRY_AT", 0)
+    downloader.api_request("medium", "GET", downloader.API_ENDPOINT + "/users")
+
+    assert zoom.requests["token"] == 2
+    assert downloader.ACCESS_TOKEN == "fake"
+    assert downloader.ACCESS_TOKEN_FAILURES == 0
+
+
+def test_token_fetch_backoff_doubles(downloader, monkeypatch):
+    users, meetings = make_account(users=1)
+    zoom = FakeZoom(users, meetings).install(downloader, monkeypatch)
+    zoom.token_status = 500
+
+    delays = []
+    for _ in range(8):
+        monkeypatch.setattr(downloader, "ACCESS_TOKEN_RETRY_AT", 0)
+        downloader.refresh_access_token()
+        delays.append(round(downloader.ACCESS_TOKEN_RETRY_AT - downloader.time.time()))
+
+    assert delays == [1, 2, 4, 8, 16, 32, 60, 60]
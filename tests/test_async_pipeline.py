@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+
+def test_capped_user_does_not_block_the_others(downloader, monkeypatch):
+    # user-a is listed at once with many files, user-b a bit later
+    users = [("a@example.com", "user-a", "A", "A"), ("b@example.com", "user-b", "B", "B")]
+    recordings = {
+        "user-a": [{"uuid": f"a{n}"} for n in range(6)],
+        "user-b": [{"uuid": f"b{n}"} for n in range(2)],
+    }
+    running = {"a@example.com": 0, "b@example.com": 0}
+    max_running = dict(running)
+    finished = []
+    lock = threading.Lock()
+
+    def list_recordings(user_id):
+        if user_id == "user-b":
+            time.sleep(0.05)
+        return recordings[user_id]
+
+    def download_file(recording, email, file, index, total_count):
+        with lock:
+            running[email] += 1
+            max_running[email] = max(max_running[email], running[email])
+        time.sleep(0.1)
+        with lock:
+            running[email] -= 1
+            finished.append((email, time.monotonic()))
+        return True
+
+    monkeypatch.setattr(downloader, "get_users", lambda: users)
+    monkeypatch.setattr(downloader, "list_recordings", list_recordings)
+    monkeypatch.setattr(downloader, "get_meeting_files",
+                        lambda recording, index, total_count: ([("url", "name", "topic", "mp4", "id", 1)], False))
+    monkeypatch.setattr(downloader, "download_file", download_file)
+    monkeypatch.setattr(downloader, "complete_meeting", lambda *args: None)
+    monkeypatch.setattr(downloader, "release_meeting", lambda meeting_id: None)
+
+    asyncio.run(downloader.run_async_pipeline(False, max_workers=2, max_workers_per_user=1, list_workers=2))
+
+    assert max_running == {"a@example.com": 1, "b@example.com": 1}
+    assert len(finished) == 8
+    # user-b's files were downloaded alongside user-a's, not after them
+    last_b = max(at for email, at in finished if email == "b@example.com")
+    last_a = max(at for email, at in finished if email == "a@example.com")
+    assert last_b < last_a
+
+
+def test_errors_of_download_file_dont_stop_the_workers(downloader, monkeypatch):
+    users = [("a@example.com", "user-a", "A", "A")]
+    downloaded = []
+    completed = []
+
+    def download_file(recording, email, file, index, total_count):
+        if recording["uuid"] == "a1":
+            raise OSError("database is locked")
+        downloaded.append(recording["uuid"])
+        return True
+
+    monkeypatch.setattr(downloader, "get_users", lambda: users)
+    monkeypatch.setattr(downloader, "list_recordings", lambda user_id: [{"uuid": f"a{n}"} for n in range(4)])
+    monkeypatch.setattr(downloader, "get_meeting_files",
+                        lambda recording, index, total_count: ([("url", "name", "topic", "mp4", "id", 1)], False))
+    monkeypatch.setattr(downloader, "download_file", download_file)
+    monkeypatch.setattr(downloader, "complete_meeting",
+                        lambda email, recording, *args: completed.append(recording["uuid"]))
+    monkeypatch.setattr(downloader, "release_meeting", lambda meeting_id: None)
+
+    asyncio.run(asyncio.wait_for(
+        downloader.run_async_pipeline(False, max_workers=1, max_workers_per_user=1, list_workers=1), 10))
+
+    assert downloaded == completed == ["a0", "a2", "a3"]
+    assert downloader.METRICS.value("files_failed") == 1
+
+
+def test_meetings_that_dont_fit_in_the_free_space_are_skipped(downloader, monkeypatch, capsys):
+    users = [("a@example.com", "user-a", "A", "A")]
+    sizes = {"a0": 1000, "a1": 3000, "a2": 1000, "a3": 500}
+    downloaded = []
+
+    def download_file(recording, email, file, index, total_count):
+        downloaded.append(recording["uuid"])
+        return True
+
+    monkeypatch.setattr(downloader.shutil, "disk_usage", lambda path: SimpleNamespace(free=3000))
+    monkeypatch.setattr(downloader, "get_users", lambda: users)
+    monkeypatch.setattr(downloader, "list_recordings", lambda user_id: [{"uuid": uuid} for uuid in sizes])
+    monkeypatch.setattr(downloader, "get_meeting_files", lambda recording, index, total_count: (
+        [("url", "name", "topic", "mp4", "id", sizes[recording["uuid"]])], False))
+    monkeypatch.setattr(downloader, "download_file", download_file)
+    monkeypatch.setattr(downloader, "complete_meeting", lambda *args: None)
+    monkeypatch.setattr(downloader, "release_meeting", lambda meeting_id: None)
+
+    # 3000 bytes free, 500 reserved
+    asyncio.run(asyncio.wait_for(
+        downloader.run_async_pipeline(False, max_workers=1, max_workers_per_user=1, list_workers=1,
+                                      reserve_space=500), 10))
+
+    assert downloaded == ["a0", "a2", "a3"]
+    assert "skipping 1 meetings (2.9 KB)" in capsys.readouterr().out
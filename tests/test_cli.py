@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from zoom_recording_downloader import cli
+
+
+@pytest.mark.parametrize("args", [
+    ["--delete-rate", "0"],
+    ["--delete-rate", "-2"],
+    ["--delete-rate", "nan"],
+    ["--rate-limits", "light=0"],
+    ["--rate-limits", "medium=5,heavy=-1"],
+])
+def test_non_positive_rates_are_rejected(args, capsys):
+    with pytest.raises(SystemExit):
+        cli.build_parser().parse_args(args)
+    assert "invalid rate" in capsys.readouterr().err
+
+
+def test_rates():
+    args = cli.build_parser().parse_args(["--delete-rate", "0.5", "--rate-limits", "heavy=2.5"])
+
+    assert args.delete_rate == 0.5
+    assert args.rate_limits["heavy"] == 2.5
+
+
+@pytest.fixture
+def run_cli(downloader, tmp_path, monkeypatch):
+    """ Runs cli.main with the test directories, without installing its signal
+        handlers, returning its exit code
+    """
+    monkeypatch.setenv("DOWNLOAD_DIRECTORY", str(tmp_path / "downloads"))
+    monkeypatch.setenv("LOG_DIRECTORY", str(tmp_path / "logs"))
+    monkeypatch.setattr(cli.signal, "signal", lambda signum, handler: None)
+    for name in ["ZOOM_CLIENT_ID", "ZOOM_CLIENT_SECRET", "ZOOM_ACCOUNT_ID"]:
+        monkeypatch.delenv(name, raising=False)
+
+    def run_cli(args):
+        with pytest.raises(SystemExit) as exit_info:
+            cli.main(args)
+        return exit_info.value.code
+
+    return run_cli
+
+
+def test_verify_uses_a_worker_per_cpu_by_default(downloader, run_cli, monkeypatch):
+    monkeypatch.setenv("ZOOM_CLIENT_ID", "test")
+    monkeypatch.setenv("ZOOM_CLIENT_SECRET", "test")
+    monkeypatch.setenv("ZOOM_ACCOUNT_ID", "test")
+    monkeypatch.setattr(cli.os, "cpu_count", lambda: 6)
+    workers = []
+    monkeypatch.setattr(downloader, "verify_archive",
+                        lambda directory, max_workers: workers.append(max_workers) or True)
+
+    assert run_cli(["verify"]) == 0
+    assert run_cli(["verify", "--workers", "2"]) == 0
+    assert workers == [6, 2]
+
+
+def test_only_the_downloads_need_the_credentials(downloader, run_cli, monkeypatch, capsys):
+    monkeypatch.setattr(downloader, "verify_archive", lambda directory, max_workers: True)
+
+    assert run_cli(["verify"]) == 0
+    # No index yet: nothing found
+    assert run_cli(["search", "budget"]) == 1
+    assert "not defined" not in capsys.readouterr().out
+    assert run_cli(["download"]) == 1
+    assert "ZOOM_CLIENT_ID or ZOOM_CLIENT_SECRET or ZOOM_ACCOUNT_ID not defined" in capsys.readouterr().out
+
+
+def test_order_requires_the_threads_engine(downloader, run_cli, capsys):
+    assert run_cli(["--engine", "async", "--order", "smallest"]) == 2
+    assert "--order requires --engine threads" in capsys.readouterr().err
+
+
+def test_deadline_is_rejected_with_daemon(downloader, run_cli, capsys):
+    assert run_cli(["--daemon", "--deadline", "06:00"]) == 2
+    assert "--deadline can't be combined with --daemon" in capsys.readouterr().err
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+from fake_zoom import FakeZoom, fake_downloads, make_account
+
+from zoom_recording_downloader import cli
+
+
+@pytest.fixture
+def zoom(downloader, monkeypatch):
+    users, meetings = make_account(users=1, meetings_per_user=2)
+    zoom = FakeZoom(users, meetings).install(downloader, monkeypatch)
+    zoom.users_status = 500
+    fake_downloads(downloader, monkeypatch)
+    # The failed listing isn't retried
+    monkeypatch.setattr(downloader, "API_RETRIES", 0)
+    return zoom
+
+
+def test_daemon_survives_user_listing_errors(downloader, monkeypatch, zoom):
+    downloader.set_access_token("test", float("inf"))
+    passes = []
+
+    def wait_for_next_pass(args, seconds):
+        passes.append(seconds)
+        # Zoom is back for the next pass
+        zoom.users_status = 200
+        if len(passes) == 2:
+            downloader.SHUTDOWN.set()
+
+    monkeypatch.setattr(downloader, "wait_for_next_pass", wait_for_next_pass)
+    downloader.run_daemon(cli.build_parser().parse_args(["--daemon", "--no-delete", "--no-index"]))
+
+    assert len(passes) == 2
+    assert downloader.state_store().is_meeting_completed("meeting-0-0")
+    assert downloader.state_store().is_meeting_completed("meeting-0-1")
+
+
+def test_one_shot_run_exits_on_user_listing_errors(downloader, zoom):
+    with pytest.raises(SystemExit) as exit_info:
+        downloader.main(cli.build_parser().parse_args(["--no-delete", "--no-index"]))
+
+    assert exit_info.value.code == 1
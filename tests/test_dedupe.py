@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+
+import pytest
+from common import StubServer, payload
+
+SIZE = 64 * 1024
+SHA256 = hashlib.sha256(payload(0, SIZE)).hexdigest()
+
+
+@pytest.fixture
+def dedupe(downloader, monkeypatch):
+    """ An archive with one downloaded file of SIZE bytes, of file id "file-0"
+        in meeting-0; returns its path
+    """
+    downloader.set_access_token("test", float("inf"))
+    monkeypatch.setattr(downloader, "DEDUPE", "hardlink")
+    monkeypatch.setattr(downloader, "DOWNLOAD_RETRIES", 1)
+    path = downloader.target_path("user@example.com", "First", "file.mp4")
+    os.makedirs(os.path.dirname(path))
+    with open(path, 'wb') as fd:
+        fd.write(payload(0, SIZE))
+    downloader.save_checksum(path, SHA256)
+    downloader.state_store().record_file("meeting-0", "file-0", "downloaded", SIZE, SHA256, path)
+    return path
+
+
+def download(downloader, url, file_id):
+    return downloader.download_recording(url, "user@example.com", "file.mp4", "Second", SIZE, file_id)
+
+
+def test_known_file_id_is_linked_before_download(downloader, dedupe):
+    # No server: nothing may be downloaded
+    result = download(downloader, "http://127.0.0.1:9/files/file", "file-0")
+
+    path = downloader.target_path("user@example.com", "Second", "file.mp4")
+    assert result == {"path": path, "bytes": SIZE, "sha256": SHA256}
+    assert os.path.samefile(path, dedupe)
+    assert os.path.exists(path + downloader.CHECKSUM_EXTENSION)
+    assert downloader.METRICS.value("files_deduplicated", phase="before_download") == 1
+    assert downloader.METRICS.value("deduplicated_bytes") == SIZE
+
+
+def test_target_matching_its_checksum_is_reused_in_place(downloader, dedupe):
+    # The state database was lost: the file is found by its checksum
+    downloader.state_store()._db.execute("DELETE FROM files")
+    path = downloader.target_path("user@example.com", "First", "file.mp4")
+    result = downloader.download_recording("http://127.0.0.1:9/files/file", "user@example.com", "file.mp4",
+                                           "First", SIZE, "file-0")
+
+    assert result == {"path": path, "bytes": SIZE, "sha256": SHA256}
+    assert downloader.METRICS.value("files_deduplicated", phase="before_download") == 0
+    assert downloader.METRICS.value("deduplicated_bytes") == 0
+
+
+def test_identical_download_is_replaced_by_a_link(downloader, dedupe):
+    with StubServer() as server:
+        # Another file id, same content
+        result = download(downloader, f"{server.url}/files/{SIZE}/file", "file-1")
+
+    path = downloader.target_path("user@example.com", "Second", "file.mp4")
+    assert result == {"path": path, "bytes": SIZE, "sha256": SHA256}
+    assert os.path.samefile(path, dedupe)
+    assert not os.path.exists(path + ".dedupe")
+    assert downloader.METRICS.value("files_deduplicated", phase="after_download") == 1
+    assert downloader.METRICS.value("deduplicated_bytes") == SIZE
+
+
+def test_reflink_falls_back_to_a_hardlink(downloader, dedupe, monkeypatch, capsys):
+    monkeypatch.setattr(downloader, "DEDUPE", "reflink")
+    # No FICLONE
+    monkeypatch.setattr(downloader, "fcntl", None)
+
+    result = download(downloader, "http://127.0.0.1:9/files/file", "file-0")
+
+    assert os.path.samefile(result["path"], dedupe)
+    assert "Could not reflink" in capsys.readouterr().out
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+
+def deletion_status(downloader):
+    rows = downloader.state_store()._db.execute("SELECT meeting_uuid, status FROM deletions").fetchall()
+    return dict(rows)
+
+
+def test_errors_dont_stop_the_deletion_worker(downloader, monkeypatch):
+    meeting_ids = [f"meeting-{n}" for n in range(6)]
+    for meeting_id in meeting_ids:
+        downloader.state_store().queue_deletion(meeting_id, 0)
+
+    def check_local_copy(meeting_id):
+        if meeting_id == "meeting-1":
+            raise OSError("disk gone")
+        return None
+
+    def delete_meeting_recordings(meeting_id):
+        if meeting_id == "meeting-2":
+            raise ConnectionResetError(104, "Connection reset by peer")
+        return True
+
+    monkeypatch.setattr(downloader, "check_local_copy", check_local_copy)
+    monkeypatch.setattr(downloader, "delete_meeting_recordings", delete_meeting_recordings)
+
+    deletions = downloader.DeletionQueue(1000, 1)
+    deletions.start()
+    deletions.stop()
+
+    assert deletion_status(downloader) == {
+        "meeting-0": "deleted",
+        # Left claimed, retried once the claim expires
+        "meeting-1": "pending",
+        # Retried with backoff
+        "meeting-2": "pending",
+        "meeting-3": "deleted",
+        "meeting-4": "deleted",
+        "meeting-5": "deleted",
+    }
+    assert downloader.state_store().deletion_attempts("meeting-2") == 1
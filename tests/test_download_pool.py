@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+import sqlite3
+import threading
+
+from fake_zoom import fake_downloads
+
+FILE = ("https://zoom.us/rec/download/file", "file.mp4", "Topic", "shared_screen", "file-id", 1024)
+
+
+def test_errors_of_download_file_dont_hang_the_pool(downloader, monkeypatch):
+    fake_downloads(downloader, monkeypatch)
+    claim_meeting = downloader.claim_meeting
+
+    def locked_claim(meeting_id):
+        if meeting_id == "meeting-1":
+            raise sqlite3.OperationalError("database is locked")
+        return claim_meeting(meeting_id)
+
+    monkeypatch.setattr(downloader, "claim_meeting", locked_claim)
+    completed = []
+    pool = downloader.DownloadPool(1, 1, lambda email, recording, index: completed.append(recording["uuid"]))
+    for n in range(3):
+        files = [FILE[:1] + (f"file-{n}-{m}.mp4",) + FILE[2:4] + (f"file-{n}-{m}",) + FILE[5:] for m in range(2)]
+        pool.submit_meeting("user@example.com", {"uuid": f"meeting-{n}", "topic": "Topic"}, files, n, 3)
+
+    joined = threading.Thread(target=pool.join, daemon=True)
+    joined.start()
+    joined.join(10)
+
+    assert not joined.is_alive()
+    assert completed == ["meeting-0", "meeting-2"]
+    assert downloader.METRICS.value("files_failed") == 2
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date, datetime
+
+from fake_zoom import FakeZoom, make_account
+
+# 70 daily meetings per user span three 30-day listing windows
+START = date(2024, 1, 1)
+MEETINGS_PER_USER = 70
+
+
+def list_account(downloader, monkeypatch, workers, repeat_last=False):
+    """ Lists the users and their recordings from a fake account paged by 2,
+        with `workers` concurrent listing requests
+    """
+    users, meetings = make_account(users=5, meetings_per_user=MEETINGS_PER_USER, start=START)
+    zoom = FakeZoom(users, meetings, page_size=2, repeat_last=repeat_last).install(downloader, monkeypatch)
+    downloader.set_access_token("test", float("inf"))
+    downloader.configure_api_executor(workers)
+    downloader.configure_sync_window(False, datetime(2024, 1, 1), datetime(2024, 12, 31), 3)
+
+    listing = {user_id: sorted(recording["uuid"] for recording in downloader.list_recordings(user_id))
+               for email, user_id, first_name, last_name in downloader.get_users()}
+    return zoom, listing
+
+
+def expected_listing():
+    return {f"user{n}": sorted(f"meeting-{n}-{m}" for m in range(MEETINGS_PER_USER)) for n in range(5)}
+
+
+def test_all_pages_are_listed(downloader, monkeypatch):
+    zoom, listing = list_account(downloader, monkeypatch, 1)
+
+    assert listing == expected_listing()
+    assert zoom.requests["users"] == 3
+    # 3 windows per user, one page more than the window's meetings / 2 where they don't divide evenly
+    assert zoom.requests["recordings"] > 5 * MEETINGS_PER_USER // 2
+
+
+def test_meetings_on_several_pages_are_listed_once(downloader, monkeypatch):
+    zoom, listing = list_account(downloader, monkeypatch, 1, repeat_last=True)
+
+    assert listing == expected_listing()
+    assert downloader.SYNC_PENDING["user0"]["meeting-0-0"] == "2024-01-01"
+    assert len(downloader.SYNC_PENDING["user0"]) == MEETINGS_PER_USER
+
+
+def test_concurrent_listing_matches_sequential_listing(downloader, monkeypatch):
+    _, sequential = list_account(downloader, monkeypatch, 1, repeat_last=True)
+    _, concurrent = list_account(downloader, monkeypatch, 8, repeat_last=True)
+
+    assert concurrent == sequential == expected_listing()
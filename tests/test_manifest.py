@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+from datetime import date
+
+from fake_zoom import FakeZoom, fake_downloads, make_account
+
+from zoom_recording_downloader import cli
+
+
+def test_execute_manifest_advances_sync_cursors(downloader, monkeypatch, tmp_path):
+    users, meetings = make_account(users=2, meetings_per_user=3)
+    FakeZoom(users, meetings).install(downloader, monkeypatch)
+    downloader.set_access_token("test", float("inf"))
+    fake_downloads(downloader, monkeypatch, failing={"file-1-1"})
+    manifest = str(tmp_path / "manifest.ndjson")
+
+    # --plan: lists, writes the manifest, doesn't move the cursors
+    downloader.configure_sync_window(False, None, None, 3)
+    downloader.write_manifest(manifest, downloader.build_manifest(downloader.get_users()))
+    assert not os.path.exists(downloader.SYNC_CURSORS_FILE)
+
+    # --execute-manifest, in a later run
+    downloader.SYNC_PENDING.clear()
+    downloader.run_pass(cli.build_parser().parse_args(["--execute-manifest", manifest, "--no-delete"]))
+
+    with open(downloader.SYNC_CURSORS_FILE) as fd:
+        cursors = json.load(fd)
+    assert cursors == {
+        "user0": date.today().strftime("%Y-%m-%d"),
+        # Stops at the meeting whose download failed
+        "user1": meetings["user1"][1]["start_time"][:10],
+    }
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+
+import pytest
+from common import CHUNK, StubServer, payload
+
+SIZE = 1024 * 1024 + 123
+
+
+def expected_sha256(size):
+    hasher = hashlib.sha256()
+    for offset in range(0, size, CHUNK):
+        hasher.update(payload(offset, min(CHUNK, size - offset)))
+    return hasher.hexdigest()
+
+
+@pytest.fixture
+def download(downloader, monkeypatch):
+    """ Downloads a file of SIZE bytes from a stub server into the archive
+    """
+    downloader.set_access_token("test", float("inf"))
+    monkeypatch.setattr(downloader, "DOWNLOAD_RETRY_DELAY", 0)
+
+    def download(server):
+        return downloader.download_recording(f"{server.url}/files/{SIZE}/file", "user@example.com",
+                                             "file.mp4", "Topic", SIZE, "file-id")
+
+    return download
+
+
+def assert_downloaded(downloader, result):
+    path = downloader.target_path("user@example.com", "Topic", "file.mp4")
+    assert result == {"path": path, "bytes": SIZE, "sha256": expected_sha256(SIZE)}
+    with open(path, 'rb') as fd:
+        assert hashlib.sha256(fd.read()).hexdigest() == result["sha256"]
+    with open(path + downloader.CHECKSUM_EXTENSION) as fd:
+        assert result["sha256"] in fd.read()
+    # The partial download and its sidecar are gone
+    assert not os.path.exists(path + ".part")
+    assert not os.path.exists(path + ".part.json")
+
+
+@pytest.mark.parametrize("read_strategy", ["readinto", "iter_content"])
+def test_resume_across_repeated_drops(downloader, monkeypatch, capsys, download, read_strategy):
+    # Every connection is dropped after 200 KB: 6 ranged requests are needed
+    downloader.configure_write_path(64 * 1024, read_strategy, False)
+    monkeypatch.setattr(downloader, "DOWNLOAD_RETRIES", 3)
+
+    with StubServer(drop_after=200 * 1024) as server:
+        # Up to 3 attempts per run: the next run resumes from the .part file
+        assert download(server) is None
+        path = downloader.target_path("user@example.com", "Topic", "file.mp4")
+        assert 0 < os.path.getsize(path + ".part") < SIZE
+        assert os.path.exists(path + ".part.json")
+
+        monkeypatch.setattr(downloader, "DOWNLOAD_RETRIES", 10)
+        result = download(server)
+
+    assert_downloaded(downloader, result)
+    # Each request after the first resumed where the previous one was dropped
+    assert capsys.readouterr().out.count("==> Resuming at") == 5
+
+
+@pytest.mark.parametrize("read_strategy", ["readinto", "iter_content"])
+def test_server_without_ranges_restarts_from_scratch(downloader, monkeypatch, download, read_strategy):
+    downloader.configure_write_path(64 * 1024, read_strategy, False)
+    monkeypatch.setattr(downloader, "DOWNLOAD_RETRIES", 1)
+
+    with StubServer(drop_after=300 * 1024, ranges=False) as server:
+        assert download(server) is None
+    path = downloader.target_path("user@example.com", "Topic", "file.mp4")
+    assert os.path.getsize(path + ".part") > 0
+
+    # The server answers the Range request with a 200 and the whole file
+    with StubServer(ranges=False) as server:
+        result = download(server)
+
+    assert_downloaded(downloader, result)
+
+
+def test_retries_back_off_with_jitter(downloader):
+    for attempt in range(2, 10):
+        delay = min(downloader.DOWNLOAD_RETRY_DELAY_MAX, downloader.DOWNLOAD_RETRY_DELAY * 2 ** (attempt - 2))
+        assert delay / 2 <= downloader.download_retry_delay(attempt) <= delay
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date
+
+from zoom_recording_downloader import search
+
+VTT = """﻿WEBVTT
+
+1
+00:00:01.500 --> 00:00:04.000
+Welcome to the budget review.
+
+2
+01:02:03,250 --> 01:02:05,000
+Alice: the budget
+is approved
+
+3
+00:10:00.000 --> 00:10:02.000
+"""
+
+CHAT = """00:01:02\tAlice: hello everyone
+a second line
+00:02:00\tBob: the budget is late
+"""
+
+RECORDING = {"uuid": "meeting-1", "topic": "Budget", "start_time": "2024-05-01T10:00:00Z"}
+
+
+def test_parse_vtt():
+    assert search.parse_vtt(VTT.lstrip("﻿")) == [
+        ("00:00:01.500", "Welcome to the budget review."),
+        ("01:02:03.250", "Alice: the budget is approved"),
+    ]
+
+
+def test_parse_text():
+    # VTT files, whatever their kind, BOM included
+    assert search.parse_text("transcript", VTT) == search.parse_vtt(VTT.lstrip("﻿"))
+    assert search.parse_text("chat", CHAT) == [
+        ("00:01:02", "Alice: hello everyone a second line"),
+        ("00:02:00", "Bob: the budget is late"),
+    ]
+    assert search.parse_text("summary", "Summary\n\n  Next steps  \n") == [("", "Summary"), ("", "Next steps")]
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_indexer_indexes_the_text_files(tmp_path):
+    transcript = write(tmp_path / "a@example.com" / "Budget" / "transcript.vtt", VTT)
+    chat = write(tmp_path / "a@example.com" / "Budget" / "chat.txt", CHAT)
+    video = write(tmp_path / "a@example.com" / "Budget" / "video.mp4", "not text")
+    db = str(tmp_path / "search.db")
+
+    indexer = search.Indexer(db)
+    indexer.start()
+    indexer.submit(transcript, RECORDING, "a@example.com", "audio_transcript")
+    indexer.submit(chat, RECORDING, "a@example.com", "chat_file")
+    indexer.submit(video, RECORDING, "a@example.com", "shared_screen_with_speaker_view")
+    indexer.stop()
+
+    index = search.TranscriptIndex(db)
+    try:
+        assert set(index.indexed_files()) == {transcript, chat}
+        hits = index.search(search.plain_query("approved"))
+        assert [(hit["path"], hit["cue"], hit["kind"], hit["meeting_uuid"], hit["email"]) for hit in hits] == [
+            (transcript, "01:02:03.250", "transcript", "meeting-1", "a@example.com")]
+        assert {hit["kind"] for hit in index.search(search.plain_query("budget"))} == {"transcript", "chat"}
+    finally:
+        index.close()
+
+
+def add_meeting(index, n, email, start_time, lines):
+    index.add({"path": f"/archive/{n}.txt", "meeting_uuid": f"meeting-{n}", "topic": "Topic", "email": email,
+               "start_time": start_time, "kind": "summary"}, [("", line) for line in lines])
+
+
+def test_search_ranks_and_filters(tmp_path):
+    index = search.TranscriptIndex(str(tmp_path / "search.db"))
+    try:
+        add_meeting(index, 1, "a@example.com", "2024-01-10T10:00:00Z", ["budget", "budget budget budget"])
+        add_meeting(index, 2, "b@example.com", "2024-03-10T10:00:00Z", ["the budget of the quarter was discussed"])
+        index.commit()
+
+        hits = index.search(search.plain_query("budget"))
+        # Best match first: the most occurrences, the longest segment last
+        budget = f"{search.Color.BOLD}budget{search.Color.END}"
+        assert [hit["snippet"] for hit in hits] == [
+            " ".join([budget] * 3), budget, f"the {budget} of the quarter was discussed"]
+        assert len(index.search(search.plain_query("budget"), limit=1)) == 1
+        assert {hit["email"] for hit in index.search(search.plain_query("budget"), email="b@example.com")} == {
+            "b@example.com"}
+        assert {hit["meeting_uuid"] for hit in index.search(search.plain_query("budget"), start="2024-02-01")} == {
+            "meeting-2"}
+        assert {hit["meeting_uuid"] for hit in index.search(search.plain_query("budget"), end="2024-02-01")} == {
+            "meeting-1"}
+        # Words in any order, punctuation isn't FTS5 syntax
+        assert len(index.search(search.plain_query("quarter budget"))) == 1
+        assert index.search(search.plain_query("budget-review")) == []
+    finally:
+        index.close()
+
+
+def test_search_reports_truncated_results(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(search, "RANK_WINDOW", 3)
+    db = str(tmp_path / "search.db")
+    index = search.TranscriptIndex(db)
+    add_meeting(index, 1, "a@example.com", "2024-01-10T10:00:00Z", ["budget"] * 3)
+    add_meeting(index, 2, "b@example.com", "2024-03-10T10:00:00Z", ["budget"])
+    index.commit()
+    try:
+        assert index.truncated(search.plain_query("budget"))
+        # 3 matches: all ranked
+        assert not index.truncated(search.plain_query("budget"), email="a@example.com")
+    finally:
+        index.close()
+
+    assert search.search_command(db, "budget", 20, None, None, None, False)
+    assert "Results truncated" in capsys.readouterr().out
+    assert search.search_command(db, "budget", 20, None, date(2024, 1, 1), date(2024, 1, 31), False)
+    assert "Results truncated" not in capsys.readouterr().out
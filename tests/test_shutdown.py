@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A run with a download running for a minute on a worker thread
+RUN = textwrap.dedent("""
+    import signal, sys, threading, time
+    from concurrent.futures import ThreadPoolExecutor
+    sys.path.insert(0, sys.argv[1])
+    from zoom_recording_downloader import downloader
+
+    downloader.load_environment({"DOWNLOAD_DIRECTORY": sys.argv[2], "LOG_DIRECTORY": sys.argv[2],
+                                 "ZOOM_CLIENT_ID": "test", "ZOOM_CLIENT_SECRET": "test", "ZOOM_ACCOUNT_ID": "test"})
+    signal.signal(signal.SIGINT, downloader.handle_graceful_shutdown)
+    downloader.SYNC_PENDING["user0"] = {}
+    downloader.state_store()
+    ThreadPoolExecutor(max_workers=1).submit(time.sleep, 60)
+    print("ready", flush=True)
+    threading.Event().wait()
+""")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX signals")
+def test_second_signal_exits_now(tmp_path):
+    process = subprocess.Popen([sys.executable, "-c", RUN, ROOT, str(tmp_path)],
+                               stdout=subprocess.PIPE, text=True)
+    try:
+        assert process.stdout.readline().strip() == "ready"
+        started = time.monotonic()
+        process.send_signal(signal.SIGINT)
+        time.sleep(0.2)
+        process.send_signal(signal.SIGINT)
+        assert process.wait(timeout=10) == 1
+        assert time.monotonic() - started < 10
+    finally:
+        process.kill()
+        process.stdout.close()
+
+    # The cursors were saved on the way out
+    with open(tmp_path / "sync-cursors.json") as fd:
+        assert set(json.load(fd)) == {"user0"}
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+from fake_zoom import FakeZoom, fake_downloads, make_account
+
+from zoom_recording_downloader import cli
+
+
+def record_download(downloader, meeting_id, file_id, exists=True):
+    path = downloader.target_path("user0@example.com", "Earlier", f"{file_id}.mp4")
+    if exists:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'wb').close()
+    downloader.state_store().record_file(meeting_id, file_id, "downloaded", 1024, "0" * 64, path)
+
+
+@pytest.mark.parametrize("engine", ["threads", "async"])
+def test_files_downloaded_by_an_earlier_run_are_skipped(downloader, monkeypatch, engine):
+    users, meetings = make_account(users=1, meetings_per_user=3)
+    # meeting-0-0 has a second file
+    meetings["user0"][0]["recording_files"].append(dict(meetings["user0"][0]["recording_files"][0], id="file-0-0b"))
+    FakeZoom(users, meetings).install(downloader, monkeypatch)
+    downloader.set_access_token("test", float("inf"))
+    monkeypatch.setattr(downloader, "get_meeting_summary", lambda meeting_id: None)
+    fake_downloads(downloader, monkeypatch)
+    downloaded = []
+    download_recording = downloader.download_recording
+
+    def recording_download(download_url, email, filename, subfolder, file_size=0, file_id=None):
+        downloaded.append(file_id)
+        return download_recording(download_url, email, filename, subfolder, file_size, file_id)
+
+    monkeypatch.setattr(downloader, "download_recording", recording_download)
+
+    # An earlier run downloaded one of the files of meeting-0-0, the only file
+    # of meeting-0-1 (but didn't complete it), and that of meeting-0-2, which
+    # has been removed since
+    record_download(downloader, "meeting-0-0", "file-0-0")
+    record_download(downloader, "meeting-0-1", "file-0-1")
+    record_download(downloader, "meeting-0-2", "file-0-2", exists=False)
+
+    downloader.run_pass(cli.build_parser().parse_args(["--no-index", "--engine", engine]))
+
+    assert sorted(downloaded) == ["file-0-0b", "file-0-2"]
+    for meeting_id in ["meeting-0-0", "meeting-0-1", "meeting-0-2"]:
+        assert downloader.state_store().is_meeting_completed(meeting_id)
+    # The deletion checks all the files of the meeting
+    assert len(downloader.state_store().downloaded_files("meeting-0-0")) == 2
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+import standardize_filenames
+
+
+class Interrupted(BaseException):
+    pass
+
+
+def test_interrupted_renames_can_be_undone(tmp_path, monkeypatch):
+    folder = tmp_path / "recordings" / "Weekly"
+    folder.mkdir(parents=True)
+    names = [f"GMT2024010{n}-100000_Recording.mp4" for n in range(1, 6)]
+    for name in names:
+        (folder / name).touch()
+    journal = str(tmp_path / "journal.jsonl")
+
+    # The process dies during the third rename
+    rename = os.rename
+    renamed = []
+
+    def interrupted_rename(source, target):
+        if len(renamed) == 2:
+            raise Interrupted()
+        rename(source, target)
+        renamed.append(target)
+
+    monkeypatch.setattr(standardize_filenames.os, "rename", interrupted_rename)
+    with pytest.raises(Interrupted):
+        standardize_filenames.standardize(str(tmp_path / "recordings"), journal, False, 1)
+    monkeypatch.setattr(standardize_filenames.os, "rename", rename)
+
+    assert len(renamed) == 2
+    assert standardize_filenames.undo(journal, False) == 2
+    assert sorted(os.listdir(folder)) == names
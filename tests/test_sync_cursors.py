@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+import pytest
+from fake_zoom import FakeZoom, fake_downloads, make_account
+
+from zoom_recording_downloader import cli
+
+
+def read_cursors(downloader):
+    with open(downloader.SYNC_CURSORS_FILE) as fd:
+        return json.load(fd)
+
+
+@pytest.mark.parametrize("engine", ["threads", "async"])
+def test_shutdown_saves_the_cursors_of_listed_users(downloader, monkeypatch, engine):
+    users, meetings = make_account(users=1, meetings_per_user=4)
+    FakeZoom(users, meetings).install(downloader, monkeypatch)
+    downloader.set_access_token("test", float("inf"))
+    fake_downloads(downloader, monkeypatch, interrupting={"file-0-2"})
+
+    downloader.run_pass(cli.build_parser().parse_args(["--no-delete", "--no-index", "--engine", engine]))
+
+    assert downloader.SHUTDOWN.is_set()
+    # Up to the interrupted meeting, the next run lists it again
+    assert read_cursors(downloader) == {"user0": meetings["user0"][2]["start_time"][:10]}
+
+
+@pytest.mark.parametrize("pending_max_days, passes_pinned", [(0, 2), (14, 4)])
+def test_meetings_pending_for_too_long_stop_pinning_the_cursor(downloader, monkeypatch, capsys,
+                                                               pending_max_days, passes_pinned):
+    users, meetings = make_account(users=1, meetings_per_user=3)
+    FakeZoom(users, meetings).install(downloader, monkeypatch)
+    downloader.set_access_token("test", float("inf"))
+    # The first meeting never downloads
+    fake_downloads(downloader, monkeypatch, failing={"file-0-0"})
+    args = cli.build_parser().parse_args(["--no-delete", "--no-index", "--pending-max-days", str(pending_max_days)])
+
+    cursors = []
+    for _ in range(4):
+        downloader.run_pass(args)
+        cursors.append(read_cursors(downloader)["user0"])
+
+    stuck_date = meetings["user0"][0]["start_time"][:10]
+    today = downloader.RECORDING_END_DATE.strftime("%Y-%m-%d")
+    # Passed once left pending by 3 passes over more than --pending-max-days
+    assert cursors == [stuck_date] * passes_pinned + [today] * (4 - passes_pinned)
+    assert ("Moving the sync cursor of user0 past 1 meetings" in capsys.readouterr().out) == (passes_pinned < 4)
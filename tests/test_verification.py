@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+from common import StubServer
+
+SIZE = 64 * 1024
+RECORDING = {"uuid": "meeting-0", "topic": "Topic", "start_time": "2024-05-01T10:00:00Z"}
+
+
+def download_meeting(downloader, server, reported_size):
+    """ Downloads the one file of RECORDING through a DownloadPool, Zoom
+        reporting `reported_size` bytes for it, and completes the meeting
+        with deletion if it succeeded
+    """
+    file = (f"{server.url}/files/{SIZE}/file", "file.mp4", "Topic", "shared_screen", "file-0", reported_size)
+    pool = downloader.DownloadPool(
+        1, 1, lambda email, recording, index: downloader.complete_meeting(email, recording, index, True))
+    pool.submit_meeting("user@example.com", dict(RECORDING), [file], 0, 1)
+    joined = threading.Thread(target=pool.join, daemon=True)
+    joined.start()
+    joined.join(30)
+    assert not joined.is_alive()
+
+
+def deletion_status(downloader):
+    return dict(downloader.state_store()._db.execute("SELECT meeting_uuid, status FROM deletions").fetchall())
+
+
+def run_deletions(downloader, monkeypatch):
+    deleted = []
+    monkeypatch.setattr(downloader, "delete_meeting_recordings", lambda meeting_id: deleted.append(meeting_id) or True)
+    deletions = downloader.DeletionQueue(1000, 1)
+    deletions.start()
+    deletions.stop()
+    return deleted
+
+
+def setup(downloader, monkeypatch):
+    downloader.set_access_token("test", float("inf"))
+    monkeypatch.setattr(downloader, "DOWNLOAD_RETRIES", 2)
+    monkeypatch.setattr(downloader, "DOWNLOAD_RETRY_DELAY", 0)
+    monkeypatch.setattr(downloader, "get_meeting_summary", lambda meeting_id: None)
+
+
+def test_size_mismatch_keeps_the_meeting_out_of_completed(downloader, monkeypatch):
+    setup(downloader, monkeypatch)
+
+    with StubServer() as server:
+        # Zoom reports one byte more than the server sends
+        download_meeting(downloader, server, SIZE + 1)
+
+    assert not downloader.state_store().is_meeting_completed("meeting-0")
+    assert downloader.state_store().downloaded_files("meeting-0") == []
+    assert deletion_status(downloader) == {}
+    assert run_deletions(downloader, monkeypatch) == []
+    assert downloader.METRICS.value("files_failed") == 1
+
+
+def test_checksum_mismatch_blocks_the_deletion(downloader, monkeypatch):
+    setup(downloader, monkeypatch)
+
+    with StubServer() as server:
+        download_meeting(downloader, server, SIZE)
+
+    assert downloader.state_store().is_meeting_completed("meeting-0")
+    assert deletion_status(downloader) == {"meeting-0": "pending"}
+
+    # The local copy is corrupted before the deletion, which is due after a grace period
+    [path] = downloader.state_store().downloaded_files("meeting-0")
+    with open(path, 'r+b') as fd:
+        fd.write(b"corrupted")
+    monkeypatch.setattr(downloader, "DELETE_GRACE", 1)
+
+    assert run_deletions(downloader, monkeypatch) == []
+    assert deletion_status(downloader) == {"meeting-0": "blocked"}
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import hmac
+import http.client
+import json
+import threading
+import time
+
+import pytest
+
+from zoom_recording_downloader.webhook import WebhookServer
+
+SECRET = "webhook-secret"
+
+
+@pytest.fixture
+def server(downloader, monkeypatch):
+    monkeypatch.setattr(downloader, "WEBHOOK_SECRET_TOKEN", SECRET)
+    server = WebhookServer(("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+
+    server.shutdown()
+    server.server_close()
+    while not downloader.WEBHOOK_QUEUE.empty():
+        downloader.WEBHOOK_QUEUE.get_nowait()
+
+
+def signed_headers(body):
+    timestamp = str(int(time.time()))
+    signature = hmac.new(SECRET.encode("utf-8"), f"v0:{timestamp}:".encode("utf-8") + body,
+                         hashlib.sha256).hexdigest()
+    return {"x-zm-request-timestamp": timestamp, "x-zm-signature": "v0=" + signature,
+            "Content-Type": "application/json"}
+
+
+def post(server, body, headers=None):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+    try:
+        connection.request("POST", "/", body=body, headers=headers if headers is not None else signed_headers(body))
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b"{}")
+    finally:
+        connection.close()
+
+
+def test_url_validation(server):
+    status, data = post(server, json.dumps({"event": "endpoint.url_validation",
+                                            "payload": {"plainToken": "abc"}}).encode("utf-8"))
+
+    assert status == 200
+    assert data == {"plainToken": "abc",
+                    "encryptedToken": hmac.new(SECRET.encode("utf-8"), b"abc", hashlib.sha256).hexdigest()}
+
+
+@pytest.mark.parametrize("event", [
+    {"event": "endpoint.url_validation", "payload": {}},
+    {"event": "endpoint.url_validation", "payload": {"plainToken": 42}},
+    {"event": "endpoint.url_validation", "payload": "abc"},
+    {"event": "recording.completed", "payload": {}},
+    {"event": "recording.completed"},
+    ["recording.completed"],
+])
+def test_malformed_events_are_rejected(server, downloader, event):
+    status, data = post(server, json.dumps(event).encode("utf-8"))
+
+    assert status == 400
+    assert downloader.WEBHOOK_QUEUE.empty()
+
+
+def test_oversized_body_is_rejected_unread(server, downloader, monkeypatch):
+    monkeypatch.setattr(downloader, "WEBHOOK_MAX_BODY", 1024)
+    body = json.dumps({"event": "recording.completed",
+                       "payload": {"object": {"uuid": "x" * downloader.WEBHOOK_MAX_BODY}}}).encode("utf-8")
+    status, data = post(server, body)
+
+    assert status == 413
+    assert downloader.WEBHOOK_QUEUE.empty()
+
+
+def test_invalid_content_length_is_rejected(server):
+    status, data = post(server, b"{}", headers={"Content-Length": "-5"})
+
+    assert status == 400
+
+
+def test_recording_completed_is_queued(server, downloader):
+    status, data = post(server, json.dumps({"event": "recording.completed",
+                                            "payload": {"object": {"uuid": "meeting-1"}}}).encode("utf-8"))
+
+    assert status == 200
+    assert downloader.WEBHOOK_QUEUE.get_nowait() == {"uuid": "meeting-1"}
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+
+from conftest import REPO_DIRECTORY
+from zoom_simulator import ZoomSimulator
+
+
+def test_workers_sharing_a_state_store_split_the_meetings(tmp_path):
+    download_directory = tmp_path / "downloads"
+    state_db = tmp_path / "shared" / "state.db"
+
+    with ZoomSimulator(users=6, meetings_per_user=4, files_per_meeting=2, file_size=64 * 1024) as simulator:
+        processes = []
+        for worker in range(2):
+            log_directory = tmp_path / f"logs-{worker}"
+            env = dict(os.environ, **simulator.environment,
+                       ZOOM_CLIENT_ID="test", ZOOM_CLIENT_SECRET="test", ZOOM_ACCOUNT_ID="test",
+                       DOWNLOAD_DIRECTORY=str(download_directory), LOG_DIRECTORY=str(log_directory),
+                       TQDM_DISABLE="1")
+            output = open(tmp_path / f"output-{worker}.log", 'w')
+            processes.append((subprocess.Popen(
+                [sys.executable, os.path.join(REPO_DIRECTORY, "zoom-recording-downloader.py"),
+                 "--state-db", str(state_db), "--workers", "2", "--delete-rate", "50", "--no-index"],
+                env=env, stdout=output, stderr=subprocess.STDOUT), output))
+
+        for process, output in processes:
+            assert process.wait(timeout=120) == 0, (tmp_path / os.path.basename(output.name)).read_text()
+            output.close()
+
+        stats = simulator.stats()
+
+    requests = stats["requests"]
+    # Every file downloaded once, by one of the workers
+    assert requests.get("download 200") == stats["files"]
+    assert "download 206" not in requests
+    # Every meeting deleted once
+    assert requests.get("delete 204") == stats["meetings"] == stats["deleted_meetings"]
+    assert "delete 404" not in requests
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+
+# Zoom Recording Downloader: downloads and organizes the cloud recordings of
+# a Zoom account (see downloader.py). Importing the package is cheap: the
+# downloader and its dependencies are only imported when used, e.g.
+#
+#     from zoom_recording_downloader import downloader
+#     downloader.load_environment()
+
+APP_VERSION = "3.1 (OAuth)"
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+
+# Command line of the Zoom Recording Downloader, run by
+# zoom-recording-downloader.py and `python3 -m zoom_recording_downloader`.
+# --help and the argument errors don't need the environment variables, and
+# the verify, search and reindex commands don't need the Zoom credentials.
+#
+# Environment variables:
+# ZOOM_CLIENT_ID:
+# ZOOM_CLIENT_SECRET:
+# ZOOM_ACCOUNT_ID:
+# DOWNLOAD_DIRECTORY: the directory where to download the recordings
+# LOG_DIRECTORY: the directory where to store log files
+# ZOOM_WEBHOOK_SECRET_TOKEN: secret token of the webhook app (only with --webhook-port)
+# ZOOM_API_ENDPOINT, ZOOM_OAUTH_URL: Zoom API and OAuth token URLs (optional, e.g. for a simulator)
+#
+# Commands:
+# download: downloads the recordings (default)
+# verify: re-checks the SHA-256 checksums of the downloaded recordings
+# search QUERY: searches the downloaded transcripts, captions, chat files and summaries
+# reindex: (re)builds the search index of the downloaded text files, --workers at a time
+#
+# Parameters:
+# --no-delete: doesn't delete the recordings in the Zoom account (optional)
+# --delete-after-days: grace period before deleting the cloud recordings (optional, default 0)
+# --delete-rate: max cloud recording deletions per second (optional, default 2)
+# --workers: number of files downloaded concurrently (optional, default 1, verify: the number of CPUs)
+# --workers-per-user: max concurrent downloads for a single user (optional)
+# --engine: 'threads' (default) or 'async' pipeline, which doesn't support --order (optional)
+# --plan: only list the recordings and write a NDJSON manifest (optional)
+# --execute-manifest: download the recordings of a --plan manifest (optional)
+# --daemon: keep running and poll for new recordings until SIGTERM (optional)
+# --poll-interval, --max-poll-interval: daemon polling bounds in seconds (optional)
+# --webhook-port: daemon: receive recording.completed webhook events on this port (optional)
+# --order: api (default), smallest, largest or oldest first (optional)
+# --reserve-space: free space to keep on the download volume (optional, default 5G)
+# --list-workers: users listed concurrently by the async engine (optional, default 4)
+# --connect-timeout, --read-timeout: HTTP timeouts in seconds (optional)
+# --chunk-size: download buffer size, e.g. 4M (optional, default 1M)
+# --read-strategy: 'readinto' (default) or 'iter_content' (optional)
+# --preallocate: reserve the disk space of each download up front (optional)
+# --segments: parallel connections per large file (optional, default 1)
+# --segment-threshold: size from which files are segmented (optional, default 256M)
+# --dedupe: 'hardlink' or 'reflink' identical recording files (optional)
+# --bandwidth-limit: max download bytes per second of all the downloads together, e.g. 20M (optional)
+# --bandwidth-schedule: limits by local time of day, e.g. 00:00-06:00=0,09:00-17:00=5M; 0 is unlimited (optional)
+# --deadline: start no new downloads after this local time (HH:MM), not with --daemon (optional)
+# --rate-limits: requests per second per API category, e.g. light=30,medium=20,heavy=10 (optional)
+# --state-db: state database shared by several workers (optional)
+# --shard: only handle the users of shard INDEX/COUNT, e.g. 1/3 (optional)
+# --prometheus: also write the run metrics as a Prometheus textfile (optional)
+# --full-rescan: list recordings from January 1st instead of the sync cursor (optional)
+# --from, --to: backfill recordings in an arbitrary date range (optional)
+# --sync-overlap-days: days listed again before the sync cursor (optional, default 3)
+# --pending-max-days: days a meeting left not downloaded by the runs holds the sync cursor back (optional, default 14)
+# --no-index: doesn't index the downloaded text files for search (optional)
+# --limit: search: max hits (optional, default 20)
+# --user: search: only the meetings of this user email (optional)
+# --raw-query: search: the query is in FTS5 syntax (optional)
+
+import argparse
+import os
+import signal
+import sys
+
+from . import downloader
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="zoom-recording-downloader.py",
+                                     description="Downloads the cloud recordings of a Zoom account")
+    parser.add_argument('command', nargs='?', choices=['download', 'verify', 'search', 'reindex'],
+                        default='download',
+                        help="'download' (default) the recordings, 'verify' the checksums of "
+                             "the downloaded ones, 'search' their transcripts, captions, chat files "
+                             "and summaries, or 'reindex' them")
+    parser.add_argument('query', nargs='?', default=None,
+                        help="search: the words to look for")
+    parser.add_argument('--no-delete', dest='delete_recordings', default=True,
+                        action='store_false',
+                        help="Don't delete the recordings in the Zoom account")
+    parser.add_argument('--delete-after-days', dest='delete_after_days', type=float, default=0,
+                        help="Only delete the cloud recordings this many days after their download, "
+                             "once their checksums are verified again (default: 0)")
+    parser.add_argument('--delete-rate', dest='delete_rate', type=downloader.parse_rate, default=downloader.DELETE_RATE,
+                        help="Max cloud recording deletions per second, so that deletions never slow "
+                             f"down the API calls of the downloads (default: {downloader.DELETE_RATE})")
+    parser.add_argument('--workers', dest='max_workers', type=int, default=1,
+                        help="Number of files to download, verify or index concurrently (default: 1, "
+                             "verify: the number of CPUs)")
+    parser.add_argument('--workers-per-user', dest='max_workers_per_user', type=int, default=None,
+                        help="Max number of concurrent downloads for a single user (default: --workers)")
+    parser.add_argument('--engine', choices=['threads', 'async'], default='threads',
+                        help="Download engine: 'threads' lists users one at a time, 'async' runs "
+                             "listing, downloads and post-processing as overlapping stages")
+    parser.add_argument('--plan', metavar='MANIFEST', default=None,
+                        help="Only list the recordings and write what would be downloaded to this "
+                             "NDJSON manifest file")
+    parser.add_argument('--execute-manifest', dest='execute_manifest', metavar='MANIFEST', default=None,
+                        help="Download the recordings of a manifest written by --plan, without "
+                             "listing them again")
+    parser.add_argument('--daemon', action='store_true',
+                        help="Keep running and download new recordings as they appear, until "
+                             "SIGTERM or SIGINT")
+    parser.add_argument('--poll-interval', dest='poll_interval', type=int, default=downloader.POLL_INTERVAL,
+                        help="Daemon: seconds between passes while new recordings appear "
+                             f"(default: {downloader.POLL_INTERVAL})")
+    parser.add_argument('--max-poll-interval', dest='max_poll_interval', type=int, default=downloader.MAX_POLL_INTERVAL,
+                        help="Daemon: max seconds between passes while idle (default: "
+                             f"{downloader.MAX_POLL_INTERVAL})")
+    parser.add_argument('--webhook-port', dest='webhook_port', type=int, default=None,
+                        help="Daemon: receive Zoom recording.completed webhook events on this port "
+                             "and download their recordings right away (needs ZOOM_WEBHOOK_SECRET_TOKEN)")
+    parser.add_argument('--order', choices=list(downloader.SCHEDULING_POLICIES), default='api',
+                        help="Download order of the threads engine: as listed by the API (default), "
+                             "smallest or largest meetings first, or oldest first")
+    parser.add_argument('--reserve-space', dest='reserve_space', type=downloader.parse_size, default='5G',
+                        help="Free space to keep on the download volume; meetings that don't fit "
+                             "are left for a later run (default: 5G)")
+    parser.add_argument('--list-workers', dest='list_workers', type=int, default=4,
+                        help="Number of users whose recordings are listed concurrently by the "
+                             "async engine (default: 4)")
+    parser.add_argument('--connect-timeout', dest='connect_timeout', type=float, default=10,
+                        help="HTTP connect timeout in seconds (default: 10)")
+    parser.add_argument('--read-timeout', dest='read_timeout', type=float, default=60,
+                        help="HTTP read timeout in seconds (default: 60)")
+    parser.add_argument('--chunk-size', dest='chunk_size', type=downloader.parse_size,
+                        default=downloader.DOWNLOAD_CHUNK_SIZE,
+                        help="Size of the buffer downloads are read into, e.g. 256K or 4M (default: 1M)")
+    parser.add_argument('--read-strategy', dest='read_strategy', choices=['readinto', 'iter_content'],
+                        default=downloader.DOWNLOAD_READ_STRATEGY,
+                        help="'readinto' reads the socket into a reusable buffer (default), "
+                             "'iter_content' lets requests allocate every chunk")
+    parser.add_argument('--preallocate', action='store_true',
+                        help="Reserve the disk space of each download up front (posix_fallocate)")
+    parser.add_argument('--segments', type=int, default=1,
+                        help="Download large files over this many parallel connections (default: 1)")
+    parser.add_argument('--segment-threshold', dest='segment_threshold', type=downloader.parse_size,
+                        default=downloader.SEGMENT_THRESHOLD,
+                        help="Size from which files are downloaded in segments (default: 256M)")
+    parser.add_argument('--dedupe', choices=['hardlink', 'reflink'], default=None,
+                        help="Link identical recording files instead of storing them twice (reflinks fall "
+                             "back to hardlinks), and don't download again a file id that was already "
+                             "downloaded")
+    parser.add_argument('--bandwidth-limit', dest='bandwidth_limit', type=downloader.parse_size, default=None,
+                        help="Max download bytes per second of all the downloads together, e.g. 20M "
+                             "(default: unlimited)")
+    parser.add_argument('--bandwidth-schedule', dest='bandwidth_schedule',
+                        type=downloader.parse_bandwidth_schedule, default=None,
+                        help="Bandwidth limits by local time of day, overriding --bandwidth-limit in "
+                             "their windows, e.g. 00:00-06:00=0,09:00-17:00=5M (0: unlimited)")
+    parser.add_argument('--deadline', type=downloader.parse_time_of_day, default=None,
+                        help="Start no new downloads after this local time (HH:MM); the downloads in "
+                             "progress finish. Not with --daemon")
+    parser.add_argument('--rate-limits', dest='rate_limits', type=downloader.parse_rate_limits,
+                        default=dict(downloader.RATE_LIMITS),
+                        help="Requests per second for each Zoom API rate limit category "
+                             "(default: light=30,medium=20,heavy=10)")
+    parser.add_argument('--state-db', dest='state_db', default=None,
+                        help="State database shared by several workers, on a local filesystem "
+                             "(default: state.db in the log directory)")
+    parser.add_argument('--shard', type=downloader.parse_shard, default=None,
+                        help="Only handle the users of this shard, given as INDEX/COUNT, e.g. 1/3")
+    parser.add_argument('--prometheus', action='store_true',
+                        help="Also write the run metrics for the Prometheus node_exporter textfile "
+                             f"collector to {downloader.PROMETHEUS_FILE} in the log directory")
+    parser.add_argument('--full-rescan', dest='full_rescan', action='store_true',
+                        help="Ignore the sync cursors and list recordings from January 1st")
+    parser.add_argument('--from', dest='recordings_from', type=downloader.parse_date, default=None,
+                        help="Backfill: list recordings from this date (YYYY-MM-DD), "
+                             "ignoring the sync cursors")
+    parser.add_argument('--to', dest='recordings_to', type=downloader.parse_date, default=None,
+                        help="Backfill: list recordings up to this date (YYYY-MM-DD, default: today)")
+    parser.add_argument('--sync-overlap-days', dest='sync_overlap_days', type=int, default=3,
+                        help="Days before the sync cursor that are listed again, to catch "
+                             "recordings that finished processing late (default: 3)")
+    parser.add_argument('--pending-max-days', dest='pending_max_days', type=int,
+                        default=downloader.SYNC_PENDING_MAX_AGE.days,
+                        help="Days a meeting that the runs fail to download (e.g. stuck in processing) holds "
+                             "the sync cursor back, after which it is skipped with a warning "
+                             f"(default: {downloader.SYNC_PENDING_MAX_AGE.days})")
+    parser.add_argument('--no-index', dest='index', default=True, action='store_false',
+                        help="Don't index the downloaded transcripts, captions, chat files and "
+                             "summaries for search")
+    parser.add_argument('--limit', type=int, default=20,
+                        help="search: max number of hits (default: 20)")
+    parser.add_argument('--user', default=None,
+                        help="search: only the meetings of this user email")
+    parser.add_argument('--raw-query', dest='raw_query', action='store_true',
+                        help="search: the query is in SQLite FTS5 syntax (AND, OR, NOT, \"phrases\", "
+                             "prefix*, NEAR)")
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    # --workers is left None unless given: verify defaults to the number of
+    # CPUs, as hashing releases the GIL
+    args = parser.parse_args(argv, argparse.Namespace(max_workers=None))
+    if args.max_workers is None:
+        args.max_workers = (os.cpu_count() or 1) if args.command == 'verify' else parser.get_default('max_workers')
+
+    if args.daemon and (args.plan or args.execute_manifest):
+        parser.error("--daemon can't be combined with --plan or --execute-manifest")
+    if args.engine == 'async' and args.order != 'api' and not args.execute_manifest:
+        parser.error("--order requires --engine threads: the async engine downloads the meetings as they are listed")
+    if args.daemon and args.deadline is not None:
+        parser.error("--deadline can't be combined with --daemon: it stops the run for good")
+    if args.webhook_port is not None and not args.daemon:
+        parser.error("--webhook-port requires --daemon")
+    if args.command == 'search' and not args.query:
+        parser.error("the search command requires a query")
+    if args.command != 'search' and args.query is not None:
+        parser.error(f"unexpected argument {args.query!r}")
+
+    try:
+        # Only the downloads call the Zoom API
+        downloader.load_environment(credentials=args.command == 'download')
+    except downloader.ConfigurationError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if args.webhook_port is not None and not downloader.WEBHOOK_SECRET_TOKEN:
+        parser.error("--webhook-port requires the ZOOM_WEBHOOK_SECRET_TOKEN environment variable")
+
+    # Tell Python to shut down gracefully when SIGINT or SIGTERM is received
+    signal.signal(signal.SIGINT, downloader.handle_graceful_shutdown)
+    signal.signal(signal.SIGTERM, downloader.handle_graceful_shutdown)
+
+    downloader.configure_polling(args.poll_interval, args.max_poll_interval)
+
+    if args.command == 'verify':
+        sys.exit(0 if downloader.verify_archive(os.path.abspath(os.path.expanduser(downloader.DOWNLOAD_DIRECTORY)),
+                                                args.max_workers) else 1)
+
+    if args.command == 'search':
+        from . import search
+
+        sys.exit(0 if search.search_command(downloader.SEARCH_DB, args.query, args.limit, args.user,
+                                            args.recordings_from, args.recordings_to,
+                                            args.raw_query) else 1)
+
+    if args.command == 'reindex':
+        from . import search
+
+        downloader.configure_state_store(args.state_db, None)
+        search.reindex_command(downloader.SEARCH_DB, os.path.abspath(os.path.expanduser(downloader.DOWNLOAD_DIRECTORY)),
+                               search.meeting_uuids_of(downloader.state_store().downloaded_paths()),
+                               args.max_workers)
+        downloader.state_store().close()
+        sys.exit(0)
+
+    downloader.main(args)
@@ -0,0 +1,3430 @@
+# -*- coding: utf-8 -*-
+
+# Program Name: zoom-recording-downloader.py
+# Description:  Zoom Recording Downloader is a cross-platform Python script
+#               that uses Zoom's API (v2) to download and organize all
+#               cloud recordings from a Zoom account onto local storage.
+#               This Python script uses Server-to-Server OAuth
+#               (see https://developers.zoom.us/docs/internal-apps/) method of
+#               accessing the Zoom API.
+# Created:      2021-05-29
+# Author:       Alessandro Bortolussi
+# Website:      https://github.com/alborworld/zoom-recording-downloader
+# Forked from:  https://github.com/ricardorodrigues-ca/zoom-recording-downloader
+#
+# The downloader itself: importing it has no side effects, and the heavy
+# dependencies (requests, tqdm, pathvalidate, asyncio, http.server) are
+# imported by the functions that need them. The configuration is read from
+# the environment by load_environment(); the command line is in cli.py.
+
+import argparse
+import base64
+import collections
+import contextlib
+import hashlib
+import hmac
+import json
+import mmap
+import queue
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import shutil
+import signal
+import socket
+import sqlite3
+import time
+import re as regex
+from datetime import datetime, timedelta, timezone
+import os
+import sys as system
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no reflinks
+    fcntl = None
+
+from . import APP_VERSION
+
+# Read from the environment by load_environment()
+DOWNLOAD_DIRECTORY = None
+LOG_DIRECTORY = '/var/log/zoom-recording-downloader'
+CLIENT_ID = None
+CLIENT_SECRET = None
+ACCOUNT_ID = None
+# Secret token of the webhook-only app, to validate recording.completed events
+WEBHOOK_SECRET_TOKEN = None
+# Overridable to target a local simulator (see benchmarks/zoom_simulator.py)
+API_ENDPOINT = "https://api.zoom.us/v2/"
+OAUTH_URL = "https://zoom.us/oauth/token"
+
+RECORDING_START_YEAR = datetime.today().year
+RECORDING_START_MONTH = 1
+RECORDING_START_DAY = 1
+RECORDING_END_DATE = datetime.today()
+RECORDING_FROM_DATE = None  # explicit backfill range, overrides the sync cursors
+FULL_RESCAN = False
+SYNC_OVERLAP = timedelta(days=3)
+SYNC_PENDING_MAX_AGE = timedelta(days=14)  # meetings left pending longer don't hold the cursors back...
+SYNC_PENDING_MIN_PASSES = 3  # ...once this many passes have failed to complete them
+SYNC_CURSORS_FILE = None  # sync-cursors.json in LOG_DIRECTORY
+SYNC_CURSORS = {}  # user id -> last fully-synced end date (YYYY-MM-DD)
+SYNC_PENDING = {}  # user id -> {meeting uuid: start date} listed during this run
+SYNC_WINDOWS = {}  # user id -> (end date, full rescan) of the listing of an executed manifest
+SYNC_LOCK = threading.RLock()  # re-entered by exit_now() from a signal handler
+# Completed meeting ids of older versions, migrated into the state store
+COMPLETED_MEETING_IDS_LOG = None  # completed-downloads.log in LOG_DIRECTORY
+STATE_DB = None  # state.db in LOG_DIRECTORY, unless --state-db
+STATE_COMMIT_BATCH = 100
+STATE_COMMIT_INTERVAL = 1.0  # seconds
+STATE = None
+STATE_LOCK = threading.Lock()
+# Workers sharing a state store split the users (--shard) and lease meetings
+SHARD = None  # (index, count)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+LEASE_TTL = 600  # seconds, renewed every LEASE_TTL / 3 while the worker runs
+LEASED_MEETINGS = {}  # meeting uuid -> whether this worker holds its lease
+LEASE_LOCK = threading.Lock()
+LEASE_RENEWER = None
+
+# Set on SIGTERM/SIGINT: no new downloads are started, the running ones finish
+SHUTDOWN = threading.Event()
+POLL_INTERVAL = 600  # seconds between daemon passes that found new recordings
+MAX_POLL_INTERVAL = 3600  # the interval doubles up to this while idle
+WEBHOOK_SERVER = None
+WEBHOOK_QUEUE = queue.Queue()  # recordings of the recording.completed events
+WEBHOOK_MAX_AGE = 300  # seconds, older events are rejected as replays
+WEBHOOK_MAX_BODY = 64 * 1024  # bytes, Zoom events are a few KB; larger requests are rejected unread
+STOP_TIMER = None  # sets SHUTDOWN at the --deadline
+
+RUN_REPORT_FILE = 'run-report.json'
+PROMETHEUS_FILE = 'zoom_recording_downloader.prom'
+METRICS_PREFIX = "zoom_recording_downloader"
+
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_RETRY_DELAY = 1  # seconds before the second attempt, doubled after each one, with jitter
+DOWNLOAD_RETRY_DELAY_MAX = 30
+PARTIAL_STATE_INTERVAL = 8 * 1024 * 1024  # update the .part.json sidecar every 8 MiB
+CHECKSUM_EXTENSION = ".sha256"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_READ_STRATEGY = "readinto"  # or "iter_content"
+PREALLOCATE = False
+PROGRESS_UPDATE_BYTES = 4 * 1024 * 1024
+DEDUPE = None  # "hardlink" or "reflink": identical files share their storage
+DOWNLOAD_SEGMENTS = 1  # parallel byte-range connections per large file
+SEGMENT_THRESHOLD = 256 * 1024 * 1024  # files from this size are segmented
+# Download bytes per second shared by all the streams, by local time of day (--bandwidth-limit/--bandwidth-schedule)
+BANDWIDTH = None
+BANDWIDTH_BURST = 0.25  # seconds of the rate that can be downloaded at once after an idle period
+BANDWIDTH_SCHEDULE_CHECK = 1.0  # seconds between checks of the schedule
+FICLONE = 0x40049409  # Linux ioctl cloning a file's extents (btrfs, XFS)
+HASH_SLICE = 8 * 1024 * 1024
+
+ACCESS_TOKEN = None
+ACCESS_TOKEN_EXPIRES_AT = 0
+ACCESS_TOKEN_CACHE = None  # access-token.json in LOG_DIRECTORY
+ACCESS_TOKEN_REFRESH_MARGIN = 300  # refresh tokens this many seconds before they expire
+ACCESS_TOKEN_LOCK = threading.Lock()
+ACCESS_TOKEN_FAILURES = 0  # consecutive failed token fetches
+ACCESS_TOKEN_RETRY_AT = 0  # no token is fetched before this time after a failure
+ACCESS_TOKEN_RETRY_MAX = 60  # seconds, the delay between failed fetches doubles up to this
+
+USERS_PAGE_SIZE = 300
+
+# Requests per second for each Zoom API rate limit category (Pro plan)
+RATE_LIMITS = {"light": 30, "medium": 20, "heavy": 10}
+RATE_LIMITERS = {}
+API_CONCURRENCY = None
+API_RETRIES = 5
+RETRY_BACKOFF_MAX = 60
+MAX_RETRY_WAIT = 300  # longer Retry-After (e.g. daily quota) aborts the request
+
+# Cloud recordings are deleted in the background, from the deletions table
+DELETIONS = None
+DELETE_RATE = 2  # requests per second, on top of the light category's limit
+DELETE_WORKERS = 2
+DELETE_GRACE = 0  # seconds between the download and the deletion
+DELETE_RETRY_DELAY = 60  # seconds, doubled after each failed attempt
+DELETE_RETRY_MAX = 24 * 3600
+DELETE_CLAIM_TTL = 600  # seconds a claimed deletion is hidden from the other workers
+
+# Transcripts, captions, chat files and summaries are indexed in the background (see search.py)
+SEARCH_DB = None  # search.db in LOG_DIRECTORY
+INDEXER = None
+
+API_EXECUTOR = None
+HTTP_SESSION = None
+HTTP_TIMEOUT = (10, 60)  # (connect, read) seconds
+
+
+class Color:
+    PURPLE = "\033[95m"
+    CYAN = "\033[96m"
+    DARK_CYAN = "\033[36m"
+    BLUE = "\033[94m"
+    GREEN = "\033[92m"
+    YELLOW = "\033[93m"
+    RED = "\033[91m"
+    BOLD = "\033[1m"
+    UNDERLINE = "\033[4m"
+    END = "\033[0m"
+
+
+class Metrics:
+    """ Run metrics: per-phase timers (count, total and max duration) and
+        counters with optional labels, e.g. HTTP responses by status.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = datetime.now(timezone.utc)
+            self._started = time.monotonic()
+            self._phases = {}
+            self._counters = collections.Counter()
+
+    @contextlib.contextmanager
+    def timer(self, phase):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - started)
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            timer = self._phases.setdefault(phase, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            timer["count"] += 1
+            timer["total_seconds"] += seconds
+            timer["max_seconds"] = max(timer["max_seconds"], seconds)
+
+    def increment(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += value
+
+    def value(self, name, **labels):
+        with self._lock:
+            return self._counters[(name, tuple(sorted(labels.items())))]
+
+    def report(self):
+        duration = time.monotonic() - self._started
+        with self._lock:
+            phases = {phase: dict(timer) for phase, timer in self._phases.items()}
+            counters = collections.defaultdict(list)
+            for (name, labels), value in sorted(self._counters.items()):
+                counters[name].append(dict(labels, value=value))
+
+        download_seconds = phases.get("download", {}).get("total_seconds", 0)
+        downloaded_bytes = sum(item["value"] for item in counters.get("downloaded_bytes", []))
+        return {
+            "started_at": self.started_at.isoformat(),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "duration_seconds": duration,
+            "phases": phases,
+            "counters": dict(counters),
+            # bytes per second of wall time, and per second spent in a single download
+            "throughput_bytes_per_second": downloaded_bytes / duration if duration else 0,
+            "download_stream_bytes_per_second": downloaded_bytes / download_seconds if download_seconds else 0,
+            "http": http_connection_stats()
+        }
+
+    def write_json(self, filename, report):
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, 'w', encoding='utf-8') as fd:
+            json.dump(report, fd, indent=2)
+        os.replace(tmp_filename, filename)
+
+    def write_prometheus(self, filename, report):
+        """ Writes the report in the text format of the node_exporter textfile collector
+        """
+        def labels(**values):
+            return "{" + ",".join(f'{key}="{value}"' for key, value in values.items()) + "}" if values else ""
+
+        lines = [
+            f"# HELP {METRICS_PREFIX}_last_run_timestamp_seconds End time of the last run.",
+            f"# TYPE {METRICS_PREFIX}_last_run_timestamp_seconds gauge",
+            f"{METRICS_PREFIX}_last_run_timestamp_seconds {time.time():.0f}",
+            f"# TYPE {METRICS_PREFIX}_run_duration_seconds gauge",
+            f"{METRICS_PREFIX}_run_duration_seconds {report['duration_seconds']:.3f}",
+            f"# TYPE {METRICS_PREFIX}_throughput_bytes_per_second gauge",
+            f"{METRICS_PREFIX}_throughput_bytes_per_second {report['throughput_bytes_per_second']:.0f}",
+        ]
+        for name, key in (("phase_seconds", "total_seconds"), ("phase_max_seconds", "max_seconds"),
+                          ("phase_calls", "count")):
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name} gauge")
+            for phase, timer in sorted(report["phases"].items()):
+                lines.append(f"{METRICS_PREFIX}_{name}{labels(phase=phase)} {timer[key]:g}")
+
+        for name, items in sorted(report["counters"].items()):
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name} gauge")
+            for item in items:
+                item = dict(item)
+                value = item.pop("value")
+                lines.append(f"{METRICS_PREFIX}_{name}{labels(**item)} {value}")
+
+        # Written next to the final file and renamed, so the collector never reads half a file
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, 'w', encoding='utf-8') as fd:
+            fd.write("\n".join(lines) + "\n")
+        os.replace(tmp_filename, filename)
+
+
+METRICS = Metrics()
+
+
+def write_run_report(prometheus):
+    report = METRICS.report()
+    METRICS.write_json(os.path.join(LOG_DIRECTORY, RUN_REPORT_FILE), report)
+    if prometheus:
+        METRICS.write_prometheus(os.path.join(LOG_DIRECTORY, PROMETHEUS_FILE), report)
+
+    phases = ", ".join(
+        f"{phase} {timer['total_seconds']:.1f}s" for phase, timer in sorted(report["phases"].items())
+    )
+    print(f"==> Time per phase: {phases}")
+    print(f"==> Downloaded {format_size(METRICS.value('downloaded_bytes'))} "
+          f"at {format_size(report['throughput_bytes_per_second'])}/s")
+
+
+def configure_http_session(pool_size, connect_timeout=10, read_timeout=60):
+    """ Creates the HTTP session shared by all API calls and downloads, so that
+        connections (and their TLS handshakes) are reused through keep-alive.
+        Each host gets a pool of `pool_size` connections, which should match the
+        number of concurrent requests.
+    """
+    global HTTP_SESSION
+    global HTTP_TIMEOUT
+
+    import requests
+    import requests.adapters
+
+    adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    HTTP_SESSION = session
+    HTTP_TIMEOUT = (connect_timeout, read_timeout)
+
+
+def http_request(method, url, **kwargs):
+    """ Sends a request through the shared HTTP session
+    """
+    if HTTP_SESSION is None:
+        configure_http_session(pool_size=10)
+
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    return HTTP_SESSION.request(method, url, **kwargs)
+
+
+def http_connection_stats():
+    """ Returns the number of requests sent and connections opened by the
+        shared HTTP session (for the connection pools still alive)
+    """
+    stats = {"requests": 0, "connections": 0}
+    if HTTP_SESSION is None:
+        return stats
+
+    for adapter in set(HTTP_SESSION.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                stats["requests"] += pool.num_requests
+                stats["connections"] += pool.num_connections
+
+    stats["reused"] = max(0, stats["requests"] - stats["connections"])
+    return stats
+
+
+class TokenBucket:
+    """ Thread-safe token bucket refilled at `rate` requests per second.
+
+        When the API throttles us, the rate is halved and the bucket blocked
+        until the retry delay has passed; every successful request then moves
+        the rate back towards its configured maximum.
+    """
+
+    def __init__(self, rate):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+    def throttle(self, delay):
+        with self._lock:
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+            self.tokens = 0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+    def recover(self):
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class AdaptiveConcurrency:
+    """ Limits the number of API requests in flight. The limit is halved when a
+        request is throttled and grows back by one every `limit` successful
+        requests (additive increase, multiplicative decrease).
+    """
+
+    def __init__(self, max_limit):
+        self.max_limit = max(1, max_limit)
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, throttled=False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class BandwidthLimiter:
+    """ Token bucket of download bytes shared by all the download streams.
+
+        Its rate follows a schedule of (start minute, end minute, rate) windows
+        of the local time of day, which may wrap around midnight, and is
+        `rate` outside of them; a rate of None is unlimited. Each stream takes
+        the bytes of a chunk once it is read and sleeps off the deficit, so
+        that the aggregate rate holds however many streams share the bucket.
+    """
+
+    def __init__(self, rate, schedule=()):
+        self.default_rate = rate
+        self.schedule = list(schedule)
+        self.rate = None
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self._next_check = 0
+        self._lock = threading.Lock()
+
+    def rate_at(self, minute):
+        for start, end, rate in self.schedule:
+            if start <= minute < end or (end < start and (minute >= start or minute < end)):
+                return rate
+        return self.default_rate
+
+    def consume(self, amount):
+        now = time.monotonic()
+        if now >= self._next_check:
+            local_time = time.localtime()
+            with self._lock:
+                self.rate = self.rate_at(local_time.tm_hour * 60 + local_time.tm_min)
+                self._next_check = now + BANDWIDTH_SCHEDULE_CHECK
+
+        if self.rate is None:
+            return
+
+        with self._lock:
+            rate = self.rate
+            self.tokens = min(rate * BANDWIDTH_BURST, self.tokens + (now - self.updated) * rate)
+            self.updated = now
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return
+            wait = -self.tokens / rate
+
+        METRICS.increment("bandwidth_wait_seconds", wait)
+        time.sleep(wait)
+
+
+def parse_rate(value):
+    """ Parses a positive number of requests per second
+    """
+    try:
+        rate = float(value)
+    except ValueError:
+        rate = 0
+    if not 0 < rate < float("inf"):
+        raise argparse.ArgumentTypeError(f"invalid rate '{value}', expected a positive number of requests per second")
+    return rate
+
+
+def parse_rate_limits(value):
+    """ Parses 'light=30,medium=20,heavy=10' into a dict of requests per second
+    """
+    limits = dict(RATE_LIMITS)
+    for item in value.split(","):
+        category, _, rate = item.partition("=")
+        if category.strip() not in limits or not rate:
+            raise argparse.ArgumentTypeError(f"invalid rate limit '{item}'")
+        limits[category.strip()] = parse_rate(rate)
+
+    return limits
+
+
+def parse_time_of_day(value):
+    """ Parses 'HH:MM' into minutes since midnight
+    """
+    hours, _, minutes = value.strip().partition(":")
+    if not (hours.isdigit() and minutes.isdigit() and int(hours) < 24 and int(minutes) < 60):
+        raise argparse.ArgumentTypeError(f"invalid time of day '{value}', expected HH:MM")
+    return int(hours) * 60 + int(minutes)
+
+
+def parse_bandwidth_schedule(value):
+    """ Parses '00:00-06:00=0,09:00-17:00=5M' into a list of (start minute,
+        end minute, bytes per second) windows, 0 meaning unlimited (None)
+    """
+    schedule = []
+    for item in value.split(","):
+        window, _, rate = item.partition("=")
+        start, _, end = window.partition("-")
+        if not rate or not end:
+            raise argparse.ArgumentTypeError(f"invalid bandwidth window '{item}', expected HH:MM-HH:MM=RATE")
+        schedule.append((parse_time_of_day(start), parse_time_of_day(end), parse_size(rate) or None))
+
+    return schedule
+
+
+def configure_bandwidth(limit, schedule):
+    global BANDWIDTH
+
+    BANDWIDTH = BandwidthLimiter(limit or None, schedule or ()) if limit or schedule else None
+
+
+def configure_rate_limits(rate_limits, max_concurrency):
+    global API_CONCURRENCY
+
+    RATE_LIMITERS.clear()
+    RATE_LIMITERS.update({category: TokenBucket(rate) for category, rate in rate_limits.items()})
+    API_CONCURRENCY = AdaptiveConcurrency(max_concurrency)
+
+
+def retry_delay(response, attempt):
+    """ Seconds to wait before retrying: the server's Retry-After if any, else
+        an exponential backoff with full jitter
+    """
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+
+        from email.utils import parsedate_to_datetime
+
+        try:
+            retry_at = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            try:
+                retry_at = datetime.fromisoformat(retry_after.replace("Z", "+00:00"))
+            except ValueError:
+                retry_at = None
+
+        if retry_at is not None:
+            if retry_at.tzinfo is None:
+                retry_at = retry_at.replace(tzinfo=timezone.utc)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+    return random.uniform(0.5, min(RETRY_BACKOFF_MAX, 2 ** attempt))
+
+
+def api_request(category, method, url, **kwargs):
+    """ Sends a Zoom API request within the rate limits of its category
+        ('light', 'medium' or 'heavy'), retrying throttled (429), failed (5xx)
+        and timed out requests with backoff, and requests rejected with 401
+        once after refreshing the access token. Returns the last response, or
+        raises the last connection error.
+    """
+    import requests
+
+    if not RATE_LIMITERS:
+        configure_rate_limits(RATE_LIMITS, 10)
+
+    bucket = RATE_LIMITERS[category]
+    response = None
+    error = None
+    token_refreshed = False
+
+    for attempt in range(API_RETRIES + 1):
+        bucket.acquire()
+        API_CONCURRENCY.acquire()
+        access_token = current_access_token()
+        try:
+            response = http_request(method, url, headers={
+                "Authorization": f"Bearer {access_token}",
+                "Content-Type": "application/json"
+            }, **kwargs)
+            error = None
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            response = None
+            error = e
+
+        status = str(response.status_code) if response is not None else type(error).__name__
+        METRICS.increment("api_requests", category=category, status=status)
+
+        if response is not None and response.status_code == 401 and not token_refreshed:
+            # The token expired or was revoked: refresh it once and try again
+            API_CONCURRENCY.release()
+            refresh_access_token(access_token)
+            token_refreshed = True
+            continue
+
+        throttled = response is not None and response.status_code == 429
+        API_CONCURRENCY.release(throttled)
+
+        if response is not None and not throttled and response.status_code < 500:
+            bucket.recover()
+
+            remaining = response.headers.get("X-RateLimit-Remaining")
+            if response.headers.get("X-RateLimit-Type") == "Daily-limit" and remaining == "0":
+                print(f"{Color.YELLOW}### Daily API quota for {category} requests exhausted{Color.END}")
+
+            return response
+
+        if attempt == API_RETRIES:
+            break
+
+        delay = retry_delay(response, attempt)
+        if delay > MAX_RETRY_WAIT:
+            # Typically the daily quota: no point in waiting for it
+            print(
+                f"{Color.RED}### {method} {url.split('?')[0]} throttled until "
+                f"{datetime.now() + timedelta(seconds=delay)}, giving up{Color.END}"
+            )
+            break
+
+        if throttled:
+            bucket.throttle(delay)
+
+        METRICS.increment("api_retries", category=category, status=status)
+        print(
+            f"{Color.YELLOW}### {method} {url.split('?')[0]} failed with "
+            f"{response.status_code if response is not None else error}, retrying in {delay:.1f}s{Color.END}"
+        )
+        time.sleep(delay)
+
+    if response is None:
+        raise error
+
+    return response
+
+
+@METRICS.timer("auth")
+def fetch_access_token():
+    """ OAuth function, thanks to https://github.com/freelimiter
+    """
+    url = f"{OAUTH_URL}?grant_type=account_credentials&account_id={ACCOUNT_ID}"
+
+    client_cred = f"{CLIENT_ID}:{CLIENT_SECRET}"
+    client_cred_base64_string = base64.b64encode(
+        client_cred.encode("utf-8")).decode("utf-8")
+
+    headers = {
+        "Authorization": f"Basic {client_cred_base64_string}",
+        "Content-Type": "application/x-www-form-urlencoded"
+    }
+
+    response = json.loads(http_request("POST", url, headers=headers).text)
+
+    try:
+        return response["access_token"], time.time() + int(response.get("expires_in", 3600))
+
+    except KeyError:
+        print(f"{Color.RED}### The key 'access_token' wasn't found.{Color.END}")
+        return None, 0
+
+
+def load_cached_access_token():
+    try:
+        with open(ACCESS_TOKEN_CACHE, 'r') as fd:
+            cache = json.load(fd)
+    except (OSError, ValueError):
+        return None, 0
+
+    if cache.get("account_id") != ACCOUNT_ID or cache.get("client_id") != CLIENT_ID:
+        return None, 0
+
+    return cache.get("access_token"), cache.get("expires_at", 0)
+
+
+def save_cached_access_token(access_token, expires_at):
+    # Only the owner may read the cached token
+    tmp_filename = f"{ACCESS_TOKEN_CACHE}.{os.getpid()}.tmp"
+    fd = os.open(tmp_filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as file:
+        json.dump({
+            "account_id": ACCOUNT_ID,
+            "client_id": CLIENT_ID,
+            "access_token": access_token,
+            "expires_at": expires_at
+        }, file)
+    os.chmod(tmp_filename, 0o600)
+    os.replace(tmp_filename, ACCESS_TOKEN_CACHE)
+
+
+def set_access_token(access_token, expires_at):
+    global ACCESS_TOKEN
+    global ACCESS_TOKEN_EXPIRES_AT
+
+    ACCESS_TOKEN = access_token
+    ACCESS_TOKEN_EXPIRES_AT = expires_at
+
+
+def renew_access_token():
+    """ Fetches and caches a new access token, called under ACCESS_TOKEN_LOCK.
+        After a failed fetch, no token is fetched for a delay doubling up to
+        ACCESS_TOKEN_RETRY_MAX, rather than once per API call.
+    """
+    global ACCESS_TOKEN_FAILURES
+    global ACCESS_TOKEN_RETRY_AT
+
+    if time.time() < ACCESS_TOKEN_RETRY_AT:
+        return None, 0
+
+    try:
+        access_token, expires_at = fetch_access_token()
+    except (OSError, ValueError) as e:
+        print(f"{Color.RED}### Could not fetch an access token because {Color.END}'{e}'")
+        access_token, expires_at = None, 0
+
+    if access_token:
+        ACCESS_TOKEN_FAILURES = 0
+        ACCESS_TOKEN_RETRY_AT = 0
+        save_cached_access_token(access_token, expires_at)
+    else:
+        delay = min(ACCESS_TOKEN_RETRY_MAX, 2 ** ACCESS_TOKEN_FAILURES)
+        ACCESS_TOKEN_FAILURES += 1
+        ACCESS_TOKEN_RETRY_AT = time.time() + delay
+        print(f"{Color.YELLOW}### No access token, fetching it again in {delay}s{Color.END}")
+
+    return access_token, expires_at
+
+
+def load_access_token():
+    """ Loads the access token from the cache shared across runs, or fetches
+        a new one if the cached token is missing or about to expire
+    """
+    with ACCESS_TOKEN_LOCK:
+        access_token, expires_at = load_cached_access_token()
+        if not access_token or expires_at - ACCESS_TOKEN_REFRESH_MARGIN <= time.time():
+            access_token, expires_at = renew_access_token()
+
+        set_access_token(access_token, expires_at)
+
+
+def refresh_access_token(stale_token=None):
+    """ Fetches a new access token. When `stale_token` is given (the token a
+        request was rejected with), nothing is done if another thread has
+        already replaced it.
+    """
+    with ACCESS_TOKEN_LOCK:
+        if stale_token is not None and stale_token != ACCESS_TOKEN:
+            return
+
+        access_token, expires_at = renew_access_token()
+        if access_token:
+            set_access_token(access_token, expires_at)
+
+
+def current_access_token():
+    """ Returns the access token, refreshing it proactively shortly before it expires
+    """
+    access_token = ACCESS_TOKEN
+    if ACCESS_TOKEN_EXPIRES_AT - ACCESS_TOKEN_REFRESH_MARGIN <= time.time():
+        refresh_access_token(access_token)
+
+    return ACCESS_TOKEN
+
+
+def sign_download_url(download_url):
+    """ Download URLs are signed with the current access token when they are
+        requested, so downloads queued before a token refresh use the new token
+    """
+    return f"{download_url}?access_token={current_access_token()}"
+
+
+def configure_api_executor(max_workers):
+    """ Creates the thread pool used to send independent listing requests
+        (user pages, recording windows) concurrently
+    """
+    global API_EXECUTOR
+
+    API_EXECUTOR = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="api")
+
+
+def api_map(function, iterable):
+    """ Like map(), but runs the calls on the API thread pool
+    """
+    if API_EXECUTOR is None:
+        configure_api_executor(4)
+
+    return list(API_EXECUTOR.map(function, iterable))
+
+
+def get_user_page(page_number):
+    response = api_request("medium", "GET", API_ENDPOINT + "/users",
+                           params={"page_size": USERS_PAGE_SIZE, "page_number": page_number})
+
+    if not response.ok:
+        print(response)
+        print(
+            f"{Color.RED}### Could not retrieve users. Please make sure that your access "
+            f"token is still valid{Color.END}"
+        )
+
+        # Ends a one-shot run (see main), the daemon tries again on its next pass
+        raise IOError(f"listing users failed with {response.status_code}: {response.text}")
+
+    return response.json()
+
+
+@METRICS.timer("get_users")
+def get_users():
+    """ Fetches the first page of users, then all the other pages concurrently
+    """
+    first_page = get_user_page(1)
+    total_pages = int(first_page["page_count"])
+
+    pages = [first_page] + api_map(get_user_page, range(2, total_pages + 1))
+
+    all_users = []
+    for user_data in pages:
+        all_users.extend([
+            (
+                user["email"],
+                user["id"],
+                user["first_name"],
+                user["last_name"]
+            )
+            for user in user_data["users"]
+        ])
+
+    if SHARD:
+        shard_users = [user for user in all_users if user_shard(user[1], SHARD[1]) == SHARD[0]]
+        print(f"==> Shard {SHARD[0] + 1} of {SHARD[1]}: {len(shard_users)} of {len(all_users)} users")
+        return shard_users
+
+    return all_users
+
+
+def user_shard(user_id, shard_count):
+    """ Rendezvous (highest random weight) hashing of a user id onto one of
+        `shard_count` shards: changing the number of shards only moves the
+        users of the added or removed shards
+    """
+    return max(
+        range(shard_count),
+        key=lambda shard: hashlib.sha1(f"{shard}:{user_id}".encode("utf-8")).digest()
+    )
+
+
+def parse_start_time(value):
+    """ Parses the start time of a recording. Zoom's fixed format
+        ("2024-01-02T10:00:00Z") is sliced directly, anything else goes through
+        datetime.fromisoformat
+    """
+    if len(value) == 20 and value[4] == "-" and value[7] == "-" and value[10] == "T" and value[19] == "Z":
+        return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                        int(value[11:13]), int(value[14:16]), int(value[17:19]), tzinfo=timezone.utc)
+
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def format_filename(params):
+    file_extension = params["file_extension"]
+    recording = params["recording"]
+    recording_type = params["recording_type"]
+
+    invalid_chars_pattern = r'[<>:"/\\|?*\x00-\x1F]'
+    topic = regex.sub(invalid_chars_pattern, '', recording["topic"])
+    rec_type = recording_type.replace("_", " ").title()
+    meeting_datetime = parse_start_time(recording["start_time"])
+
+    # Change .vtt extension to txt
+    if file_extension.lower() == 'vtt':
+        file_extension = '.txt'
+
+    return '{} - {} UTC - {}.{}'.format(
+        meeting_datetime.strftime('%Y.%m.%d'), meeting_datetime.strftime('%I.%M %p'),
+        topic + " - " + rec_type, file_extension)
+
+
+def get_downloads(recording):
+    if not recording.get("recording_files"):
+        raise Exception
+
+    downloads = []
+    for download in recording["recording_files"]:
+        file_type = download["file_type"]
+        file_extension = download["file_extension"]
+        recording_id = download["id"]
+
+        if file_type == "":
+            recording_type = "incomplete"
+        elif file_type != "TIMELINE":
+            recording_type = download["recording_type"]
+        else:
+            recording_type = download["file_type"]
+
+        # the access token is appended when downloading (see sign_download_url)
+        download_url = download['download_url']
+        downloads.append((file_type, file_extension, download_url,
+                          recording_type, recording_id, download.get("file_size", 0)))
+
+    return downloads
+
+
+def get_recordings(email, page_size, rec_start_date, rec_end_date):
+    return {
+        "userId": email,
+        "page_size": page_size,
+        "from": rec_start_date,
+        "to": rec_end_date
+    }
+
+
+def per_delta(start, end, delta):
+    """ Generator used to create deltas for recording start and end dates
+    """
+    curr = start
+    while curr < end:
+        yield curr, min(curr + delta, end)
+        curr += delta
+
+
+def parse_size(value):
+    """ Parses a size such as '512', '64K', '4M' or '1G' (binary units) into bytes
+    """
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    value = value.strip().upper().rstrip("B").rstrip("I")
+    try:
+        if value[-1:] in units:
+            return int(float(value[:-1]) * units[value[-1]])
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size '{value}'")
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+class ConfigurationError(ValueError):
+    pass
+
+
+def load_environment(environ=None, credentials=True):
+    """ Reads the configuration from the environment variables (see cli.py)
+        and creates the log directory. Raises ConfigurationError when the
+        download directory or, with `credentials`, the OAuth app credentials
+        are missing.
+    """
+    global DOWNLOAD_DIRECTORY
+    global LOG_DIRECTORY
+    global CLIENT_ID
+    global CLIENT_SECRET
+    global ACCOUNT_ID
+    global WEBHOOK_SECRET_TOKEN
+    global API_ENDPOINT
+    global OAUTH_URL
+    global SYNC_CURSORS_FILE
+    global COMPLETED_MEETING_IDS_LOG
+    global STATE_DB
+    global ACCESS_TOKEN_CACHE
+    global SEARCH_DB
+
+    environ = os.environ if environ is None else environ
+
+    DOWNLOAD_DIRECTORY = environ.get('DOWNLOAD_DIRECTORY')
+    LOG_DIRECTORY = environ.get('LOG_DIRECTORY', '/var/log/zoom-recording-downloader')
+    if not DOWNLOAD_DIRECTORY:
+        raise ConfigurationError("Environment variable DOWNLOAD_DIRECTORY not defined.")
+
+    CLIENT_ID = environ.get('ZOOM_CLIENT_ID')
+    CLIENT_SECRET = environ.get('ZOOM_CLIENT_SECRET')
+    ACCOUNT_ID = environ.get('ZOOM_ACCOUNT_ID')
+    WEBHOOK_SECRET_TOKEN = environ.get('ZOOM_WEBHOOK_SECRET_TOKEN')
+    if credentials and (not CLIENT_ID or not CLIENT_SECRET or not ACCOUNT_ID):
+        raise ConfigurationError("ZOOM_CLIENT_ID or ZOOM_CLIENT_SECRET or ZOOM_ACCOUNT_ID not defined.")
+
+    API_ENDPOINT = environ.get('ZOOM_API_ENDPOINT', API_ENDPOINT)
+    OAUTH_URL = environ.get('ZOOM_OAUTH_URL', OAUTH_URL)
+
+    # Ensure log directory exists
+    os.makedirs(LOG_DIRECTORY, exist_ok=True)
+
+    SYNC_CURSORS_FILE = os.path.join(LOG_DIRECTORY, 'sync-cursors.json')
+    COMPLETED_MEETING_IDS_LOG = os.path.join(LOG_DIRECTORY, 'completed-downloads.log')
+    STATE_DB = os.path.join(LOG_DIRECTORY, 'state.db')
+    ACCESS_TOKEN_CACHE = os.path.join(LOG_DIRECTORY, 'access-token.json')
+    SEARCH_DB = os.path.join(LOG_DIRECTORY, 'search.db')
+
+
+def configure_polling(poll_interval, max_poll_interval):
+    global POLL_INTERVAL
+    global MAX_POLL_INTERVAL
+
+    POLL_INTERVAL = max(1, poll_interval)
+    MAX_POLL_INTERVAL = max(POLL_INTERVAL, max_poll_interval)
+
+
+def configure_write_path(chunk_size, read_strategy, preallocate, dedupe=None, segments=1,
+                         segment_threshold=SEGMENT_THRESHOLD):
+    global DOWNLOAD_CHUNK_SIZE
+    global DOWNLOAD_READ_STRATEGY
+    global PREALLOCATE
+    global DEDUPE
+    global DOWNLOAD_SEGMENTS
+    global SEGMENT_THRESHOLD
+
+    DOWNLOAD_CHUNK_SIZE = max(4096, chunk_size)
+    DOWNLOAD_READ_STRATEGY = read_strategy
+    PREALLOCATE = preallocate
+    DEDUPE = dedupe
+    DOWNLOAD_SEGMENTS = max(1, segments)
+    SEGMENT_THRESHOLD = segment_threshold
+
+
+def configure_sync_window(full_rescan, recordings_from, recordings_to, overlap_days,
+                          pending_max_days=SYNC_PENDING_MAX_AGE.days):
+    global FULL_RESCAN
+    global RECORDING_FROM_DATE
+    global RECORDING_END_DATE
+    global SYNC_OVERLAP
+    global SYNC_PENDING_MAX_AGE
+
+    FULL_RESCAN = full_rescan
+    RECORDING_FROM_DATE = recordings_from
+    if recordings_to:
+        # Include the whole end day
+        RECORDING_END_DATE = recordings_to + timedelta(days=1)
+    else:
+        RECORDING_END_DATE = datetime.today()
+    SYNC_OVERLAP = timedelta(days=overlap_days)
+    SYNC_PENDING_MAX_AGE = timedelta(days=pending_max_days)
+
+
+def load_sync_cursors():
+    try:
+        with open(SYNC_CURSORS_FILE, 'r') as fd:
+            SYNC_CURSORS.update(json.load(fd))
+    except FileNotFoundError:
+        pass
+    except ValueError:
+        print(f"{Color.YELLOW}### Ignoring unreadable sync cursors file {SYNC_CURSORS_FILE}{Color.END}")
+
+
+def save_sync_cursors(user_ids):
+    """ Saves the cursors of the given users, merged with the cursors saved in
+        the meantime by the other workers sharing the state store
+    """
+    with state_store().exclusive():
+        cursors = {}
+        try:
+            with open(SYNC_CURSORS_FILE, 'r') as fd:
+                cursors = json.load(fd)
+        except (OSError, ValueError):
+            pass
+
+        cursors.update({user_id: SYNC_CURSORS[user_id] for user_id in user_ids if user_id in SYNC_CURSORS})
+
+        tmp_filename = SYNC_CURSORS_FILE + ".tmp"
+        with open(tmp_filename, 'w') as fd:
+            json.dump(cursors, fd, indent=2, sort_keys=True)
+        os.replace(tmp_filename, SYNC_CURSORS_FILE)
+
+
+def sync_window_start(user_id):
+    """ Returns the date from which to list the recordings of a user: the
+        backfill start if given, else the user's sync cursor minus the safety
+        overlap, else January 1st of the current year
+    """
+    if RECORDING_FROM_DATE:
+        return RECORDING_FROM_DATE
+
+    full_scan_start = datetime(RECORDING_START_YEAR, RECORDING_START_MONTH, RECORDING_START_DAY)
+    cursor = SYNC_CURSORS.get(user_id)
+    if FULL_RESCAN or not cursor:
+        return full_scan_start
+
+    return min(parse_date(cursor) - SYNC_OVERLAP, RECORDING_END_DATE - SYNC_OVERLAP)
+
+
+def advance_sync_cursors():
+    """ Moves each listed user's cursor up to the end of this run's window, or
+        to the start date of the oldest meeting that is still not completed,
+        so that failed or interrupted meetings are listed again on the next run.
+        A meeting left pending by SYNC_PENDING_MIN_PASSES passes over more than
+        SYNC_PENDING_MAX_AGE (e.g. stuck in processing, or failing every time)
+        no longer holds the cursor back, with a warning.
+    """
+    if RECORDING_FROM_DATE:
+        # Backfills don't move the cursors
+        return
+
+    end_date = RECORDING_END_DATE.strftime("%Y-%m-%d")
+    pending_since = time.time() - SYNC_PENDING_MAX_AGE.total_seconds()
+    with SYNC_LOCK:
+        for user_id, meetings in SYNC_PENDING.items():
+            # An executed manifest moves the cursors up to the end of its own listing
+            user_end_date, full_rescan = SYNC_WINDOWS.get(user_id, (end_date, FULL_RESCAN))
+            unfinished = {
+                meeting_id: start_date for meeting_id, start_date in meetings.items()
+                if not state_store().is_meeting_completed(meeting_id)
+            }
+            state_store().forget_pending_meetings(meetings.keys() - unfinished.keys())
+
+            # An interrupted pass doesn't count against its meetings
+            pending = {} if SHUTDOWN.is_set() else state_store().record_pending_meetings(list(unfinished))
+            abandoned = sorted(meeting_id for meeting_id, (first_pending_at, passes) in pending.items()
+                               if passes >= SYNC_PENDING_MIN_PASSES and first_pending_at <= pending_since)
+            if abandoned:
+                METRICS.increment("sync_abandoned_meetings", len(abandoned))
+                print(f"{Color.YELLOW}### Moving the sync cursor of {user_id} past {len(abandoned)} meetings "
+                      f"still not downloaded after {SYNC_PENDING_MAX_AGE.days} days (list them again with "
+                      f"--from): {', '.join(abandoned)}{Color.END}")
+
+            cursor = min([start_date for meeting_id, start_date in unfinished.items() if meeting_id not in abandoned]
+                         + [user_end_date])
+            if full_rescan or cursor > SYNC_CURSORS.get(user_id, ""):
+                SYNC_CURSORS[user_id] = cursor
+
+        save_sync_cursors(list(SYNC_PENDING))
+
+
+@METRICS.timer("list_recordings")
+def list_recordings_window(email, start, end):
+    """ Lists the recordings of a user in a single date window, following
+        `next_page_token` until the last page
+    """
+    recordings = []
+    params = get_recordings(email, 300, start, end)
+
+    while True:
+        response = api_request(
+            "medium", "GET", f"{API_ENDPOINT}/users/{email}/recordings",
+            params=params
+        )
+        if not response.ok:
+            raise IOError(f"listing recordings failed with {response.status_code}: {response.text}")
+
+        recordings_data = response.json()
+        recordings.extend(recordings_data["meetings"])
+
+        next_page_token = recordings_data.get("next_page_token")
+        if not next_page_token:
+            return recordings
+
+        params = dict(params, next_page_token=next_page_token)
+
+
+def list_recordings(email):
+    """ Lists the recordings of a user in 30-day windows, from the user's sync
+        window start (see sync_window_start) up to RECORDING_END_DATE.
+        The windows are listed concurrently and their results deduplicated by
+        meeting uuid, as a meeting may be returned by two adjacent windows.
+    """
+    windows = list(per_delta(
+        sync_window_start(email),
+        RECORDING_END_DATE,
+        timedelta(days=30)
+    ))
+
+    recordings = {}
+    for window_recordings in api_map(lambda window: list_recordings_window(email, *window), windows):
+        for recording in window_recordings:
+            recordings.setdefault(recording["uuid"], recording)
+
+    recordings = list(recordings.values())
+
+    with SYNC_LOCK:
+        SYNC_PENDING[email] = {
+            recording["uuid"]: recording["start_time"][:10] for recording in recordings
+        }
+
+    return recordings
+
+
+def load_partial_download(part_filename, state_filename, source_url):
+    """ Returns the number of bytes already downloaded into `part_filename`
+        for `source_url`, or 0 if there is nothing to resume
+    """
+    try:
+        with open(state_filename, 'r') as fd:
+            state = json.load(fd)
+    except (OSError, ValueError):
+        return 0
+
+    if state.get("url") != source_url or not os.path.exists(part_filename):
+        return 0
+
+    # A preallocated .part file is larger than what has been written to it
+    return min(int(state.get("bytes_written", 0)), os.path.getsize(part_filename))
+
+
+def save_partial_download(state_filename, source_url, content_length, bytes_written):
+    """ Records the progress of a partial download in its sidecar file
+    """
+    tmp_filename = state_filename + ".tmp"
+    with open(tmp_filename, 'w') as fd:
+        json.dump({
+            "url": source_url,
+            "content_length": content_length,
+            "bytes_written": bytes_written
+        }, fd)
+    os.replace(tmp_filename, state_filename)
+
+
+def discard_partial_download(part_filename, state_filename):
+    for path in (part_filename, state_filename):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def hash_file(filename, hasher, length=None):
+    """ Feeds the first `length` bytes (default: all) of a file to `hasher`,
+        through a memory map
+    """
+    with open(filename, "rb") as fd:
+        size = os.fstat(fd.fileno()).st_size if length is None else length
+        if not size:
+            return hasher
+
+        with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                # hashlib releases the GIL for large buffers, so files hash in parallel
+                for start in range(0, size, HASH_SLICE):
+                    hasher.update(view[start:min(start + HASH_SLICE, size)])
+            finally:
+                view.release()
+
+    return hasher
+
+
+def save_checksum(filename, sha256):
+    """ Writes `<filename>.sha256` in the format of `sha256sum`
+    """
+    with open(filename + CHECKSUM_EXTENSION, 'w', encoding='utf-8') as fd:
+        fd.write(f"{sha256}  {os.path.basename(filename)}\n")
+
+
+def verify_checksum(checksum_filename):
+    """ Re-hashes the file of a `.sha256` checksum file.
+        Returns (filename, status) with status 'ok', 'mismatch' or 'missing'.
+    """
+    filename = checksum_filename[:-len(CHECKSUM_EXTENSION)]
+    with open(checksum_filename, 'r', encoding='utf-8') as fd:
+        expected = fd.readline().split(" ", 1)[0].strip().lower()
+
+    if not os.path.exists(filename):
+        return filename, "missing"
+
+    actual = hash_file(filename, hashlib.sha256()).hexdigest()
+    return filename, "ok" if actual == expected else "mismatch"
+
+
+def verify_archive(directory, workers):
+    """ Verifies every downloaded file that has a checksum, `workers` files at
+        a time. Returns whether all of them are intact.
+    """
+    checksum_filenames = (
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory)
+        for name in names if name.endswith(CHECKSUM_EXTENSION)
+    )
+
+    print(f"{Color.BOLD}Verifying recordings in {directory}...{Color.END}")
+    counts = collections.Counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="verify") as executor:
+        for filename, status in executor.map(verify_checksum, checksum_filenames):
+            counts[status] += 1
+            if status != "ok":
+                print(f"{Color.RED}### {status.upper()}: {Color.END}{os.path.relpath(filename, directory)}")
+
+    print(f"==> {counts['ok']} ok, {counts['mismatch']} corrupted, {counts['missing']} missing")
+    return not counts["mismatch"] and not counts["missing"]
+
+
+def read_chunks(response, buffer):
+    """ Yields the body of a streamed response in chunks of up to len(buffer)
+        bytes. With the 'readinto' strategy, the socket is read straight into
+        the preallocated `buffer` and each chunk is a memoryview over it, only
+        valid until the next one is read.
+    """
+    raw_response = getattr(response.raw, "_fp", None)
+    if (DOWNLOAD_READ_STRATEGY != "readinto" or not hasattr(raw_response, "readinto") or
+            response.headers.get("content-encoding", "identity") != "identity"):
+        # Compressed responses have to be decoded by urllib3
+        for chunk in response.iter_content(len(buffer)):
+            if BANDWIDTH:
+                BANDWIDTH.consume(len(chunk))
+            yield chunk
+        return
+
+    view = memoryview(buffer)
+    bandwidth = BANDWIDTH
+    try:
+        while True:
+            length = raw_response.readinto(view)
+            if not length:
+                break
+            if bandwidth:
+                bandwidth.consume(length)
+            yield view[:length]
+    finally:
+        view.release()
+
+    if raw_response.isclosed() and not raw_response.length:
+        # Body fully read behind urllib3's back: hand the connection back to the pool
+        response.raw.release_conn()
+
+
+def preallocate_file(fd, offset, length):
+    """ Reserves the disk space of a download up front, where supported
+    """
+    fd.flush()
+    try:
+        os.posix_fallocate(fd.fileno(), offset, length)
+    except (AttributeError, OSError):
+        pass
+
+
+def download_retry_delay(attempt):
+    """ Seconds to wait before the given attempt (from the second one) of a
+        download: exponential backoff with jitter, so that the downloads
+        dropped together aren't retried in lockstep
+    """
+    return random.uniform(0.5, 1) * min(DOWNLOAD_RETRY_DELAY_MAX, DOWNLOAD_RETRY_DELAY * 2 ** (attempt - 2))
+
+
+def download_to_part_file(download_url, source_url, part_filename, state_filename):
+    """ Downloads (or resumes downloading) a recording into `part_filename`.
+        Returns (bytes_written, expected_size, sha256), where expected_size is 0 if unknown.
+    """
+    from tqdm import tqdm
+
+    offset = load_partial_download(part_filename, state_filename, source_url)
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+    with http_request("GET", sign_download_url(download_url), headers=headers, stream=True) as response:
+        content_range = response.headers.get("content-range", "")
+        total_size = int(content_range.rpartition("/")[2]) if content_range[-1:].isdigit() else 0
+
+        if offset and response.status_code == 416:
+            if total_size == offset:
+                # The previous run stopped right after the last byte
+                return offset, total_size, hash_file(part_filename, hashlib.sha256()).hexdigest()
+
+            discard_partial_download(part_filename, state_filename)
+            raise IOError(f"cannot resume at byte {offset}, restarting from scratch")
+
+        response.raise_for_status()
+
+        if response.status_code == 206:
+            start = content_range.split(" ")[-1].split("-")[0]
+            if not start.isdigit() or int(start) != offset:
+                discard_partial_download(part_filename, state_filename)
+                raise IOError(f"unexpected content range '{content_range}', restarting from scratch")
+
+            if offset:
+                print(f"==> Resuming at {offset} bytes")
+
+        else:
+            # The server ignored the range: download the whole file again
+            offset = 0
+            total_size = int(response.headers.get("content-length", 0))
+
+        # Hash while writing; when resuming, the bytes already on disk are hashed first
+        hasher = hashlib.sha256()
+        if offset:
+            hash_file(part_filename, hasher, length=offset)
+
+        bytes_written = offset
+        bytes_saved = offset
+        bytes_reported = offset
+        save_partial_download(state_filename, source_url, total_size, bytes_written)
+
+        # create TQDM progress bar
+        prog_bar = tqdm(total=total_size, initial=offset, unit="iB", unit_scale=True)
+        try:
+            with open(part_filename, "r+b" if offset else "wb") as fd:
+                fd.seek(offset)
+                if PREALLOCATE and total_size > offset:
+                    preallocate_file(fd, offset, total_size - offset)
+
+                try:
+                    for chunk in read_chunks(response, bytearray(DOWNLOAD_CHUNK_SIZE)):
+                        fd.write(chunk)  # write video chunk to disk
+                        hasher.update(chunk)
+                        bytes_written += len(chunk)
+
+                        # Updating the progress bar per chunk is costly on fast links
+                        if bytes_written - bytes_reported >= PROGRESS_UPDATE_BYTES:
+                            prog_bar.update(bytes_written - bytes_reported)
+                            bytes_reported = bytes_written
+
+                        if bytes_written - bytes_saved >= PARTIAL_STATE_INTERVAL:
+                            fd.flush()
+                            save_partial_download(state_filename, source_url, total_size, bytes_written)
+                            bytes_saved = bytes_written
+
+                finally:
+                    prog_bar.update(bytes_written - bytes_reported)
+                    fd.flush()
+                    if PREALLOCATE and bytes_written < total_size:
+                        # Keep the .part size equal to what was actually written
+                        fd.truncate(bytes_written)
+                    save_partial_download(state_filename, source_url, total_size, bytes_written)
+
+        finally:
+            prog_bar.close()
+
+    return bytes_written, total_size, hasher.hexdigest()
+
+
+class SegmentsNotSupported(IOError):
+    """ The server ignored a Range request: the file can't be segmented
+    """
+
+
+def use_segments(file_size, part_filename, state_filename, source_url):
+    """ Whether to download a file in segments: it must be large enough, and
+        not be a sequential download that can be resumed
+    """
+    return (DOWNLOAD_SEGMENTS > 1 and file_size >= SEGMENT_THRESHOLD and hasattr(os, "pwrite") and
+            not load_partial_download(part_filename, state_filename, source_url))
+
+
+def load_segments(state_filename, source_url, part_filename, file_size):
+    """ Returns the [start, end, bytes_written] segments of a partial segmented
+        download of `source_url`, or None
+    """
+    try:
+        with open(state_filename, 'r') as fd:
+            state = json.load(fd)
+    except (OSError, ValueError):
+        return None
+
+    if (state.get("url") != source_url or state.get("content_length") != file_size or
+            not state.get("segments") or not os.path.exists(part_filename)):
+        return None
+
+    return [list(segment) for segment in state["segments"]]
+
+
+def save_segments(state_filename, source_url, file_size, segments):
+    tmp_filename = state_filename + ".tmp"
+    with open(tmp_filename, 'w') as fd:
+        json.dump({"url": source_url, "content_length": file_size, "segments": segments}, fd)
+    os.replace(tmp_filename, state_filename)
+
+
+def download_segments(download_url, source_url, part_filename, state_filename, file_size):
+    """ Downloads a large recording over DOWNLOAD_SEGMENTS connections, each
+        one fetching a byte range and writing it at its offset in the
+        preallocated `part_filename` with os.pwrite. Each segment is retried on
+        its own, and resumed from the progress saved in the `.part.json`
+        sidecar. The file is hashed once complete.
+        Returns (bytes_written, expected_size, sha256), like download_to_part_file.
+    """
+    import requests
+    from tqdm import tqdm
+
+    segments = load_segments(state_filename, source_url, part_filename, file_size)
+    if segments:
+        print(f"==> Resuming {len(segments)} segments at "
+              f"{sum(segment[2] for segment in segments)} bytes")
+    else:
+        segment_size = -(-file_size // DOWNLOAD_SEGMENTS)
+        segments = [[start, min(start + segment_size, file_size), 0]
+                    for start in range(0, file_size, segment_size)]
+
+    lock = threading.Lock()
+    saved = [sum(segment[2] for segment in segments)]
+    prog_bar = tqdm(total=file_size, initial=saved[0], unit="iB", unit_scale=True)
+
+    def save_progress(force=False):
+        with lock:
+            written = sum(segment[2] for segment in segments)
+            if force or written - saved[0] >= PARTIAL_STATE_INTERVAL:
+                save_segments(state_filename, source_url, file_size, segments)
+                saved[0] = written
+
+    def fetch_segment(segment):
+        start, end, _ = segment
+        position = start + segment[2]
+        headers = {"Range": f"bytes={position}-{end - 1}"}
+        with http_request("GET", sign_download_url(download_url), headers=headers, stream=True) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise SegmentsNotSupported("the server ignored the range request")
+
+            content_range = response.headers.get("content-range", "")
+            if content_range.rpartition("/")[2] != str(file_size):
+                raise IOError(f"unexpected content range '{content_range}' for {file_size} bytes")
+
+            reported = 0
+            for chunk in read_chunks(response, bytearray(DOWNLOAD_CHUNK_SIZE)):
+                chunk = chunk[:end - position]
+                while chunk:
+                    written = os.pwrite(fd, chunk, position)
+                    chunk = chunk[written:]
+                    position += written
+                    segment[2] += written
+                    reported += written
+
+                if reported >= PROGRESS_UPDATE_BYTES:
+                    prog_bar.update(reported)
+                    reported = 0
+                save_progress()
+
+                if position >= end:
+                    break
+
+            prog_bar.update(reported)
+
+        if position < end:
+            raise IOError(f"segment {start}-{end - 1} ended at byte {position}")
+
+    def download_segment(segment):
+        for attempt in range(1, DOWNLOAD_RETRIES + 1):
+            try:
+                fetch_segment(segment)
+                return
+            except SegmentsNotSupported:
+                raise
+            except (requests.exceptions.RequestException, OSError) as e:
+                if attempt == DOWNLOAD_RETRIES:
+                    raise
+                METRICS.increment("segment_retries", status=type(e).__name__)
+                print(f"{Color.YELLOW}### Segment {segment[0]}-{segment[1] - 1} interrupted (attempt "
+                      f"{attempt} of {DOWNLOAD_RETRIES}) because {Color.END}'{e}'")
+                time.sleep(download_retry_delay(attempt + 1))
+
+    fd = os.open(part_filename, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        if os.fstat(fd).st_size != file_size:
+            try:
+                os.posix_fallocate(fd, 0, file_size)
+            except (AttributeError, OSError):
+                os.ftruncate(fd, file_size)
+
+        save_progress(force=True)
+        with ThreadPoolExecutor(max_workers=len(segments), thread_name_prefix="segment") as executor:
+            # Raises the first failure once all the segments are done
+            list(executor.map(download_segment, [segment for segment in segments
+                                                 if segment[2] < segment[1] - segment[0]]))
+    finally:
+        os.close(fd)
+        prog_bar.close()
+        save_progress(force=True)
+
+    return file_size, file_size, hash_file(part_filename, hashlib.sha256()).hexdigest()
+
+
+def target_path(email, subfolder, filename):
+    """ Local path of a recording file
+    """
+    import pathvalidate as path_validate
+
+    dl_dir = os.sep.join([os.path.abspath(os.path.expanduser(DOWNLOAD_DIRECTORY)), email, subfolder])
+    sanitized_download_dir = path_validate.sanitize_filepath(dl_dir)
+    sanitized_filename = path_validate.sanitize_filename(filename)
+    return os.sep.join([sanitized_download_dir, sanitized_filename])
+
+
+def link_file(source, target):
+    """ Replaces `target` with a hardlink or reflink (see DEDUPE) to `source`;
+        a reflink falls back to a hardlink when the filesystem can't clone.
+        Returns False if the filesystem doesn't support it, e.g. across volumes.
+    """
+    tmp_filename = target + ".dedupe"
+    for method in (["reflink", "hardlink"] if DEDUPE == "reflink" else ["hardlink"]):
+        try:
+            if method == "reflink":
+                if fcntl is None:
+                    raise OSError("reflinks are not supported on this platform")
+                with open(source, 'rb') as source_fd, open(tmp_filename, 'wb') as target_fd:
+                    fcntl.ioctl(target_fd.fileno(), FICLONE, source_fd.fileno())
+            else:
+                os.link(source, tmp_filename)
+            os.replace(tmp_filename, target)
+            return True
+
+        except OSError as e:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            print(f"{Color.YELLOW}### Could not {method} {target} to {source}: {e}{Color.END}")
+
+    return False
+
+
+def find_local_copy(candidates, size):
+    """ Returns the first of the (local_path, sha256) candidates that still
+        exists with the given size, or (None, None)
+    """
+    for local_path, sha256 in candidates:
+        try:
+            if local_path and os.path.getsize(local_path) == size:
+                return local_path, sha256
+        except OSError:
+            continue
+
+    return None, None
+
+
+def dedupe_download(file_id, file_size, full_filename):
+    """ Links a recording file that was already downloaded (same file id and
+        size, e.g. under another meeting) to its target path, without any
+        network transfer. A file already at the target path that matches its
+        checksum is kept, e.g. after the state database was lost.
+        Returns its {"path", "bytes", "sha256"}, or None.
+    """
+    local_path, sha256 = find_local_copy(state_store().find_downloaded_files(file_id, file_size), file_size)
+    if not local_path:
+        checksum_filename = full_filename + CHECKSUM_EXTENSION
+        if (not os.path.exists(checksum_filename) or not os.path.exists(full_filename) or
+                os.path.getsize(full_filename) != file_size or
+                verify_checksum(checksum_filename)[1] != "ok"):
+            return None
+
+        with open(checksum_filename, 'r', encoding='utf-8') as fd:
+            local_path, sha256 = full_filename, fd.readline().split(" ", 1)[0].strip().lower()
+
+    # Reusing the target in place (or an existing link to it) saves nothing
+    in_place = os.path.exists(full_filename) and os.path.samefile(local_path, full_filename)
+    if not in_place and not link_file(local_path, full_filename):
+        return None
+
+    save_checksum(full_filename, sha256)
+    if not in_place:
+        METRICS.increment("deduplicated_bytes", file_size)
+        METRICS.increment("files_deduplicated", phase="before_download")
+    return {"path": full_filename, "bytes": file_size, "sha256": sha256}
+
+
+def dedupe_file(full_filename, sha256, size):
+    """ Replaces a downloaded file with a link to an identical one (same
+        SHA-256) that is already in the archive
+    """
+    local_path, _ = find_local_copy(state_store().find_files_by_hash(sha256), size)
+    if not local_path or os.path.samefile(local_path, full_filename):
+        return
+
+    if link_file(local_path, full_filename):
+        print(f"==> Identical to {local_path}, linked")
+        METRICS.increment("deduplicated_bytes", size)
+        METRICS.increment("files_deduplicated", phase="after_download")
+
+
+@METRICS.timer("download")
+def download_recording(download_url, email, filename, subfolder, file_size=0, file_id=None):
+    """ Downloads a recording into a `.part` file next to its final location,
+        with a `.part.json` sidecar recording the source URL, the expected size
+        and the bytes written so far. Interrupted downloads are resumed with
+        a Range request, both on retry and on the next run. Files of at least
+        SEGMENT_THRESHOLD bytes are downloaded in DOWNLOAD_SEGMENTS parallel
+        segments (see download_segments).
+
+        The file is hashed (SHA-256) while it is written and its size checked
+        against the content length and the `file_size` reported by Zoom; the
+        hash is saved in a `.sha256` file next to it.
+
+        With DEDUPE, a file whose id and size were already downloaded is linked
+        instead of downloaded, and a downloaded file identical to one already
+        in the archive is replaced with a link to it.
+
+        Returns {"path", "bytes", "sha256"} of the downloaded file, or None on failure.
+    """
+    import requests
+
+    full_filename = target_path(email, subfolder, filename)
+    sanitized_download_dir, sanitized_filename = os.path.split(full_filename)
+    part_filename = full_filename + ".part"
+    state_filename = part_filename + ".json"
+
+    if DEDUPE and file_id and file_size:
+        os.makedirs(sanitized_download_dir, exist_ok=True)
+        result = dedupe_download(file_id, file_size, full_filename)
+        if result:
+            print(f"Reused an earlier download: {os.sep.join([email, subfolder, sanitized_filename])}")
+            return result
+
+    # The access token in the query string changes from run to run
+    source_url = download_url.split("?", 1)[0]
+
+    os.makedirs(sanitized_download_dir, exist_ok=True)
+
+    error = None
+    token_refreshed = False
+    segmented = use_segments(file_size, part_filename, state_filename, source_url)
+    for attempt in range(1, DOWNLOAD_RETRIES + 1):
+        if attempt > 1:
+            time.sleep(download_retry_delay(attempt))
+
+        access_token = current_access_token()
+        try:
+            if segmented:
+                bytes_written, total_size, sha256 = download_segments(
+                    download_url, source_url, part_filename, state_filename, file_size)
+            else:
+                bytes_written, total_size, sha256 = download_to_part_file(
+                    download_url, source_url, part_filename, state_filename)
+
+        except (requests.exceptions.RequestException, OSError) as e:
+            error = e
+            if isinstance(e, SegmentsNotSupported):
+                segmented = False
+                discard_partial_download(part_filename, state_filename)
+            status_code = getattr(getattr(e, "response", None), "status_code", None)
+            if status_code == 401 and not token_refreshed:
+                refresh_access_token(access_token)
+                token_refreshed = True
+            METRICS.increment("download_retries", status=str(status_code or type(e).__name__))
+            print(
+                f"{Color.YELLOW}### Download of '{filename}' interrupted (attempt {attempt} of "
+                f"{DOWNLOAD_RETRIES}) because {Color.END}'{e}'"
+            )
+            continue
+
+        if total_size and bytes_written != total_size:
+            error = f"got {bytes_written} of {total_size} bytes"
+            METRICS.increment("download_retries", status="short_read")
+            continue
+
+        if file_size and bytes_written != file_size:
+            # Whatever we got is not the file Zoom has: start over
+            error = f"got {bytes_written} bytes, but Zoom reports {file_size}"
+            discard_partial_download(part_filename, state_filename)
+            METRICS.increment("download_retries", status="size_mismatch")
+            print(f"{Color.YELLOW}### Size mismatch for '{filename}': {error}{Color.END}")
+            continue
+
+        os.replace(part_filename, full_filename)
+        discard_partial_download(part_filename, state_filename)
+        save_checksum(full_filename, sha256)
+        if DEDUPE:
+            dedupe_file(full_filename, sha256, bytes_written)
+
+        print(f"Saved as: {os.sep.join([email, subfolder, sanitized_filename])}")
+
+        return {"path": full_filename, "bytes": bytes_written, "sha256": sha256}
+
+    print(
+        f"{Color.RED}### The video recording with filename '{filename}' for user with email "
+        f"'{email}' could not be downloaded because {Color.END}'{error}'"
+    )
+
+    return None
+
+
+class StateStore:
+    """ SQLite store of the download state, keyed by meeting uuid and
+        recording file id.
+
+        The database runs in WAL mode and is shared by all the worker threads
+        through a single connection guarded by a lock. Writes are committed in
+        batches (every STATE_COMMIT_BATCH writes or STATE_COMMIT_INTERVAL
+        seconds, and on flush), so a crash loses at most the last batch, which
+        only causes those files to be downloaded again.
+
+        Several worker processes may share the store (see --state-db): each
+        one leases the meetings it downloads, so that no meeting is downloaded
+        or deleted twice.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meetings (
+            uuid TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            delete_status TEXT,
+            updated_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS files (
+            meeting_uuid TEXT NOT NULL,
+            file_id TEXT NOT NULL,
+            status TEXT NOT NULL,
+            bytes INTEGER,
+            sha256 TEXT,
+            local_path TEXT,
+            delete_status TEXT,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (meeting_uuid, file_id)
+        );
+        CREATE INDEX IF NOT EXISTS files_file_id ON files (file_id);
+        CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256);
+        CREATE TABLE IF NOT EXISTS metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS deletions (
+            meeting_uuid TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            last_error TEXT,
+            updated_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS leases (
+            meeting_uuid TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS pending_meetings (
+            meeting_uuid TEXT PRIMARY KEY,
+            first_pending_at REAL NOT NULL,
+            passes INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._pending_writes = 0
+        self._last_commit = time.monotonic()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(self.SCHEMA)
+        self._db.commit()
+
+    def _write(self, sql, parameters=()):
+        with self._lock:
+            self._db.execute(sql, parameters)
+            self._pending_writes += 1
+            if (self._pending_writes >= STATE_COMMIT_BATCH or
+                    time.monotonic() - self._last_commit >= STATE_COMMIT_INTERVAL):
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            self._db.commit()
+            self._pending_writes = 0
+            self._last_commit = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._db.close()
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        """ Holds the write lock of the database, serializing the block with
+            the other processes sharing the store
+        """
+        with self._lock:
+            self.flush()
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            finally:
+                self.flush()
+
+    def acquire_lease(self, meeting_id, owner, ttl):
+        """ Takes (or extends) the lease of a meeting, unless another owner
+            holds an unexpired one. Returns whether `owner` holds the lease.
+        """
+        now = time.time()
+        with self._lock:
+            self.flush()
+            cursor = self._db.execute(
+                "INSERT INTO leases (meeting_uuid, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (meeting_uuid) DO UPDATE SET owner = excluded.owner, "
+                "expires_at = excluded.expires_at "
+                "WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+                (meeting_id, owner, now + ttl, now)
+            )
+            self.flush()
+            return cursor.rowcount == 1
+
+    def renew_leases(self, owner, ttl):
+        with self._lock:
+            self._db.execute("UPDATE leases SET expires_at = ? WHERE owner = ?", (time.time() + ttl, owner))
+            self.flush()
+
+    def release_lease(self, meeting_id, owner):
+        with self._lock:
+            self._db.execute("DELETE FROM leases WHERE meeting_uuid = ? AND owner = ?", (meeting_id, owner))
+            self.flush()
+
+    def release_leases(self, owner):
+        with self._lock:
+            self._db.execute("DELETE FROM leases WHERE owner = ?", (owner,))
+            self.flush()
+
+    def migrate_completed_log(self, log_filename):
+        """ Imports the meeting ids of the flat completed-downloads.log used by
+            older versions, once
+        """
+        with self.exclusive():
+            if self._db.execute("SELECT 1 FROM metadata WHERE key = 'migrated_log'").fetchone():
+                return
+
+            try:
+                with open(log_filename, 'r') as fd:
+                    meeting_ids = {line.strip() for line in fd if line.strip()}
+            except FileNotFoundError:
+                meeting_ids = set()
+
+            now = datetime.now(timezone.utc).isoformat()
+            self._db.executemany(
+                "INSERT OR IGNORE INTO meetings (uuid, status, updated_at) VALUES (?, 'completed', ?)",
+                ((meeting_id, now) for meeting_id in meeting_ids)
+            )
+            self._db.execute("INSERT INTO metadata (key, value) VALUES ('migrated_log', ?)", (now,))
+            self.flush()
+
+        if meeting_ids:
+            print(f"{Color.DARK_CYAN}Imported {len(meeting_ids)} completed meetings from {Color.END}"
+                  f"{log_filename}\n")
+
+    def is_meeting_completed(self, meeting_id):
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM meetings WHERE uuid = ? AND status = 'completed'", (meeting_id,)
+            ).fetchone() is not None
+
+    def record_pending_meetings(self, meeting_ids):
+        """ Counts one more pass leaving each of `meeting_ids` not completed,
+            and returns their {uuid: (first_pending_at, passes)}
+        """
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO pending_meetings (meeting_uuid, first_pending_at, passes) VALUES (?, ?, 1) "
+                "ON CONFLICT (meeting_uuid) DO UPDATE SET passes = passes + 1",
+                ((meeting_id, now) for meeting_id in meeting_ids)
+            )
+            self.flush()
+            return {
+                meeting_id: self._db.execute(
+                    "SELECT first_pending_at, passes FROM pending_meetings WHERE meeting_uuid = ?", (meeting_id,)
+                ).fetchone()
+                for meeting_id in meeting_ids
+            }
+
+    def forget_pending_meetings(self, meeting_ids):
+        with self._lock:
+            self._db.executemany("DELETE FROM pending_meetings WHERE meeting_uuid = ?",
+                                 ((meeting_id,) for meeting_id in meeting_ids))
+            self.flush()
+
+    def is_file_downloaded(self, meeting_id, file_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT local_path FROM files WHERE meeting_uuid = ? AND file_id = ? AND status = 'downloaded'",
+                (meeting_id, file_id)
+            ).fetchone()
+        return row is not None and os.path.exists(row[0] or "")
+
+    def get_metadata(self, key, default=None):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM metadata WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_metadata(self, key, value):
+        self._write("INSERT INTO metadata (key, value) VALUES (?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (key, str(value)))
+
+    def record_file(self, meeting_id, file_id, status, bytes_written=None, sha256=None, local_path=None):
+        self._write(
+            "INSERT INTO files (meeting_uuid, file_id, status, bytes, sha256, local_path, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (meeting_uuid, file_id) DO UPDATE SET status = excluded.status, "
+            "bytes = COALESCE(excluded.bytes, bytes), sha256 = COALESCE(excluded.sha256, sha256), "
+            "local_path = COALESCE(excluded.local_path, local_path), updated_at = excluded.updated_at",
+            (meeting_id, file_id, status, bytes_written, sha256, local_path,
+             datetime.now(timezone.utc).isoformat())
+        )
+
+    def record_meeting(self, meeting_id, status, delete_status=None):
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self._write(
+                "INSERT INTO meetings (uuid, status, delete_status, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (uuid) DO UPDATE SET status = excluded.status, "
+                "delete_status = COALESCE(excluded.delete_status, delete_status), "
+                "updated_at = excluded.updated_at",
+                (meeting_id, status, delete_status, now)
+            )
+            if delete_status:
+                self._write("UPDATE files SET delete_status = ?, updated_at = ? WHERE meeting_uuid = ?",
+                            (delete_status, now, meeting_id))
+
+    def find_downloaded_files(self, file_id, size):
+        """ Returns the (local_path, sha256) of the downloads of a recording
+            file id with the given size, under any meeting
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT local_path, sha256 FROM files WHERE file_id = ? AND bytes = ? "
+                "AND status = 'downloaded' AND sha256 IS NOT NULL", (file_id, size)
+            ).fetchall()
+
+    def find_files_by_hash(self, sha256):
+        with self._lock:
+            return self._db.execute(
+                "SELECT local_path, sha256 FROM files WHERE sha256 = ? AND status = 'downloaded'", (sha256,)
+            ).fetchall()
+
+    def downloaded_files(self, meeting_id):
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT local_path FROM files WHERE meeting_uuid = ? AND status = 'downloaded'", (meeting_id,)
+            )]
+
+    def downloaded_paths(self):
+        """ Returns {local_path: meeting_uuid} of all the downloaded files
+        """
+        with self._lock:
+            return dict(self._db.execute(
+                "SELECT local_path, meeting_uuid FROM files WHERE status = 'downloaded' AND local_path IS NOT NULL"
+            ))
+
+    def queue_deletion(self, meeting_id, due_at):
+        self._write(
+            "INSERT INTO deletions (meeting_uuid, status, next_attempt_at, updated_at) "
+            "VALUES (?, 'pending', ?, ?) ON CONFLICT (meeting_uuid) DO NOTHING",
+            (meeting_id, due_at, datetime.now(timezone.utc).isoformat())
+        )
+
+    def requeue_failed_deletions(self):
+        """ Queues the deletions that failed before the deletion queue existed
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        self._write(
+            "INSERT OR IGNORE INTO deletions (meeting_uuid, status, next_attempt_at, updated_at) "
+            "SELECT uuid, 'pending', 0, ? FROM meetings WHERE delete_status = 'failed'", (now,)
+        )
+
+    def claim_deletions(self, limit, claim_ttl):
+        """ Returns up to `limit` due deletions, hiding them from the other
+            workers for `claim_ttl` seconds
+        """
+        now = time.time()
+        with self.exclusive():
+            meeting_ids = [row[0] for row in self._db.execute(
+                "SELECT meeting_uuid FROM deletions WHERE status = 'pending' AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at LIMIT ?", (now, limit)
+            )]
+            self._db.executemany("UPDATE deletions SET next_attempt_at = ? WHERE meeting_uuid = ?",
+                                 ((now + claim_ttl, meeting_id) for meeting_id in meeting_ids))
+        return meeting_ids
+
+    def deletion_attempts(self, meeting_id):
+        with self._lock:
+            row = self._db.execute("SELECT attempts FROM deletions WHERE meeting_uuid = ?",
+                                   (meeting_id,)).fetchone()
+        return row[0] if row else 0
+
+    def next_deletion_due(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT MIN(next_attempt_at) FROM deletions WHERE status = 'pending'"
+            ).fetchone()[0]
+
+    def record_deletion(self, meeting_id, status, next_attempt_at=0, error=None):
+        """ Records an attempt to delete the recordings of a meeting: 'deleted',
+            'pending' (retried at `next_attempt_at`) or 'blocked' (never retried)
+        """
+        with self._lock:
+            self._write(
+                "UPDATE deletions SET status = ?, attempts = attempts + 1, next_attempt_at = ?, "
+                "last_error = ?, updated_at = ? WHERE meeting_uuid = ?",
+                (status, next_attempt_at, error, datetime.now(timezone.utc).isoformat(), meeting_id)
+            )
+            self.record_meeting(meeting_id, "completed", "retrying" if status == "pending" else status)
+
+
+def state_store():
+    """ Returns the state store, opening it (and migrating the completed
+        downloads log) on first use
+    """
+    global STATE
+
+    if STATE is None:
+        with STATE_LOCK:
+            if STATE is None:
+                store = StateStore(STATE_DB)
+                store.migrate_completed_log(COMPLETED_MEETING_IDS_LOG)
+                STATE = store
+
+    return STATE
+
+
+def configure_state_store(state_db, shard):
+    global STATE_DB
+    global STATE_COMMIT_BATCH
+    global SHARD
+
+    SHARD = shard
+    if state_db:
+        STATE_DB = os.path.abspath(os.path.expanduser(state_db))
+
+    if state_db or shard:
+        # The other workers wait for the write lock while a batch is open
+        STATE_COMMIT_BATCH = 1
+
+
+def parse_shard(value):
+    """ Parses a shard given as INDEX/COUNT, e.g. 1/3, into a zero-based (index, count)
+    """
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', expected e.g. 1/3")
+
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', the index must be between 1 and {count}")
+
+    return index - 1, count
+
+
+def renew_leases():
+    while True:
+        time.sleep(LEASE_TTL / 3)
+        try:
+            state_store().renew_leases(WORKER_ID, LEASE_TTL)
+        except sqlite3.Error as e:
+            print(f"{Color.YELLOW}### Could not renew the meeting leases because {Color.END}'{e}'")
+
+
+def claim_meeting(meeting_id):
+    """ Leases a meeting to this worker, returning False if another worker
+        holds it or has completed it in the meantime
+    """
+    global LEASE_RENEWER
+
+    with LEASE_LOCK:
+        if meeting_id in LEASED_MEETINGS:
+            return LEASED_MEETINGS[meeting_id]
+
+        if LEASE_RENEWER is None:
+            LEASE_RENEWER = threading.Thread(target=renew_leases, name="lease-renewer", daemon=True)
+            LEASE_RENEWER.start()
+
+        store = state_store()
+        claimed = store.acquire_lease(meeting_id, WORKER_ID, LEASE_TTL)
+        if claimed and store.is_meeting_completed(meeting_id):
+            store.release_lease(meeting_id, WORKER_ID)
+            claimed = False
+
+        if not claimed:
+            print(f"==> Skipping meeting handled by another worker: {meeting_id}")
+
+        LEASED_MEETINGS[meeting_id] = claimed
+        return claimed
+
+
+def release_meeting(meeting_id):
+    with LEASE_LOCK:
+        if LEASED_MEETINGS.pop(meeting_id, False):
+            state_store().release_lease(meeting_id, WORKER_ID)
+
+
+def release_meetings():
+    """ Releases the leases still held at the end of a pass (e.g. of meetings
+        dropped on shutdown) and forgets the meetings skipped during it
+    """
+    with LEASE_LOCK:
+        LEASED_MEETINGS.clear()
+        state_store().release_leases(WORKER_ID)
+
+
+@METRICS.timer("summary")
+def get_meeting_summary(meeting_id):
+    url = (API_ENDPOINT + "/meetings/{}/meeting_summary").format(meeting_id)
+
+    response = api_request("light", "GET", url)
+
+    if response.status_code == 200:
+        return response.json()
+    elif response.status_code == 404:
+        print(f"{Color.YELLOW}### No summary available for meeting ID {meeting_id}.{Color.END}")
+        return None
+    else:
+        print(f"{Color.RED}### Error fetching summary for meeting ID {meeting_id}: {response.text}{Color.END}")
+        return None
+
+
+def save_meeting_summary(summary, email, filename, subfolder):
+    """ Writes a meeting summary as text, returning its path
+    """
+    if not summary:
+        return None
+    summary_text = f"Title: {summary.get('summary_title', 'N/A')}\n\n"
+    summary_text += f"Overview: {summary.get('summary_overview', 'N/A')}\n\n"
+    summary_details = summary.get('summary_details', [])
+    if summary_details:
+        summary_text += "Details:\n"
+        for detail in summary_details:
+            summary_text += f"- {detail.get('label', 'N/A')}: {detail.get('summary', 'N/A')}\n"
+    next_steps = summary.get('next_steps', [])
+    if next_steps:
+        summary_text += "\nNext Steps:\n"
+        for step in next_steps:
+            summary_text += f"- {step}\n"
+
+    dl_dir = os.path.join(os.path.abspath(os.path.expanduser(DOWNLOAD_DIRECTORY)), email, subfolder)
+    os.makedirs(dl_dir, exist_ok=True)
+    filepath = os.path.join(dl_dir, filename)
+    with open(filepath, 'w', encoding='utf-8') as file:
+        file.write(summary_text)
+    print(f"Meeting summary saved as: {os.path.join(email, subfolder, filename)}")
+    return filepath
+
+
+@METRICS.timer("delete")
+def delete_meeting_recordings(meeting_id):
+    url = (API_ENDPOINT + "/meetings/{}/recordings").format(meeting_id)
+
+    response = api_request("light", "DELETE", url)
+
+    # 404: the recordings are already gone
+    if response.status_code not in (204, 404):
+        print("WARNING: couldn't delete cloud recordings of meeting {} ({}: {})".format(
+            meeting_id, response.status_code, response.text))
+        return False
+
+    return True
+
+
+def check_local_copy(meeting_id):
+    """ Returns why the cloud recordings of a meeting must not be deleted, or
+        None: each downloaded file must still exist and, after a grace period,
+        still match its checksum
+    """
+    local_paths = state_store().downloaded_files(meeting_id)
+    if not local_paths:
+        return "no downloaded files"
+
+    for local_path in local_paths:
+        if not os.path.exists(local_path):
+            return f"{local_path} is missing"
+        if DELETE_GRACE and os.path.exists(local_path + CHECKSUM_EXTENSION):
+            _, status = verify_checksum(local_path + CHECKSUM_EXTENSION)
+            if status != "ok":
+                return f"{local_path} doesn't match its checksum"
+
+    return None
+
+
+def start_deletions(rate, grace_days):
+    global DELETIONS
+    global DELETE_GRACE
+
+    DELETE_GRACE = grace_days * 24 * 3600
+    DELETIONS = DeletionQueue(rate, DELETE_WORKERS)
+    DELETIONS.start()
+
+
+class DeletionQueue:
+    """ Deletes the cloud recordings of completed meetings in the background.
+
+        The deletions are persisted in the state store and processed by
+        DELETE_WORKERS threads within their own rate budget (DELETE_RATE
+        requests per second), once their grace period is over. Failed
+        deletions are retried with exponential backoff, on this run or the
+        next ones. Deletions whose local copy is missing or corrupted are
+        blocked instead.
+    """
+
+    def __init__(self, rate, workers):
+        self.bucket = TokenBucket(rate)
+        self.workers = max(1, workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="delete")
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="deletions", daemon=True)
+
+    def start(self):
+        state_store().requeue_failed_deletions()
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        """ Processes the deletions that are due, then stops (right away on SHUTDOWN)
+        """
+        self._stopping = True
+        self._wake.set()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+    def _run(self):
+        while not SHUTDOWN.is_set():
+            meeting_ids = state_store().claim_deletions(self.workers * 4, DELETE_CLAIM_TTL)
+            if meeting_ids:
+                list(self._executor.map(self._delete_claimed, meeting_ids))
+                continue
+
+            if self._stopping:
+                return
+
+            next_due = state_store().next_deletion_due()
+            self._wake.wait(min(60, max(0, next_due - time.time())) if next_due is not None else 60)
+            self._wake.clear()
+
+    def _delete_claimed(self, meeting_id):
+        """ Deletes a claimed meeting, logging any error so that the worker
+            keeps draining the queue; the deletion is retried once its claim
+            expires
+        """
+        try:
+            self._delete(meeting_id)
+        except Exception as e:
+            print(f"{Color.RED}### Could not delete the cloud recordings of meeting {Color.END}'{meeting_id}'"
+                  f"{Color.RED} because {Color.END}'{e}'")
+            METRICS.increment("deletions", status="error")
+
+    def _delete(self, meeting_id):
+        if SHUTDOWN.is_set():
+            # Claimed, but left for the next run once the claim expires
+            return
+
+        error = check_local_copy(meeting_id)
+        if error:
+            print(f"{Color.RED}### Not deleting the cloud recordings of meeting {Color.END}'{meeting_id}'"
+                  f"{Color.RED}: {error}{Color.END}")
+            state_store().record_deletion(meeting_id, "blocked", error=error)
+            METRICS.increment("deletions", status="blocked")
+            return
+
+        self.bucket.acquire()
+        try:
+            deleted = delete_meeting_recordings(meeting_id)
+            error = None if deleted else "rejected by the API"
+        except Exception as e:
+            # Connection resets, timeouts, unexpected responses: retried with backoff
+            deleted = False
+            error = str(e) or type(e).__name__
+
+        if deleted:
+            print(f"==> Deleted cloud recording: {meeting_id}")
+            state_store().record_deletion(meeting_id, "deleted")
+            METRICS.increment("deletions", status="deleted")
+            return
+
+        attempts = state_store().deletion_attempts(meeting_id)
+        delay = min(DELETE_RETRY_MAX, DELETE_RETRY_DELAY * 2 ** attempts) * random.uniform(0.5, 1)
+        state_store().record_deletion(meeting_id, "pending", time.time() + delay, error)
+        METRICS.increment("deletions", status="failed")
+
+
+def start_indexing():
+    global INDEXER
+
+    from .search import Indexer
+
+    INDEXER = Indexer(SEARCH_DB)
+    INDEXER.start()
+
+
+def get_meeting_files(recording, index, total_count):
+    """ Returns the (files, incomplete) to download for a meeting, or None if
+        the meeting has already been downloaded or has no recording files.
+
+        `files` is a list of (download_url, filename, subfolder, recording_type, recording_id,
+        file_size), without the files downloaded by an earlier run that are
+        still on disk: it is empty when only the post-processing of the
+        meeting is left.
+    """
+    meeting_id = recording["uuid"]
+    if state_store().is_meeting_completed(meeting_id):
+        print("==> Skipping already downloaded meeting: {}".format(
+            meeting_id))
+        return None
+
+    try:
+        downloads = get_downloads(recording)
+    except Exception:
+        print(
+            f"{Color.RED}### Recording files missing for call with id {Color.END}"
+            f"'{recording['id']}'\n"
+        )
+
+        return None
+
+    files = []
+    incomplete = False
+    for file_type, file_extension, download_url, recording_type, recording_id, file_size in downloads:
+        if recording_type != 'incomplete' and state_store().is_file_downloaded(meeting_id, recording_id):
+            print(f"==> Skipping already downloaded file: {recording_id}")
+
+        elif recording_type != 'incomplete':
+            filename = (
+                format_filename({
+                    "file_type": file_type,
+                    "recording": recording,
+                    "file_extension": file_extension.lower(),
+                    "recording_type": recording_type
+                })
+            )
+            topic = recording['topic'].replace('/', '&')
+            files.append((download_url, filename, topic, recording_type, recording_id, file_size))
+
+        else:
+            print(
+                f"{Color.RED}### Incomplete Recording ({index + 1} of {total_count}) for "
+                f"recording with id {Color.END}'{recording_id}'"
+            )
+            incomplete = True
+
+    return files, incomplete
+
+
+def download_file(recording, email, file, index, total_count):
+    """ Downloads a single recording file (a tuple returned by get_meeting_files)
+        of a meeting and records its state, returning whether it succeeded. The
+        file is skipped if the meeting is leased by another worker.
+    """
+    download_url, filename, subfolder, recording_type, recording_id, file_size = file
+    meeting_id = recording["uuid"]
+
+    if not claim_meeting(meeting_id):
+        return False
+
+    # truncate URL to 64 characters
+    truncated_url = download_url[0:64] + "..."
+    print(
+        f"==> Downloading ({index + 1} of {total_count}) as {recording_type}: "
+        f"{recording_id}: {truncated_url}"
+    )
+
+    try:
+        result = download_recording(download_url, email, filename, subfolder, file_size, recording_id)
+    except Exception as e:
+        print(
+            f"{Color.RED}### The video recording with filename '{filename}' for user with email "
+            f"'{email}' could not be downloaded because {Color.END}'{e}'"
+        )
+        result = None
+
+    if result:
+        METRICS.increment("files_downloaded")
+        METRICS.increment("downloaded_bytes", result["bytes"])
+        state_store().record_file(meeting_id, recording_id, "downloaded", result["bytes"],
+                                  result["sha256"], result["path"])
+        if INDEXER:
+            INDEXER.submit(result["path"], recording, email, recording_type)
+    else:
+        METRICS.increment("files_failed")
+        state_store().record_file(meeting_id, recording_id, "failed")
+
+    return result is not None
+
+
+def file_failed(recording, file, error):
+    """ Counts a file whose download_file() raised as a failed download
+    """
+    METRICS.increment("files_failed")
+    print(
+        f"{Color.RED}### The file '{file[1]}' of meeting {Color.END}'{recording['uuid']}'"
+        f"{Color.RED} could not be downloaded because {Color.END}'{error}'"
+    )
+
+
+def complete_meeting(email, recording, index, delete_recordings):
+    """ Post-processing of a meeting whose files have all been downloaded:
+        save the summary, queue the deletion of the cloud recordings (see
+        DeletionQueue) and mark it as completed
+    """
+    meeting_id = recording["uuid"]
+
+    # Retrieve and save meeting summary
+    summary = get_meeting_summary(meeting_id)
+    filename = (
+        format_filename({
+            "recording": recording,
+            "file_extension": "txt",
+            "recording_type": "summary"
+        })
+    )
+    if summary:
+        summary_path = save_meeting_summary(summary, email, filename, recording['topic'].replace('/', '&'))
+        if INDEXER:
+            INDEXER.submit(summary_path, recording, email, "summary")
+
+    # Delete the recordings only if parameter --no-delete has not been specified
+    delete_status = None
+    if delete_recordings:
+        print("==> Queueing deletion of cloud recording ({}): {}".format(
+            index + 1, meeting_id))
+        state_store().queue_deletion(meeting_id, time.time() + DELETE_GRACE)
+        delete_status = "queued"
+    else:
+        print("==> Keeping cloud recording ({}): {}".format(
+            index + 1, meeting_id))
+
+    state_store().record_meeting(meeting_id, "completed", delete_status)
+    if delete_status and DELETIONS:
+        DELETIONS.wake()
+
+
+class DownloadPool:
+    """ Bounded pool of download workers.
+
+        At most `max_workers` files are downloaded at the same time, and at most
+        `max_workers_per_user` of them belong to the same user. Files are handed
+        out round-robin across users or, if `ordered`, in submission order
+        (skipping users that are at their cap). When every file of a meeting has been
+        downloaded successfully, `on_meeting_complete(email, recording, index)`
+        is called from the worker that finished the last file.
+
+        Once SHUTDOWN is set, queued files are dropped and join() returns as
+        soon as the running ones are done.
+    """
+
+    def __init__(self, max_workers, max_workers_per_user, on_meeting_complete, ordered=False):
+        self.max_workers = max(1, max_workers)
+        self.max_workers_per_user = max(1, min(max_workers_per_user or self.max_workers, self.max_workers))
+        self.on_meeting_complete = on_meeting_complete
+        self.ordered = ordered
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="download")
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = collections.OrderedDict()  # email -> deque of file tasks
+        self._running = collections.Counter()  # email -> running downloads
+        self._running_total = 0
+        self._outstanding = 0  # queued + running files
+        self._submitted = 0
+
+    def submit_meeting(self, email, recording, files, index, total_count, incomplete=False):
+        """ Queue all the files of a meeting.
+
+            `files` is a list of tuples, as returned by get_meeting_files().
+            A meeting with incomplete files is downloaded but never marked as completed.
+        """
+        if not files:
+            # Every file was downloaded by an earlier run: only the post-processing is left
+            if not incomplete:
+                with self._lock:
+                    self._outstanding += 1
+                self._executor.submit(self._complete_downloaded, email, recording, index)
+            return
+
+        meeting = {
+            "email": email,
+            "recording": recording,
+            "index": index,
+            "remaining": len(files),
+            "success": not incomplete
+        }
+
+        with self._lock:
+            queue = self._pending.setdefault(email, collections.deque())
+            for file in files:
+                queue.append((self._submitted, (meeting, file, total_count)))
+                self._submitted += 1
+            self._outstanding += len(files)
+            self._dispatch()
+
+    def join(self):
+        """ Wait for every queued file (and meeting post-processing) to finish.
+        """
+        with self._idle:
+            while self._outstanding:
+                self._idle.wait()
+        self._executor.shutdown(wait=True)
+
+    def _dispatch(self):
+        # Must be called with self._lock held
+        if SHUTDOWN.is_set() and self._pending:
+            # Draining: drop the queued files, only the running ones finish
+            self._outstanding -= sum(len(queue) for queue in self._pending.values())
+            self._pending.clear()
+            if not self._outstanding:
+                self._idle.notify_all()
+
+        while self._running_total < self.max_workers:
+            available = [
+                email for email in self._pending
+                if self._running[email] < self.max_workers_per_user
+            ]
+            if not available:
+                break
+
+            if self.ordered:
+                # The user whose next file was submitted first
+                email = min(available, key=lambda email: self._pending[email][0][0])
+            else:
+                email = available[0]
+
+            queue = self._pending[email]
+            _, task = queue.popleft()
+            if not queue:
+                del self._pending[email]
+            else:
+                # Move this user to the back of the line
+                self._pending.move_to_end(email)
+
+            self._running[email] += 1
+            self._running_total += 1
+            self._executor.submit(self._run, email, task)
+
+    def _run(self, email, task):
+        meeting, file, total_count = task
+
+        try:
+            try:
+                success = download_file(meeting["recording"], email, file, meeting["index"], total_count)
+            except Exception as e:
+                # e.g. the state store locked by another worker: the file failed, the pool goes on
+                file_failed(meeting["recording"], file, e)
+                success = False
+
+            with self._lock:
+                meeting["success"] &= success
+                meeting["remaining"] -= 1
+                meeting_done = meeting["remaining"] == 0
+
+            if meeting_done and meeting["success"]:
+                self._complete(email, meeting["recording"], meeting["index"])
+
+            if meeting_done:
+                release_meeting(meeting["recording"]["uuid"])
+
+        finally:
+            with self._lock:
+                self._running[email] -= 1
+                self._running_total -= 1
+                self._outstanding -= 1
+                self._dispatch()
+                if not self._outstanding:
+                    self._idle.notify_all()
+
+    def _complete_downloaded(self, email, recording, index):
+        try:
+            if claim_meeting(recording["uuid"]):
+                self._complete(email, recording, index)
+                release_meeting(recording["uuid"])
+
+        finally:
+            with self._lock:
+                self._outstanding -= 1
+                if not self._outstanding:
+                    self._idle.notify_all()
+
+    def _complete(self, email, recording, index):
+        try:
+            self.on_meeting_complete(email, recording, index)
+        except Exception as e:
+            print(
+                f"{Color.RED}### Post-processing of meeting {Color.END}'{recording['uuid']}'"
+                f"{Color.RED} failed because {Color.END}'{e}'"
+            )
+
+
+def user_info(email, first_name, last_name):
+    return f"{first_name} {last_name} - {email}" if first_name and last_name else f"{email}"
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def meeting_size(meeting):
+    return sum(file[5] or 0 for file in meeting["files"])
+
+
+# Download order of the meetings in a manifest
+SCHEDULING_POLICIES = {
+    # as listed by the API
+    "api": None,
+    # completes (and deletes) as many meetings as possible early on
+    "smallest": meeting_size,
+    # keeps the workers busy on long transfers, best throughput
+    "largest": lambda meeting: -meeting_size(meeting),
+    "oldest": lambda meeting: meeting["recording"].get("start_time", ""),
+}
+
+
+def build_manifest(users):
+    """ Lists the recordings of all users and returns the meetings that have
+        files to download, with their recording_files data
+    """
+    manifest = []
+    for email, user_id, first_name, last_name in users:
+        if SHUTDOWN.is_set():
+            break
+
+        print(f"\n{Color.BOLD}Getting recording list for {user_info(email, first_name, last_name)}{Color.END}")
+
+        try:
+            recordings = list_recordings(user_id)
+        except Exception as e:
+            print(f"{Color.RED}### Could not list recordings for {email} because {Color.END}'{e}'")
+            continue
+
+        total_count = len(recordings)
+        print(f"==> Found {total_count} recordings")
+
+        for index, recording in enumerate(recordings):
+            meeting_files = get_meeting_files(recording, index, total_count)
+            if meeting_files:
+                files, incomplete = meeting_files
+                manifest.append({
+                    "email": email,
+                    "recording": recording,
+                    "index": index,
+                    "total_count": total_count,
+                    "files": files,
+                    "incomplete": incomplete
+                })
+
+    return manifest
+
+
+def space_budget(reserve_space):
+    """ The free space of DOWNLOAD_DIRECTORY minus `reserve_space` bytes
+    """
+    download_directory = os.path.abspath(os.path.expanduser(DOWNLOAD_DIRECTORY))
+    os.makedirs(download_directory, exist_ok=True)
+    return shutil.disk_usage(download_directory).free - reserve_space
+
+
+def skipped_for_space(count, size):
+    print(
+        f"{Color.YELLOW}### Not enough disk space: skipping {count} meetings "
+        f"({format_size(size)}) until space is freed{Color.END}"
+    )
+
+
+def plan_downloads(manifest, order, reserve_space):
+    """ Orders the meetings of a manifest by the given scheduling policy and
+        keeps as many of them as fit in the free space of DOWNLOAD_DIRECTORY,
+        minus `reserve_space` bytes. The others are left for a later run.
+    """
+    key = SCHEDULING_POLICIES[order]
+    if key:
+        manifest = sorted(manifest, key=key)
+
+    budget = space_budget(reserve_space)
+    total_size = sum(meeting_size(meeting) for meeting in manifest)
+
+    print(
+        f"\n{Color.BOLD}==> {len(manifest)} meetings to download ({format_size(total_size)}), "
+        f"{format_size(max(0, budget))} available{Color.END}"
+    )
+    if total_size <= budget:
+        return manifest
+
+    planned = []
+    skipped_size = 0
+    for meeting in manifest:
+        size = meeting_size(meeting)
+        if size <= budget:
+            planned.append(meeting)
+            budget -= size
+        else:
+            skipped_size += size
+
+    skipped_for_space(len(manifest) - len(planned), skipped_size)
+    return planned
+
+
+def record_throughput(downloaded_bytes, seconds):
+    """ Keeps a moving average of the download throughput of the past runs,
+        used to estimate the duration of planned runs
+    """
+    if downloaded_bytes < 1024 * 1024 or seconds <= 0:
+        return
+
+    throughput = downloaded_bytes / seconds
+    previous = float(state_store().get_metadata("throughput", 0) or 0)
+    state_store().set_metadata("throughput", throughput if not previous else 0.7 * previous + 0.3 * throughput)
+
+
+def write_manifest(filename, manifest):
+    """ Writes the meetings of a manifest as NDJSON, one meeting per line with
+        the target path, size, type and state of each of its files, then one
+        line per listed user with the end of its listing window and its listed
+        meetings (see advance_sync_cursors), followed by a summary line with
+        the totals and the estimated download duration
+    """
+    total_size = 0
+    pending_size = 0
+    file_count = 0
+
+    with open(filename, 'w', encoding='utf-8') as fd:
+        for meeting in manifest:
+            files = []
+            for download_url, name, subfolder, recording_type, recording_id, file_size in meeting["files"]:
+                done = state_store().is_file_downloaded(meeting["recording"]["uuid"], recording_id)
+                files.append({
+                    "path": target_path(meeting["email"], subfolder, name),
+                    "size": file_size,
+                    "recording_type": recording_type,
+                    "file_id": recording_id,
+                    "done": done,
+                    "download_url": download_url,
+                    "filename": name,
+                    "subfolder": subfolder
+                })
+                total_size += file_size or 0
+                pending_size += 0 if done else file_size or 0
+                file_count += 1
+
+            fd.write(json.dumps({
+                "type": "meeting",
+                "uuid": meeting["recording"]["uuid"],
+                "email": meeting["email"],
+                "index": meeting["index"],
+                "total_count": meeting["total_count"],
+                "incomplete": meeting["incomplete"],
+                "recording": meeting["recording"],
+                "files": files
+            }) + "\n")
+
+        # Backfills don't move the cursors
+        if not RECORDING_FROM_DATE:
+            with SYNC_LOCK:
+                for user_id, meetings in SYNC_PENDING.items():
+                    fd.write(json.dumps({
+                        "type": "sync",
+                        "user_id": user_id,
+                        "window_end": RECORDING_END_DATE.strftime("%Y-%m-%d"),
+                        "full_rescan": FULL_RESCAN,
+                        "meetings": meetings
+                    }) + "\n")
+
+        throughput = float(state_store().get_metadata("throughput", 0) or 0)
+        fd.write(json.dumps({
+            "type": "summary",
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "meetings": len(manifest),
+            "files": file_count,
+            "total_bytes": total_size,
+            "pending_bytes": pending_size,
+            "throughput": throughput or None,
+            "estimated_seconds": round(pending_size / throughput) if throughput else None
+        }) + "\n")
+
+    print(
+        f"\n{Color.BOLD}==> Manifest of {len(manifest)} meetings, {file_count} files "
+        f"({format_size(pending_size)} to download) written to {Color.END}{filename}"
+    )
+    if throughput:
+        print(f"==> Estimated download time: {timedelta(seconds=round(pending_size / throughput))}")
+
+
+def read_manifest(filename):
+    """ Reads a manifest written by write_manifest(), skipping the meetings
+        completed and the files downloaded since. The listing windows of its
+        users are loaded into SYNC_PENDING and SYNC_WINDOWS, so that the run
+        moves their sync cursors.
+    """
+    manifest = []
+    with open(filename, 'r', encoding='utf-8') as fd:
+        for line in fd:
+            entry = json.loads(line)
+            if entry.get("type") == "sync":
+                with SYNC_LOCK:
+                    SYNC_PENDING[entry["user_id"]] = entry["meetings"]
+                    SYNC_WINDOWS[entry["user_id"]] = (entry["window_end"], entry["full_rescan"])
+                continue
+
+            if entry.get("type") != "meeting" or state_store().is_meeting_completed(entry["uuid"]):
+                continue
+
+            manifest.append({
+                "email": entry["email"],
+                "recording": entry["recording"],
+                "index": entry["index"],
+                "total_count": entry["total_count"],
+                "incomplete": entry["incomplete"],
+                "files": [
+                    (file["download_url"], file["filename"], file["subfolder"], file["recording_type"],
+                     file["file_id"], file["size"])
+                    for file in entry["files"]
+                    if not state_store().is_file_downloaded(entry["uuid"], file["file_id"])
+                ]
+            })
+
+    return manifest
+
+
+def run_threaded(delete_recordings, max_workers, max_workers_per_user, order="api", reserve_space=0,
+                 manifest=None):
+    """ Lists all the recordings first (unless a manifest is given), then
+        downloads the planned meetings (see plan_downloads) on a DownloadPool.
+        Meetings are post-processed, and their cloud recordings deleted, as soon
+        as their own files are done.
+    """
+    if manifest is None:
+        print(Color.BOLD + "Getting user accounts..." + Color.END)
+        manifest = build_manifest(get_users())
+
+    manifest = plan_downloads(manifest, order, reserve_space)
+    started = time.monotonic()
+    downloaded_bytes = METRICS.value("downloaded_bytes")
+
+    pool = DownloadPool(
+        max_workers, max_workers_per_user,
+        on_meeting_complete=lambda email, recording, index: complete_meeting(
+            email, recording, index, delete_recordings),
+        ordered=order != "api"
+    )
+
+    for meeting in manifest:
+        pool.submit_meeting(meeting["email"], meeting["recording"], meeting["files"],
+                            meeting["index"], meeting["total_count"], meeting["incomplete"])
+
+    pool.join()
+
+    record_throughput(METRICS.value("downloaded_bytes") - downloaded_bytes, time.monotonic() - started)
+
+
+async def run_async_pipeline(delete_recordings, max_workers, max_workers_per_user, list_workers,
+                             reserve_space=0):
+    """ Runs user enumeration, recording listing, downloads and post-processing
+        (summary, delete, completed log) as overlapping stages connected by
+        bounded queues, so listing of the next users overlaps with downloading
+        for the previous ones while memory stays bounded by the queue sizes.
+
+        Listed files wait in one bounded queue per user; download workers take
+        them round-robin across the users below `max_workers_per_user`, as
+        DownloadPool does, so a capped user never holds up the others.
+
+        Meetings are downloaded in listing order while they fit in the free
+        space of DOWNLOAD_DIRECTORY minus `reserve_space` bytes, as
+        plan_downloads does; the others are left for a later run.
+
+        The blocking `requests` calls run on a thread pool sized for the stages.
+    """
+    import asyncio
+
+    max_workers = max(1, max_workers)
+    max_workers_per_user = max(1, min(max_workers_per_user or max_workers, max_workers))
+    list_workers = max(1, list_workers)
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=max_workers + list_workers + 2,
+                                  thread_name_prefix="pipeline")
+    loop.set_default_executor(executor)
+
+    users_queue = asyncio.Queue(maxsize=list_workers * 2)
+    done_queue = asyncio.Queue(maxsize=max_workers * 2)
+    files_per_user = max_workers * 2
+    # Listed files, dispatched to the download workers under `ready`
+    ready = asyncio.Condition()
+    pending = collections.OrderedDict()  # email -> deque of (meeting, file, total_count)
+    running = collections.Counter()  # email -> running downloads
+    outstanding = 0  # queued + running files
+    budget = space_budget(reserve_space)
+    skipped = [0, 0]  # meetings and bytes that don't fit in the budget
+
+    async def enumerate_users():
+        print(Color.BOLD + "Getting user accounts..." + Color.END)
+        for user in await asyncio.to_thread(get_users):
+            if SHUTDOWN.is_set():
+                break
+            await users_queue.put(user)
+
+    async def list_user_recordings():
+        nonlocal budget
+
+        while True:
+            email, user_id, first_name, last_name = await users_queue.get()
+            try:
+                if SHUTDOWN.is_set():
+                    continue
+
+                print(f"\n{Color.BOLD}Getting recording list for "
+                      f"{user_info(email, first_name, last_name)}{Color.END}")
+                recordings = await asyncio.to_thread(list_recordings, user_id)
+                total_count = len(recordings)
+                print(f"==> Found {total_count} recordings for {email}")
+
+                for index, recording in enumerate(recordings):
+                    meeting_files = get_meeting_files(recording, index, total_count)
+                    if not meeting_files:
+                        continue
+
+                    files, incomplete = meeting_files
+                    size = sum(file[5] or 0 for file in files)
+                    if size > budget:
+                        skipped[0] += 1
+                        skipped[1] += size
+                        continue
+                    budget -= size
+
+                    meeting = {
+                        "email": email,
+                        "recording": recording,
+                        "index": index,
+                        "remaining": len(files),
+                        "success": not incomplete
+                    }
+                    if not files:
+                        # Every file was downloaded by an earlier run: only the post-processing is left
+                        if not incomplete and await asyncio.to_thread(claim_meeting, recording["uuid"]):
+                            await done_queue.put(meeting)
+                        continue
+
+                    for file in files:
+                        await queue_file(email, (meeting, file, total_count))
+
+            except Exception as e:
+                print(f"{Color.RED}### Could not list recordings for {email} because {Color.END}'{e}'")
+
+            finally:
+                users_queue.task_done()
+
+    async def queue_file(email, task):
+        nonlocal outstanding
+
+        async with ready:
+            await ready.wait_for(lambda: len(pending.get(email, ())) < files_per_user)
+            pending.setdefault(email, collections.deque()).append(task)
+            outstanding += 1
+            ready.notify_all()
+
+    def next_file():
+        # Must be called with `ready` held
+        for email in pending:
+            if running[email] < max_workers_per_user:
+                files = pending[email]
+                task = files.popleft()
+                if files:
+                    pending.move_to_end(email)
+                else:
+                    del pending[email]
+                running[email] += 1
+                return task
+
+        return None
+
+    async def download_files():
+        nonlocal outstanding
+
+        while True:
+            async with ready:
+                task = next_file()
+                while task is None:
+                    await ready.wait()
+                    task = next_file()
+                ready.notify_all()
+
+            meeting, file, total_count = task
+            email = meeting["email"]
+            try:
+                try:
+                    # Draining: the meeting stays incomplete
+                    success = not SHUTDOWN.is_set() and await asyncio.to_thread(
+                        download_file, meeting["recording"], email, file,
+                        meeting["index"], total_count)
+                except Exception as e:
+                    file_failed(meeting["recording"], file, e)
+                    success = False
+
+                meeting["success"] &= success
+                meeting["remaining"] -= 1
+                if meeting["remaining"] == 0:
+                    if meeting["success"]:
+                        await done_queue.put(meeting)
+                    else:
+                        await asyncio.to_thread(release_meeting, meeting["recording"]["uuid"])
+
+            finally:
+                async with ready:
+                    running[email] -= 1
+                    outstanding -= 1
+                    ready.notify_all()
+
+    async def post_process():
+        while True:
+            meeting = await done_queue.get()
+            try:
+                await asyncio.to_thread(complete_meeting, meeting["email"], meeting["recording"],
+                                        meeting["index"], delete_recordings)
+            except Exception as e:
+                print(
+                    f"{Color.RED}### Post-processing of meeting {Color.END}'{meeting['recording']['uuid']}'"
+                    f"{Color.RED} failed because {Color.END}'{e}'"
+                )
+
+            finally:
+                await asyncio.to_thread(release_meeting, meeting["recording"]["uuid"])
+                done_queue.task_done()
+
+    workers = (
+        [asyncio.create_task(list_user_recordings()) for _ in range(list_workers)] +
+        [asyncio.create_task(download_files()) for _ in range(max_workers)] +
+        [asyncio.create_task(post_process())]
+    )
+
+    started = time.monotonic()
+    downloaded_bytes = METRICS.value("downloaded_bytes")
+    try:
+        await enumerate_users()
+        # Drain the stages in order: once a queue is empty, its producers are done
+        await users_queue.join()
+        async with ready:
+            await ready.wait_for(lambda: outstanding == 0)
+        await done_queue.join()
+
+        if skipped[0]:
+            skipped_for_space(*skipped)
+        record_throughput(METRICS.value("downloaded_bytes") - downloaded_bytes, time.monotonic() - started)
+
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        executor.shutdown(wait=True)
+
+
+def exit_now():
+    """ Saves the sync cursors and the state store, then exits without waiting
+        for the running downloads (sys.exit would wait for their threads);
+        their .part files are resumed on the next run
+    """
+    try:
+        if STATE is not None:
+            advance_sync_cursors()
+            STATE.flush()
+    except Exception as e:
+        print(f"{Color.RED}### Could not save the state before exiting because {Color.END}'{e}'")
+    finally:
+        system.stdout.flush()
+        system.stderr.flush()
+        os._exit(1)
+
+
+def handle_graceful_shutdown(signal_received, frame):
+    """ Stops starting new downloads and lets the running ones finish; a second
+        signal exits immediately
+    """
+    if SHUTDOWN.is_set():
+        print(f"\n{Color.DARK_CYAN}{signal.Signals(signal_received).name} received again, "
+              f"exiting now.{Color.END}")
+        exit_now()
+
+    SHUTDOWN.set()
+    print(
+        f"\n{Color.DARK_CYAN}{signal.Signals(signal_received).name} received, finishing the downloads "
+        f"in progress (send it again to exit now).{Color.END}")
+
+
+def stop_accepting():
+    if not SHUTDOWN.is_set():
+        SHUTDOWN.set()
+        print(f"\n{Color.DARK_CYAN}Deadline reached, finishing the downloads in progress.{Color.END}")
+
+
+def schedule_stop(minute):
+    """ Stops starting new downloads at the next `minute` of the local time
+        of day (see parse_time_of_day); the running ones finish
+    """
+    global STOP_TIMER
+
+    now = datetime.now()
+    deadline = now.replace(hour=minute // 60, minute=minute % 60, second=0, microsecond=0)
+    if deadline <= now:
+        deadline += timedelta(days=1)
+
+    print(f"==> No new downloads will be started after {deadline:%Y-%m-%d %H:%M}")
+    STOP_TIMER = threading.Timer((deadline - now).total_seconds(), stop_accepting)
+    STOP_TIMER.daemon = True
+    STOP_TIMER.start()
+
+
+def run_pass(args):
+    """ Lists and downloads the new recordings once, then moves the sync
+        cursors and writes the run report. Returns the number of files downloaded.
+    """
+    METRICS.reset()
+    SYNC_PENDING.clear()
+    SYNC_WINDOWS.clear()
+    configure_sync_window(args.full_rescan, args.recordings_from, args.recordings_to,
+                          args.sync_overlap_days, args.pending_max_days)
+
+    if args.execute_manifest:
+        run_threaded(args.delete_recordings, args.max_workers, args.max_workers_per_user,
+                     args.order, args.reserve_space, read_manifest(args.execute_manifest))
+    elif args.engine == "async":
+        import asyncio
+
+        asyncio.run(run_async_pipeline(args.delete_recordings, args.max_workers,
+                                       args.max_workers_per_user, args.list_workers, args.reserve_space))
+    else:
+        run_threaded(args.delete_recordings, args.max_workers, args.max_workers_per_user,
+                     args.order, args.reserve_space)
+
+    release_meetings()
+    # Also on SHUTDOWN: SYNC_PENDING only has the users whose listing was
+    # complete, and their meetings left undownloaded hold the cursors back
+    advance_sync_cursors()
+    state_store().flush()
+    write_run_report(args.prometheus)
+
+    return METRICS.value("files_downloaded")
+
+
+def verify_webhook_signature(headers, body):
+    """ Checks the `x-zm-signature` of a Zoom webhook request: the HMAC-SHA256,
+        keyed by the secret token, of `v0:{x-zm-request-timestamp}:{body}`
+    """
+    timestamp = headers.get("x-zm-request-timestamp", "")
+    try:
+        if abs(time.time() - int(timestamp)) > WEBHOOK_MAX_AGE:
+            return False
+    except ValueError:
+        return False
+
+    message = f"v0:{timestamp}:".encode("utf-8") + body
+    expected = "v0=" + hmac.new(WEBHOOK_SECRET_TOKEN.encode("utf-8"), message, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, headers.get("x-zm-signature", ""))
+
+
+def start_webhook_server(port):
+    global WEBHOOK_SERVER
+
+    # http.server is only needed by daemons receiving webhooks
+    from .webhook import WebhookServer
+
+    WEBHOOK_SERVER = WebhookServer(("", port))
+    threading.Thread(target=WEBHOOK_SERVER.serve_forever, name="webhook", daemon=True).start()
+    print(f"==> Listening for Zoom webhook events on port {WEBHOOK_SERVER.server_address[1]}")
+
+
+def download_webhook_recordings(args, recordings):
+    """ Downloads the recordings received by webhook, without listing anything
+    """
+    manifest = []
+    for recording in recordings:
+        if SHARD and user_shard(recording.get("host_id", ""), SHARD[1]) != SHARD[0]:
+            continue
+
+        meeting_files = get_meeting_files(recording, 0, 1)
+        if meeting_files:
+            files, incomplete = meeting_files
+            manifest.append({
+                "email": recording.get("host_email") or recording.get("host_id"),
+                "recording": recording,
+                "index": 0,
+                "total_count": 1,
+                "files": files,
+                "incomplete": incomplete
+            })
+
+    if manifest:
+        run_threaded(args.delete_recordings, args.max_workers, args.max_workers_per_user,
+                     args.order, args.reserve_space, manifest)
+        release_meetings()
+        state_store().flush()
+
+
+def wait_for_next_pass(args, seconds):
+    """ Waits for the next daemon pass, meanwhile downloading the recordings
+        received by webhook as they arrive
+    """
+    if WEBHOOK_SERVER is None:
+        SHUTDOWN.wait(seconds)
+        return
+
+    deadline = time.monotonic() + seconds
+    while not SHUTDOWN.is_set() and time.monotonic() < deadline:
+        try:
+            recordings = [WEBHOOK_QUEUE.get(timeout=max(0, min(1, deadline - time.monotonic())))]
+        except queue.Empty:
+            continue
+
+        # Events arriving together are downloaded together
+        while True:
+            try:
+                recordings.append(WEBHOOK_QUEUE.get_nowait())
+            except queue.Empty:
+                break
+
+        try:
+            download_webhook_recordings(args, recordings)
+        except Exception as e:
+            print(f"{Color.RED}### Download of webhook recordings failed because {Color.END}'{e}'")
+
+
+def run_daemon(args):
+    """ Runs passes until SHUTDOWN, keeping the token, the connection pool and
+        the state store open. The next pass comes POLL_INTERVAL after a pass
+        that downloaded something, and the interval doubles (up to
+        MAX_POLL_INTERVAL) after each idle pass.
+
+        With a webhook server, new recordings are downloaded as their events
+        arrive, and the passes are only a reconciliation sweep every
+        MAX_POLL_INTERVAL, for missed events.
+    """
+    interval = POLL_INTERVAL
+    while not SHUTDOWN.is_set():
+        try:
+            downloaded = run_pass(args)
+        except Exception as e:
+            print(f"{Color.RED}### Pass failed because {Color.END}'{e}'")
+            downloaded = 0
+
+        if WEBHOOK_SERVER is not None:
+            interval = MAX_POLL_INTERVAL
+        else:
+            interval = POLL_INTERVAL if downloaded else min(interval * 2, MAX_POLL_INTERVAL)
+
+        if not SHUTDOWN.is_set():
+            print(f"\n==> Next pass at {datetime.now() + timedelta(seconds=interval):%Y-%m-%d %H:%M:%S}")
+            wait_for_next_pass(args, interval)
+
+    if WEBHOOK_SERVER is not None:
+        WEBHOOK_SERVER.shutdown()
+
+
+# ################################################################
+# #                        MAIN                                  #
+# ################################################################
+
+def main(args):
+    # Clear the screen of interactive runs, without a shell (cron logs keep their history)
+    if system.stdout.isatty():
+        print("\033[H\033[2J", end="")
+
+    # Show the logo
+    print(f"""
+        {Color.DARK_CYAN}
+
+
+                             ,*****************.
+                          *************************
+                        *****************************
+                      *********************************
+                     ******               ******* ******
+                    *******                .**    ******
+                    *******                       ******/
+                    *******                       /******
+                    ///////                 //    //////
+                    ///////*              ./////.//////
+                     ////////////////////////////////*
+                       /////////////////////////////
+                          /////////////////////////
+                             ,/////////////////
+
+                        Zoom Recording Downloader
+
+                            Version {APP_VERSION}
+
+        {Color.END}
+    """)
+
+    # Recording windows and user pages of up to --list-workers users at a time
+    api_workers = max(1, args.list_workers) * 4
+    configure_api_executor(api_workers)
+
+    configure_rate_limits(args.rate_limits, api_workers + max(1, args.max_workers))
+
+    # One pooled connection per concurrent request
+    configure_http_session(max(1, args.max_workers) * max(1, args.segments) + api_workers + 2,
+                           args.connect_timeout, args.read_timeout)
+
+    configure_write_path(args.chunk_size, args.read_strategy, args.preallocate, args.dedupe,
+                         args.segments, args.segment_threshold)
+
+    configure_bandwidth(args.bandwidth_limit, args.bandwidth_schedule)
+
+    configure_state_store(args.state_db, args.shard)
+
+    load_access_token()
+
+    state_store()
+
+    load_sync_cursors()
+
+    print((Color.BOLD + Color.GREEN + "\n*** Starting at %s ***" + Color.END + "\n") % datetime.now())
+
+    if args.plan:
+        # Listing only: the sync cursors move when the manifest is executed
+        configure_sync_window(args.full_rescan, args.recordings_from, args.recordings_to,
+                              args.sync_overlap_days, args.pending_max_days)
+        print(Color.BOLD + "Getting user accounts..." + Color.END)
+        try:
+            write_manifest(args.plan, build_manifest(get_users()))
+        except IOError as e:
+            print(f"{Color.RED}### Listing failed because {Color.END}'{e}'")
+            system.exit(1)
+        state_store().flush()
+        write_run_report(args.prometheus)
+        return
+
+    if args.delete_recordings:
+        start_deletions(args.delete_rate, args.delete_after_days)
+
+    if args.index:
+        start_indexing()
+
+    if args.deadline is not None:
+        schedule_stop(args.deadline)
+
+    if args.webhook_port is not None:
+        start_webhook_server(args.webhook_port)
+
+    if args.daemon:
+        run_daemon(args)
+    else:
+        try:
+            run_pass(args)
+        except IOError as e:
+            print(f"{Color.RED}### Pass failed because {Color.END}'{e}'")
+            system.exit(1)
+
+    if DELETIONS:
+        DELETIONS.stop()
+        state_store().flush()
+
+    if INDEXER:
+        INDEXER.stop()
+
+    print(Color.BOLD + Color.GREEN + "\n*** All done! ***" + Color.END)
+    http_stats = http_connection_stats()
+    print(f"==> HTTP: {http_stats['requests']} requests over {http_stats['connections']} "
+          f"connections ({http_stats['reused']} reused)")
+    print((
+                  Color.BOLD + Color.GREEN + "\n*** Ending at %s ***" + Color.END + "\n") % datetime.now())
+    save_location = os.path.abspath(DOWNLOAD_DIRECTORY)
+    print(Color.BLUE + "\nRecordings have been saved to: " +
+          Color.UNDERLINE + "{}".format(save_location) + Color.END + "\n")
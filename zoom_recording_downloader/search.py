@@ -0,0 +1,501 @@
+# -*- coding: utf-8 -*-
+
+# Full-text index of the downloaded transcripts, closed captions, chat files
+# and meeting summaries, in a SQLite FTS5 database (search.db in the log
+# directory).
+#
+# Each text file is a document (path, meeting uuid, topic, user, start time,
+# kind), split into segments: one per VTT cue or chat message, with its
+# timestamp, and one per line of the summaries. The segments of document N
+# have the rowids N << SEGMENT_BITS and up, so that re-indexing a file only
+# deletes a range of rowids. Files are indexed by a background Indexer as
+# they are written, and in bulk by `reindex`.
+
+import collections
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from .downloader import Color
+
+# recording_type -> kind of the indexed text files
+TEXT_RECORDING_TYPES = {
+    "audio_transcript": "transcript",
+    "closed_caption": "captions",
+    "chat_file": "chat",
+    "summary": "summary",
+}
+# The recording type in the file names of format_filename (and of
+# standardize_filenames.py), e.g. "... - Audio Transcript..txt"
+TEXT_FILE_PATTERN = re.compile(
+    r" - (Audio Transcript|Closed Captions?|Chat File|Summary)\.+(txt|vtt)$", re.IGNORECASE)
+FILE_KINDS = {"audio transcript": "transcript", "closed caption": "captions", "closed captions": "captions",
+              "chat file": "chat", "summary": "summary"}
+# "2024.01.02 - 10.00 AM UTC - ..."
+FILE_START_PATTERN = re.compile(r"^(\d{4})\.(\d{2})\.(\d{2}) - (\d{2})\.(\d{2}) ([AP]M) UTC - ")
+CUE_TIMING = re.compile(r"^((?:\d+:)?\d{2}:\d{2}[.,]\d{3})\s+-->")
+CHAT_TIMESTAMP = re.compile(r"^(\d{2}:\d{2}:\d{2})\s+(.*)$")
+
+SEGMENT_BITS = 20  # up to ~1M segments per document
+INDEX_BATCH = 50  # documents per transaction
+REINDEX_CHUNK = 64  # files parsed per task of the reindex workers
+RANK_WINDOW = 5000  # most recent matching segments ranked by a search
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS documents (
+        id INTEGER PRIMARY KEY,
+        path TEXT UNIQUE NOT NULL,
+        meeting_uuid TEXT,
+        topic TEXT,
+        email TEXT,
+        start_time TEXT,
+        kind TEXT NOT NULL,
+        size INTEGER,
+        mtime REAL
+    );
+    CREATE INDEX IF NOT EXISTS documents_start_time ON documents (start_time);
+    CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5(
+        text, cue UNINDEXED, tokenize = 'unicode61 remove_diacritics 2'
+    );
+"""
+
+
+def parse_vtt(text):
+    """ Returns the (start, text) of the cues of a WebVTT file
+    """
+    segments = []
+    cue = None
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            if cue is not None and lines:
+                segments.append((cue, " ".join(lines)))
+            cue = None
+            lines = []
+            continue
+
+        match = CUE_TIMING.match(line)
+        if match:
+            cue = match.group(1).replace(",", ".")
+            lines = []
+        elif cue is not None:
+            lines.append(line)
+
+    if cue is not None and lines:
+        segments.append((cue, " ".join(lines)))
+
+    return segments
+
+
+def parse_chat(text):
+    """ Returns the (timestamp, text) of the messages of a chat file; the lines
+        without a timestamp continue the previous message
+    """
+    segments = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+
+        match = CHAT_TIMESTAMP.match(line)
+        if match:
+            segments.append([match.group(1), match.group(2)])
+        elif segments:
+            segments[-1][1] += " " + line
+        else:
+            segments.append(["", line])
+
+    return [tuple(segment) for segment in segments]
+
+
+def parse_text(kind, text):
+    """ Splits a text file into (cue, text) segments
+    """
+    if text.lstrip("﻿").startswith("WEBVTT"):
+        return parse_vtt(text)
+    if kind == "chat":
+        return parse_chat(text)
+
+    return [("", line.strip()) for line in text.splitlines() if line.strip()]
+
+
+def file_metadata(path, directory, meeting_uuids):
+    """ The document metadata of a file of the archive, from its path
+        (<directory>/<email>/<topic>/<file>) and the meeting uuids of the
+        state store. Returns None if it isn't an indexed text file.
+    """
+    name = os.path.basename(path)
+    match = TEXT_FILE_PATTERN.search(name)
+    if not match:
+        return None
+
+    start = FILE_START_PATTERN.match(name)
+    start_time = None
+    if start:
+        year, month, day, hour, minute, am_pm = start.groups()
+        hour = int(hour) % 12 + (12 if am_pm == "PM" else 0)
+        start_time = f"{year}-{month}-{day}T{hour:02}:{minute}:00Z"
+
+    folder = os.path.dirname(path)
+    relative = os.path.relpath(folder, directory).split(os.sep)
+    return {
+        "path": path,
+        # Summaries aren't in the state store: use the meeting of the other files
+        "meeting_uuid": meeting_uuids.get(path) or meeting_uuids.get((folder, name[:start.end()] if start else None)),
+        "topic": relative[-1] if len(relative) > 1 else None,
+        "email": relative[0] if len(relative) > 1 else None,
+        "start_time": start_time,
+        "kind": FILE_KINDS[match.group(1).lower()],
+    }
+
+
+def read_document(document):
+    """ Reads and parses the text file of a document; returns (document,
+        segments), or (document, None) if it can't be read
+    """
+    try:
+        with open(document["path"], 'r', encoding='utf-8', errors='replace') as fd:
+            text = fd.read()
+        stat = os.stat(document["path"])
+    except OSError:
+        return document, None
+
+    document = dict(document, size=stat.st_size, mtime=stat.st_mtime)
+    return document, parse_text(document["kind"], text)
+
+
+def read_documents(documents):
+    return [read_document(document) for document in documents]
+
+
+class TranscriptIndex:
+    """ The FTS5 database of the text files
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+    def commit(self):
+        with self._lock:
+            self._db.commit()
+
+    def indexed_files(self):
+        """ {path: (size, mtime)} of the indexed documents
+        """
+        with self._lock:
+            return {path: (size, mtime) for path, size, mtime in
+                    self._db.execute("SELECT path, size, mtime FROM documents")}
+
+    def add(self, document, segments):
+        """ Indexes (or re-indexes) a document and its (cue, text) segments,
+            without committing
+        """
+        columns = ("meeting_uuid", "topic", "email", "start_time", "kind", "size", "mtime")
+        values = [document.get(column) for column in columns]
+        with self._lock:
+            row = self._db.execute("SELECT id FROM documents WHERE path = ?", (document["path"],)).fetchone()
+            if row:
+                document_id = row[0]
+                self._delete_segments(document_id)
+                self._db.execute(
+                    f"UPDATE documents SET {', '.join(column + ' = ?' for column in columns)} WHERE id = ?",
+                    values + [document_id])
+            else:
+                document_id = self._db.execute(
+                    f"INSERT INTO documents (path, {', '.join(columns)}) VALUES (?{', ?' * len(columns)})",
+                    [document["path"]] + values).lastrowid
+
+            first = document_id << SEGMENT_BITS
+            self._db.executemany(
+                "INSERT INTO segments (rowid, text, cue) VALUES (?, ?, ?)",
+                ((first + n, text, cue) for n, (cue, text) in enumerate(segments[:1 << SEGMENT_BITS])))
+
+    def remove(self, path):
+        with self._lock:
+            row = self._db.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()
+            if row:
+                self._delete_segments(row[0])
+                self._db.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+
+    def _delete_segments(self, document_id):
+        self._db.execute("DELETE FROM segments WHERE rowid BETWEEN ? AND ?",
+                         (document_id << SEGMENT_BITS, ((document_id + 1) << SEGMENT_BITS) - 1))
+
+    @staticmethod
+    def _matches(email, start, end):
+        """ The FROM and WHERE clauses of the segments matching :query in the
+            documents of `email` between `start` and `end`
+        """
+        conditions = ["segments MATCH :query"]
+        if email:
+            conditions.append("documents.email = :email")
+        if start:
+            conditions.append("documents.start_time >= :start")
+        if end:
+            conditions.append("documents.start_time < :end")
+        return (f"FROM segments JOIN documents ON documents.id = segments.rowid >> {SEGMENT_BITS} "
+                f"WHERE {' AND '.join(conditions)}")
+
+    def search(self, query, limit=20, email=None, start=None, end=None):
+        """ Returns the best `limit` segments matching an FTS5 query, as dicts
+            with the metadata of their document and a highlighted snippet.
+            Only the RANK_WINDOW most recently indexed matches are ranked, so
+            that common words don't score the whole archive (see truncated).
+        """
+        matches = self._matches(email, start, end)
+
+        with self._lock:
+            cursor = self._db.execute(
+                "SELECT documents.path, documents.meeting_uuid, documents.topic, documents.email, "
+                "documents.start_time, documents.kind, segments.cue, "
+                "snippet(segments, 0, :open, :close, '...', 16) AS snippet "
+                f"{matches} AND segments.rowid >= COALESCE((SELECT segments.rowid {matches} "
+                f"ORDER BY segments.rowid DESC LIMIT 1 OFFSET {RANK_WINDOW - 1}), 0) "
+                # bm25() rather than rank: FTS5 would score the matches of the other users and dates too
+                "ORDER BY bm25(segments) LIMIT :limit",
+                {"query": query, "email": email, "start": start, "end": end, "limit": limit,
+                 "open": Color.BOLD, "close": Color.END})
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor]
+
+    def truncated(self, query, email=None, start=None, end=None):
+        """ Whether a search has more than RANK_WINDOW matches, of which the
+            older ones weren't ranked
+        """
+        with self._lock:
+            return self._db.execute(
+                f"SELECT 1 {self._matches(email, start, end)} LIMIT 1 OFFSET {RANK_WINDOW}",
+                {"query": query, "email": email, "start": start, "end": end}).fetchone() is not None
+
+
+def plain_query(text):
+    """ An FTS5 query matching all the words of `text`, in any order: each
+        word is quoted, so that punctuation isn't taken for FTS5 syntax
+    """
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+class Indexer:
+    """ Indexes the text files in a background thread, as they are written:
+        the download threads only queue them. Documents are indexed in
+        transactions of up to INDEX_BATCH.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="indexer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, path, recording, email, recording_type):
+        """ Queues a downloaded file, if it is a text file
+        """
+        kind = TEXT_RECORDING_TYPES.get(recording_type)
+        if kind is None or not path:
+            return
+
+        self._queue.put({
+            "path": path,
+            "meeting_uuid": recording.get("uuid"),
+            "topic": recording.get("topic"),
+            "email": email,
+            "start_time": recording.get("start_time"),
+            "kind": kind,
+        })
+
+    def stop(self):
+        """ Indexes the queued files and stops
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        index = TranscriptIndex(self.path)
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < INDEX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for document in batch:
+                if document is None:
+                    stopping = True
+                    continue
+
+                document, segments = read_document(document)
+                if segments is None:
+                    print(f"{Color.YELLOW}### Could not index {document['path']}{Color.END}")
+                    continue
+                try:
+                    index.add(document, segments)
+                except sqlite3.Error as e:
+                    print(f"{Color.YELLOW}### Could not index {document['path']}: {e}{Color.END}")
+            index.commit()
+
+        index.close()
+
+
+def scan_text_files(directory):
+    """ Yields the paths of the text files under `directory` (os.scandir walk)
+    """
+    pending = [directory]
+    while pending:
+        folder = pending.pop()
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False) and TEXT_FILE_PATTERN.search(entry.name):
+                        yield entry.path, entry.stat(follow_symlinks=False)
+        except OSError as e:
+            print(f"{Color.YELLOW}### Skipping {folder}: {e}{Color.END}")
+
+
+def reindex(index, directory, meeting_uuids, workers):
+    """ Brings the index up to date with the text files of `directory`: new
+        and modified files are parsed by `workers` processes, in chunks of
+        REINDEX_CHUNK files, and the documents of deleted files are removed.
+        Returns the counts of indexed, unchanged and removed files.
+    """
+    counts = {"indexed": 0, "unchanged": 0, "removed": 0}
+    indexed_files = index.indexed_files()
+    seen = set()
+
+    def changed_documents():
+        chunk = []
+        for path, stat in scan_text_files(directory):
+            seen.add(path)
+            if indexed_files.get(path) == (stat.st_size, stat.st_mtime):
+                counts["unchanged"] += 1
+                continue
+
+            document = file_metadata(path, directory, meeting_uuids)
+            if document:
+                chunk.append(document)
+            if len(chunk) == REINDEX_CHUNK:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def record(results):
+        for document, segments in results:
+            if segments is not None:
+                index.add(document, segments)
+                counts["indexed"] += 1
+        index.commit()
+
+    if workers <= 1:
+        for chunk in changed_documents():
+            record(read_documents(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # At most 2 chunks per worker in flight
+            in_flight = collections.deque()
+            for chunk in changed_documents():
+                in_flight.append(executor.submit(read_documents, chunk))
+                if len(in_flight) >= 2 * workers:
+                    record(in_flight.popleft().result())
+            while in_flight:
+                record(in_flight.popleft().result())
+
+    for path in set(indexed_files) - seen:
+        index.remove(path)
+        counts["removed"] += 1
+    index.commit()
+
+    return counts
+
+
+def print_hits(hits, elapsed):
+    for hit in hits:
+        start_time = (hit["start_time"] or "")[:16].replace("T", " ")
+        cue = f" {hit['cue']}" if hit["cue"] else ""
+        print(f"{Color.BOLD}{start_time}{Color.END} {hit['email'] or ''} - {hit['topic'] or ''} "
+              f"{Color.DARK_CYAN}[{hit['kind']}{cue}]{Color.END}")
+        print(f"    {hit['snippet']}")
+        print(f"    {hit['path']}")
+
+    print(f"==> {len(hits)} hits in {elapsed * 1000:.1f} ms")
+
+
+def search_command(path, text, limit, email, start, end, raw):
+    """ The `search` command: the segments matching all the words of `text`
+        (or the FTS5 query, if `raw`) in the meetings of `email` between the
+        dates `start` and `end` (included). Returns whether anything was found.
+    """
+    if not os.path.exists(path):
+        print(f"{Color.RED}### No search index at {path}: run the downloads or `reindex` first{Color.END}")
+        return False
+
+    index = TranscriptIndex(path)
+    started = time.perf_counter()
+    query = text if raw else plain_query(text)
+    start = start.strftime("%Y-%m-%d") if start else None
+    end = (end + timedelta(days=1)).strftime("%Y-%m-%d") if end else None
+    try:
+        hits = index.search(query, limit, email, start, end)
+        elapsed = time.perf_counter() - started
+        truncated = index.truncated(query, email, start, end)
+    except sqlite3.OperationalError as e:
+        print(f"{Color.RED}### Invalid query: {e}{Color.END}")
+        return False
+    finally:
+        index.close()
+
+    print_hits(hits, elapsed)
+    if truncated:
+        print(f"{Color.YELLOW}### Results truncated: only the {RANK_WINDOW} most recently indexed matches "
+              f"were ranked; add words, --user, --from or --to to narrow the search{Color.END}")
+    return bool(hits)
+
+
+def reindex_command(path, directory, meeting_uuids, workers):
+    print(f"{Color.BOLD}Indexing the text files in {directory}...{Color.END}")
+    index = TranscriptIndex(path)
+    started = time.perf_counter()
+    try:
+        counts = reindex(index, directory, meeting_uuids, workers)
+    finally:
+        index.close()
+
+    print(f"==> {counts['indexed']} files indexed, {counts['unchanged']} unchanged, "
+          f"{counts['removed']} removed in {time.perf_counter() - started:.1f}s")
+
+
+def meeting_uuids_of(downloaded_paths):
+    """ Maps the paths of the downloaded files, and their (folder, meeting
+        prefix of the file name), to their meeting uuid
+    """
+    meeting_uuids = {}
+    for path, meeting_uuid in downloaded_paths.items():
+        meeting_uuids[path] = meeting_uuid
+        start = FILE_START_PATTERN.match(os.path.basename(path))
+        if start:
+            meeting_uuids[(os.path.dirname(path), os.path.basename(path)[:start.end()])] = meeting_uuid
+
+    return meeting_uuids
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+# The receiver of Zoom webhook events of the daemon (--webhook-port), in its
+# own module so that http.server is only imported when it is enabled.
+
+import hashlib
+import hmac
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import downloader
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """ Receives Zoom webhook events: answers the endpoint URL validation, and
+        queues the recordings of `recording.completed` events on WEBHOOK_QUEUE
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if not 0 <= length <= downloader.WEBHOOK_MAX_BODY:
+            # The body is left unread: don't reuse the connection
+            self.close_connection = True
+            downloader.METRICS.increment("webhook_events", event="invalid_length")
+            self.reply(413 if length > downloader.WEBHOOK_MAX_BODY else 400, {"error": "invalid content length"})
+            return
+
+        body = self.rfile.read(length)
+        if not downloader.verify_webhook_signature(self.headers, body):
+            downloader.METRICS.increment("webhook_events", event="invalid_signature")
+            self.reply(401, {"error": "invalid signature"})
+            return
+
+        try:
+            event = json.loads(body)
+            name = event["event"]
+            payload = event["payload"]
+            if not isinstance(name, str) or not isinstance(payload, dict):
+                raise TypeError("invalid event")
+            if name == "endpoint.url_validation" and not isinstance(payload.get("plainToken"), str):
+                raise TypeError("invalid url validation")
+            if name == "recording.completed" and not isinstance(payload.get("object"), dict):
+                raise TypeError("invalid recording")
+        except (ValueError, KeyError, TypeError):
+            downloader.METRICS.increment("webhook_events", event="invalid_event")
+            self.reply(400, {"error": "invalid event"})
+            return
+
+        downloader.METRICS.increment("webhook_events", event=name)
+        if name == "endpoint.url_validation":
+            plain_token = payload["plainToken"]
+            encrypted_token = hmac.new(downloader.WEBHOOK_SECRET_TOKEN.encode("utf-8"),
+                                       plain_token.encode("utf-8"), hashlib.sha256).hexdigest()
+            self.reply(200, {"plainToken": plain_token, "encryptedToken": encrypted_token})
+            return
+
+        if name == "recording.completed":
+            recording = payload["object"]
+            print(f"==> Webhook: recording of meeting {recording.get('uuid')} completed")
+            downloader.WEBHOOK_QUEUE.put(recording)
+
+        self.reply(200, {})
+
+    def reply(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class WebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, server_address):
+        super().__init__(server_address, WebhookHandler)